@@ -1,35 +1,257 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends
-from db.connection import get_connection
-from utils.auth import verify_token
+import asyncio
+import random
+from collections import defaultdict
+from typing import List, Optional
+from fastapi import APIRouter, Body, HTTPException, Depends
+import aiomysql
+import pymysql
+from pydantic import BaseModel, Field
+from api.routes.products import RETRYABLE_ERRORS
+from core.config import PURCHASE_CONFIG
+from db.async_connection import get_async_connection
+from utils.auth import Principal, verify_token
+from utils.cache import catalog_cache
+from utils.rollups import record_trades
+from utils.search import search_index
 
 router = APIRouter()
 
+
+class CartItemRequest(BaseModel):
+    product_id: int
+    quantity: int = Field(1, gt=0)
+
+class CartTotals(BaseModel):
+    lines: int
+    units: int
+    totalWei: str  # price * quantity summed; a string as it overflows JavaScript numbers
+
+class CartView(BaseModel):
+    items: List[dict]
+    totals: CartTotals
+
+class CheckoutLine(BaseModel):
+    productId: int
+    quantity: int
+    status: str  # "purchased" or "unavailable"
+    remainingQuantity: Optional[int] = None
+    detail: Optional[str] = None
+
+class CheckoutResult(BaseModel):
+    destination: str
+    purchased: int
+    lines: List[CheckoutLine]
+    cart: CartView  # What is left: the lines that could not be bought
+
+
+CART_ITEMS = """
+    SELECT sc.cartId AS id,
+        p.productId,
+        p.name,
+        p.price,
+        sc.quantity,
+        p.imageSrc AS image,
+        i.thumbnailPath AS thumbnailSrc,
+        p.ownerAddress AS creator
+    FROM shoppingCart sc
+    JOIN products p ON sc.productId = p.id
+    LEFT JOIN images i ON i.fileName = p.imageSrc
+    WHERE sc.userId = %s
+    ORDER BY sc.addedAt DESC
+"""
+
+# shoppingCart.productId references products.id; the API speaks products.productId
+CART_ADD = """
+    UPDATE shoppingCart SET quantity = quantity + %s
+    WHERE userId = %s AND productId = (SELECT id FROM products WHERE productId = %s)
+    ORDER BY cartId LIMIT 1
+"""
+CART_INSERT = "INSERT INTO shoppingCart (userId, productId, quantity) SELECT %s, id, %s FROM products WHERE productId = %s"
+CART_SET = """
+    UPDATE shoppingCart SET quantity = %s
+    WHERE userId = %s AND productId = (SELECT id FROM products WHERE productId = %s)
+"""
+CART_REMOVE = "DELETE FROM shoppingCart WHERE userId = %s AND productId = (SELECT id FROM products WHERE productId = %s)"
+CART_CLEAR = "DELETE FROM shoppingCart WHERE userId = %s"
+
+# Checkout locks the cart lines first, then the products in primary key order: two
+# checkouts that share products always take those row locks in the same order
+CHECKOUT_LINES = "SELECT cartId, productId, quantity FROM shoppingCart WHERE userId = %s FOR UPDATE"
+CHECKOUT_PRODUCTS = """
+    SELECT id, productId, quantity, isForSale, price, ownerAddress
+    FROM products
+    WHERE id IN ({ids})
+    ORDER BY id
+    FOR UPDATE
+"""
+SELLER_IDS = "SELECT walletAddress, userId FROM users WHERE walletAddress IN ({wallets})"
+
+
+def _placeholders(count):
+    return ", ".join(["%s"] * count)
+
+
+def _view(items):
+    """The cart with totals computed here, so clients need not re-fetch or add up prices."""
+    total = sum((item["price"] or 0) * item["quantity"] for item in items)
+    return {
+        "items": items,
+        "totals": {"lines": len(items), "units": sum(item["quantity"] for item in items), "totalWei": str(total)},
+    }
+
+
+async def _cart_items(cursor, user_id):
+    await cursor.execute(CART_ITEMS, (user_id,))
+    return list(await cursor.fetchall())
+
+
+async def _mutate(user_id, change):
+    """Run ``change(cursor)``, commit, and return the user's cart as it is now."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await change(cursor)
+        await conn.commit()
+        return await _cart_items(cursor, user_id)
+
+
 @router.get("/", response_model=List[dict])
-def get_cart_products(wallet_address: str = Depends(verify_token)):
-    """Fetch shopping cart items with only essential product details."""
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT sc.cartId AS id,
-            p.productId,
-            p.name, 
-            p.price, 
-            p.imageSrc AS image, 
-            p.ownerAddress AS creator 
-        FROM shoppingCart sc
-        JOIN products p ON sc.productId = p.id
-        JOIN users u ON u.userId = sc.userId
-        WHERE u.walletAddress = %s
-        ORDER BY sc.addedAt DESC
-    """, (wallet_address,))
-    cart_items = cursor.fetchall()
-    cursor.close()
-    conn.close()
-
-    if not cart_items:
-        raise HTTPException(status_code=404, detail="No products found in the cart")
-    
-    return cart_items
\ No newline at end of file
+async def get_cart_products(principal: Principal = Depends(verify_token)):
+    """Fetch shopping cart items with only essential product details; an empty cart is an empty list."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        return await _cart_items(cursor, principal.user_id)
+
+
+@router.post("/items", response_model=CartView)
+async def add_cart_item(request: CartItemRequest, principal: Principal = Depends(verify_token)):
+    """Add ``quantity`` of a product to the cart (on top of what is already there)."""
+    async def add(cursor):
+        await cursor.execute(CART_ADD, (request.quantity, principal.user_id, request.product_id))
+        if cursor.rowcount == 0:
+            await cursor.execute(CART_INSERT, (principal.user_id, request.quantity, request.product_id))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Product not found")
+
+    return _view(await _mutate(principal.user_id, add))
+
+
+@router.put("/items/{product_id}", response_model=CartView)
+async def set_cart_item(product_id: int, quantity: int = Body(..., embed=True, gt=0),
+                        principal: Principal = Depends(verify_token)):
+    """Set the quantity of a product already in the cart."""
+    async def update(cursor):
+        await cursor.execute(CART_SET, (quantity, principal.user_id, product_id))
+
+    items = await _mutate(principal.user_id, update)
+    # rowcount is 0 for an unchanged quantity as well, so check the cart itself
+    if not any(item["productId"] == product_id for item in items):
+        raise HTTPException(status_code=404, detail="Product not in cart")
+    return _view(items)
+
+
+@router.delete("/items/{product_id}", response_model=CartView)
+async def remove_cart_item(product_id: int, principal: Principal = Depends(verify_token)):
+    async def remove(cursor):
+        await cursor.execute(CART_REMOVE, (principal.user_id, product_id))
+
+    return _view(await _mutate(principal.user_id, remove))
+
+
+@router.delete("/", response_model=CartView)
+async def clear_cart(principal: Principal = Depends(verify_token)):
+    async def clear(cursor):
+        await cursor.execute(CART_CLEAR, (principal.user_id,))
+
+    return _view(await _mutate(principal.user_id, clear))
+
+
+@router.post("/checkout", response_model=CheckoutResult)
+async def checkout(destination: str = Body(..., embed=True), principal: Principal = Depends(verify_token)):
+    """Buy every line of the cart in one transaction.
+
+    Lines that cannot be bought (not for sale, not enough stock, unknown
+    seller) stay in the cart and are reported per line; the rest are bought
+    together and leave the cart. Retried on deadlock / lock wait timeout like
+    ``POST /products/buy``.
+    """
+    attempts = PURCHASE_CONFIG["max_attempts"]
+    for attempt in range(1, attempts + 1):
+        try:
+            lines, remaining_cart = await _checkout(principal.user_id, destination)
+            break
+        except pymysql.err.OperationalError as e:
+            if e.args[0] not in RETRYABLE_ERRORS or attempt == attempts:
+                raise HTTPException(status_code=503 if e.args[0] in RETRYABLE_ERRORS else 500,
+                                    detail=f"Checkout failed: {e}")
+            await asyncio.sleep(PURCHASE_CONFIG["retry_backoff"] * 2 ** (attempt - 1) * random.random())
+        except pymysql.MySQLError as e:
+            raise HTTPException(status_code=500, detail=f"Checkout failed: {e}")
+
+    purchased = [line for line in lines if line["status"] == "purchased"]
+    if purchased:
+        catalog_cache.bump()
+        for line in purchased:
+            search_index.set_stock(line["productId"], line["remainingQuantity"])
+    return {"destination": destination, "purchased": len(purchased), "lines": lines, "cart": _view(remaining_cart)}
+
+
+async def _checkout(buyer_id, destination):
+    """Run the checkout and return (per-line results, the cart rows left over)."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(CHECKOUT_LINES, (buyer_id,))
+        cart_ids, wanted = defaultdict(list), defaultdict(int)
+        for row in await cursor.fetchall():
+            # The same product may sit on several lines; they are bought as one
+            cart_ids[row["productId"]].append(row["cartId"])
+            wanted[row["productId"]] += row["quantity"]
+        if not wanted:
+            raise HTTPException(status_code=400, detail="Cart is empty")
+
+        await cursor.execute(CHECKOUT_PRODUCTS.format(ids=_placeholders(len(wanted))), list(wanted))
+        products = await cursor.fetchall()
+
+        owners = list({product["ownerAddress"].lower() for product in products})
+        await cursor.execute(SELLER_IDS.format(wallets=_placeholders(len(owners))), owners)
+        sellers = {row["walletAddress"]: row["userId"] for row in await cursor.fetchall()}
+
+        lines, bought = [], []
+        for product in products:
+            quantity = wanted[product["id"]]
+            seller_id = sellers.get(product["ownerAddress"].lower())
+            line = {"productId": product["productId"], "quantity": quantity}
+            if not product["isForSale"]:
+                line.update(status="unavailable", detail="Product is not for sale")
+            elif product["quantity"] < quantity:
+                line.update(status="unavailable", detail="Insufficient quantity available")
+            elif seller_id is None:
+                line.update(status="unavailable", detail="Seller not found")
+            else:
+                line.update(status="purchased", remainingQuantity=product["quantity"] - quantity)
+                bought.append((product, quantity, seller_id, line["remainingQuantity"]))
+            lines.append(line)
+
+        if bought:
+            # The rows are locked and checked above, so stock is set outright; MySQL applies
+            # single-table SET clauses left to right, so isForSale sees the new quantity
+            cases = " ".join(["WHEN %s THEN %s"] * len(bought))
+            await cursor.execute(
+                f"UPDATE products SET quantity = CASE id {cases} END, isForSale = quantity > 0 "
+                f"WHERE id IN ({_placeholders(len(bought))})",
+                [value for product, _, _, remaining in bought for value in (product["id"], remaining)]
+                + [product["id"] for product, _, _, _ in bought],
+            )
+            # One multi-row INSERT; executemany would send one statement per row because of NOW()
+            rows = ", ".join(["(%s, %s, %s, %s, %s, NOW())"] * len(bought))
+            await cursor.execute(
+                f"INSERT INTO transactions (productId, buyerId, sellerId, destination, quantity, timestamp) VALUES {rows}",
+                [value for product, quantity, seller_id, _ in bought
+                 for value in (product["productId"], buyer_id, seller_id, destination, quantity)],
+            )
+            await record_trades(cursor, [(product["productId"], buyer_id, seller_id, quantity, product["price"])
+                                         for product, quantity, seller_id, _ in bought])
+            done = [cart_id for product, _, _, _ in bought for cart_id in cart_ids[product["id"]]]
+            await cursor.execute(f"DELETE FROM shoppingCart WHERE cartId IN ({_placeholders(len(done))})", done)
+            await conn.commit()
+        else:
+            await conn.rollback()
+
+        remaining_cart = await _cart_items(cursor, buyer_id) if len(bought) < len(lines) else []
+    return lines, remaining_cart
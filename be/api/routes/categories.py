@@ -1,25 +1,26 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends
-from db.connection import get_connection
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Request
+from db.async_connection import get_async_connection
 from schemas.product import ProductCreate
+from utils.cache import catalog_cache
+from utils.fastjson import conditional_json_response, tagged_json
 
 router = APIRouter()
 
 # ============= Category API =============
 @router.get("/", response_model=List[str])
-def get_categories():
-    """Fetch all coffee categories from the database."""
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
+async def get_categories(request: Request):
+    """Fetch all coffee categories from the database; ETag'd, see utils/fastjson.py."""
+    async def encode():
+        categories = await catalog_cache.get_or_load(("categories",), _load_categories)
+        if not categories:
+            raise HTTPException(status_code=404, detail="No categories found")
+        return orjson.dumps(categories)
 
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM category;")
-    categories = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
+    return conditional_json_response(request, await tagged_json(("categories", "json"), encode))
 
-    if not categories:
-        raise HTTPException(status_code=404, detail="No categories found")
-
-    return categories
+async def _load_categories():
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute("SELECT name FROM category;")
+        return [row[0] for row in await cursor.fetchall()]
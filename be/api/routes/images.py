@@ -1,40 +1,208 @@
-from fastapi import APIRouter
-from db.connection import get_connection
+import contextlib
+import hashlib
+import mimetypes
 import os
-import shutil
-from fastapi import APIRouter, File, UploadFile
-from fastapi.responses import FileResponse
+import re
+import tempfile
+from email.utils import formatdate, parsedate_to_datetime
+from stat import S_ISREG
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+import aiomysql
+from core.config import IMAGE_CONFIG
+from db.async_connection import get_async_connection
+from utils.cache import HotFileCache
+from utils.fastjson import etag_matches
+from utils.images import EXTENSIONS, derive_variants
 router = APIRouter()
 
 # Directory for uploaded images
-UPLOAD_FOLDER = "./data/coffee-pictures"
+UPLOAD_FOLDER = IMAGE_CONFIG["upload_dir"]
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Thumbnails and WebP renditions, named <sha256>_<size>.webp
+VARIANT_FOLDER = IMAGE_CONFIG["variant_dir"]
+os.makedirs(VARIANT_FOLDER, exist_ok=True)
+
 IMAGE_FOLDER = "./data/category-pictures"
 os.makedirs(IMAGE_FOLDER, exist_ok=True)
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# <sha256>.<ext> originals and <sha256>_<size>.webp variants never change once written
+CONTENT_HASHED_NAME = re.compile(r"^[0-9a-f]{64}(_\d+)?\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+hot_images = HotFileCache(IMAGE_CONFIG["hot_cache_bytes"], IMAGE_CONFIG["hot_file_max_bytes"])
+
 # Serve the uploads directory as static files
 router.mount("/data/coffee-pictures", StaticFiles(directory=UPLOAD_FOLDER), name="coffee-pictures")
 
 @router.post("/coffee-pictures/")
 async def upload_file(file: UploadFile = File(...)):
-    """Upload an image and save it to the uploads directory."""
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    return {"filename": file.filename, "path": f"/data/coffee-pictures/{file.filename}"}
+    """Store an upload under its content hash and derive its thumbnail and WebP variants.
+
+    The body is copied and hashed in chunks on worker threads, and decoding
+    and resizing run in the image process pool. Uploading bytes that are
+    already stored returns the existing record instead of another copy.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > IMAGE_CONFIG["max_upload_bytes"]:
+                    raise HTTPException(status_code=413, detail="Image is too large")
+                await run_in_threadpool(_write_chunk, out, digest, chunk)
+        content_hash = digest.hexdigest()
+
+        existing = await _find_image(content_hash)
+        if existing:
+            return _image_response(existing, deduplicated=True)
+
+        try:
+            info = await derive_variants(temp_path, content_hash)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Unsupported image: {e}")
+
+        image = {
+            "fileName": content_hash + EXTENSIONS[info["format"]],
+            "contentHash": content_hash,
+            "contentType": info["contentType"],
+            "bytes": size,
+            "width": info["width"],
+            "height": info["height"],
+            "thumbnailPath": info["thumbnailPath"],
+            "webpPath": info["webpPath"],
+        }
+        await run_in_threadpool(os.replace, temp_path, os.path.join(UPLOAD_FOLDER, image["fileName"]))
+        await _save_image(image)
+        return _image_response(image, deduplicated=False)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+
+
+def _write_chunk(out, digest, chunk):
+    # hashlib releases the GIL for large buffers, so this overlaps with the loop
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def _find_image(content_hash):
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("""
+            SELECT fileName, contentHash, contentType, bytes, width, height, thumbnailPath, webpPath
+            FROM images WHERE contentHash = %s LIMIT 1
+        """, (content_hash,))
+        return await cursor.fetchone()
+
+
+async def _save_image(image):
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        # A concurrent upload of the same bytes may have registered it first
+        await cursor.execute("""
+            INSERT INTO images (fileName, contentHash, contentType, bytes, width, height, thumbnailPath, webpPath)
+            VALUES (%(fileName)s, %(contentHash)s, %(contentType)s, %(bytes)s, %(width)s, %(height)s,
+                    %(thumbnailPath)s, %(webpPath)s)
+            ON DUPLICATE KEY UPDATE imageId = imageId
+        """, image)
+        await conn.commit()
+
+
+def _image_response(image, deduplicated):
+    return {
+        "filename": image["fileName"],
+        "path": f"/data/coffee-pictures/{image['fileName']}",
+        "contentHash": image["contentHash"],
+        "contentType": image["contentType"],
+        "bytes": image["bytes"],
+        "width": image["width"],
+        "height": image["height"],
+        "thumbnailSrc": image["thumbnailPath"],
+        "webpSrc": image["webpPath"],
+        "deduplicated": deduplicated,
+    }
+
+
+async def _serve_image(request: Request, folder: str, filename: str):
+    """Serve a file with validators, conditional 304s, Range support and cache headers.
+
+    For content-hashed names the ETag is the name itself, so a matching
+    If-None-Match is answered before the file is even stat-ed, and small
+    files are kept in ``hot_images`` after the first read. Range requests
+    go through FileResponse, which handles single and multipart ranges.
+    """
+    if filename != os.path.basename(filename) or filename.startswith("."):
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+    path = os.path.join(folder, filename)
+    hashed = CONTENT_HASHED_NAME.match(filename) is not None
+    wants_range = "range" in request.headers
+
+    if hashed:
+        etag = f'"{filename.rsplit(".", 1)[0]}"'
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        cached = hot_images.get(path)
+        if cached is not None and not wants_range:
+            body, media_type, last_modified = cached
+            return Response(body, media_type=media_type,
+                            headers={**headers, "Last-Modified": last_modified, "Accept-Ranges": "bytes"})
+
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except OSError:
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+    if not S_ISREG(stat.st_mode):
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+
+    if not hashed:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={IMAGE_CONFIG['cache_max_age']}"}
+    headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if hashed and not wants_range and stat.st_size <= hot_images.max_file_bytes:
+        body = await run_in_threadpool(_read_file, path)
+        media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        hot_images.put(path, body, media_type, headers["Last-Modified"])
+        return Response(body, media_type=media_type, headers={**headers, "Accept-Ranges": "bytes"})
+    return FileResponse(path, headers=headers, stat_result=stat)
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
 
 @router.get("/coffee-pictures/{filename}")
-async def get_image(filename: str):
+async def get_image(filename: str, request: Request):
     """Serve an uploaded image by filename."""
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    
-    if not os.path.exists(file_path):
-        return {"error": "File not found"}
-    
-    return FileResponse(file_path)
+    return await _serve_image(request, UPLOAD_FOLDER, filename)
+
+@router.get("/variants/{filename}")
+async def get_image_variant(filename: str, request: Request):
+    """Serve a derived thumbnail or WebP rendition by filename."""
+    return await _serve_image(request, VARIANT_FOLDER, filename)
 
 @router.get("/categories-pictures/")
 def list_category_pictures():
@@ -52,11 +220,6 @@ def list_category_pictures():
     return {"images": images}
 
 @router.get("/categories-pictures/{filename}")
-async def get_image(filename: str):
-    """Serve an uploaded image by filename."""
-    file_path = os.path.join(IMAGE_FOLDER, filename)
-    
-    if not os.path.exists(file_path):
-        return {"error": "File not found"}
-    
-    return FileResponse(file_path)
\ No newline at end of file
+async def get_category_image(filename: str, request: Request):
+    """Serve a category picture by filename."""
+    return await _serve_image(request, IMAGE_FOLDER, filename)
\ No newline at end of file
@@ -0,0 +1,69 @@
+import json
+from typing import List, Optional
+
+import aiomysql
+from fastapi import APIRouter
+from pydantic import BaseModel
+
+from chain.indexer import indexer_status
+from db.async_connection import get_async_connection
+
+router = APIRouter()
+
+EVENT_COLUMNS = "eventName, blockNumber, txHash, logIndex, batchId, relatedBatchId, txId, account, args"
+
+BATCH_EVENTS = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM chainEvents
+    WHERE batchId = %s OR relatedBatchId = %s
+    ORDER BY blockNumber, logIndex
+"""
+
+TX_EVENTS = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM chainEvents
+    WHERE txId = %s
+    ORDER BY blockNumber, logIndex
+"""
+
+class ChainEvent(BaseModel):
+    eventName: str
+    blockNumber: int
+    txHash: str
+    logIndex: int
+    batchId: Optional[int] = None
+    relatedBatchId: Optional[int] = None
+    txId: Optional[int] = None
+    account: Optional[str] = None
+    args: dict
+
+
+# ============= Indexed chain data (no node round trips) =============
+@router.get("/status")
+async def get_chain_status():
+    """Indexer progress plus the persisted checkpoint."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("SELECT blockNumber, blockHash, updatedAt FROM chainCheckpoint WHERE name = 'AgriTrade'")
+        checkpoint = await cursor.fetchone()
+    return {"indexer": indexer_status(), "checkpoint": checkpoint}
+
+@router.get("/batches/{batch_id}/events", response_model=List[ChainEvent])
+async def get_batch_events(batch_id: int):
+    """Creation, purchase, transformation and shipment events that touch a batch, oldest first."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(BATCH_EVENTS, (batch_id, batch_id))
+        events = await cursor.fetchall()
+    return _with_args(events)
+
+@router.get("/transactions/{tx_id}/events", response_model=List[ChainEvent])
+async def get_transaction_events(tx_id: int):
+    """Purchase and confirmation events for an on-chain transaction id."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(TX_EVENTS, (tx_id,))
+        events = await cursor.fetchall()
+    return _with_args(events)
+
+def _with_args(events):
+    for event in events:
+        event["args"] = json.loads(event["args"])
+    return events
@@ -1,222 +1,562 @@
-from datetime import datetime
-from typing import List
-from fastapi import APIRouter, Body, HTTPException, Depends
-from db.connection import get_connection
-from schemas.product import ProductCreate, ProductResponse
-from web3 import Web3
+import asyncio
+import codecs
 import json
-from dotenv import load_dotenv
-import os
-from utils.auth import verify_token
-
-load_dotenv()
+import orjson
+import random
+import re
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Body, HTTPException, Depends, Query, Request
+from pydantic import ValidationError
+import aiomysql
+import pymysql
+from pymysql.constants import ER
+from db.async_connection import get_async_connection
+from schemas.product import ProductCreate, ProductPage, ProductResponse, ProductSearchPage, ProductStatus
+import httpx
+from chain.client import ChainClient, get_chain
+from core.config import BULK_INSERT_CHUNK_SIZE, FAST_JSON_RESPONSES, PURCHASE_CONFIG
+from utils.auth import Principal, verify_token
+from utils.cache import catalog_cache
+from utils.fastjson import conditional_json_response, json_bytes_response, row_encoder, tagged_json
+from utils.log import get_logger
+from utils.pagination import decode_cursor, encode_cursor
+from utils.rollups import record_trade
+from utils.search import search_index
 
 router = APIRouter()
-w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))  
-
-PRODUCT_ADDRESS = Web3.to_checksum_address(os.getenv("AGRI_TRADE_ADDRESS"))
-
-# Extract only the ABI
-with open('../dapp/artifacts/contracts/AgriTrade.sol/AgriTrade.json', 'r') as file:
-    contract_data = json.load(file)  
-    abi = contract_data.get("abi")  
-
-product_contract = w3.eth.contract(address=PRODUCT_ADDRESS, abi=abi)
+logger = get_logger(__name__)
+
+
+PRODUCT_INSERT = """
+    INSERT INTO products (name, categoryId, harvestDate, expirationDate, currentStatus, ownerAddress,
+                           region, imageSrc, quantity, price, isForSale, productId, description)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Catalog reads; db/explain_check.py runs EXPLAIN on each of these
+PRODUCTS_FOR_SALE = "SELECT id, productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, images.thumbnailPath AS thumbnailSrc, price, category.name as categoryName FROM products INNER JOIN category ON products.categoryId = category.categoryId LEFT JOIN images ON images.fileName = products.imageSrc where isForSale = 1 ORDER by productId DESC;"
+
+PRODUCTS_FOR_SALE_LIMIT = "SELECT id, productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, images.thumbnailPath AS thumbnailSrc, price, category.name as categoryName, description FROM products INNER JOIN category ON products.categoryId = category.categoryId LEFT JOIN images ON images.fileName = products.imageSrc where isForSale = 1 ORDER by productId DESC LIMIT %s;"
+
+PRODUCT_PAGE = """
+    SELECT id, products.productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, images.thumbnailPath AS thumbnailSrc, price,
+    category.name as categoryName, description, quantity, ownerAddress, region
+    FROM products
+    INNER JOIN category ON products.categoryId = category.categoryId
+    LEFT JOIN images ON images.fileName = products.imageSrc
+    WHERE {conditions}
+    ORDER BY products.productId DESC
+    LIMIT %s
+"""
+
+PRODUCT_BY_ID = """
+    SELECT id, products.productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, images.thumbnailPath AS thumbnailSrc, price, category.name as categoryName,
+    ownerAddress, region, description, quantity
+    FROM products
+    INNER JOIN category ON products.categoryId = category.categoryId
+    LEFT JOIN images ON images.fileName = products.imageSrc
+    WHERE products.productId = %s
+"""
+
+# Conditional stock decrement, see _purchase
+PRODUCT_PURCHASE = """
+    UPDATE products
+    SET quantity = LAST_INSERT_ID(quantity - %s), isForSale = quantity > 0
+    WHERE productId = %s AND isForSale = TRUE AND quantity >= %s
+"""
+# Read under the row lock PRODUCT_PURCHASE takes; users.walletAddress is stored lowercase
+PURCHASE_SELLER = """
+    SELECT p.ownerAddress, u.userId
+    FROM products p
+    LEFT JOIN users u ON u.walletAddress = LOWER(p.ownerAddress)
+    WHERE p.productId = %s
+"""
+
+def _product_params(product: ProductCreate):
+    # PyMySQL would escape the enum member by its name, so pass its value
+    return (product.name, product.categoryId, product.harvestDate, product.expirationDate, product.currentStatus.value, product.ownerAddress,
+            product.region, product.imageSrc, product.quantity, product.price, product.isForSale, product.productId, product.description)
 
 
 @router.post("/", response_model=dict)
-def create_product(product: ProductCreate, wallet_address: str = Depends(verify_token)):
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    print(product)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO products (name, categoryId, harvestDate, expirationDate, currentStatus, ownerAddress, 
-                               region, imageSrc, quantity, price, isForSale, productId, description)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """, (product.name, product.categoryId, product.harvestDate, product.expirationDate, product.currentStatus, product.ownerAddress, 
-          product.region, product.imageSrc, product.quantity, product.price, product.isForSale, product.productId, product.description))
-    conn.commit()
-    product_id = cursor.lastrowid
-    cursor.close()
-    conn.close()
+async def create_product(product: ProductCreate, principal: Principal = Depends(verify_token)):
+    logger.debug("Creating product %s for %s", product.productId, principal.wallet)
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute(PRODUCT_INSERT, _product_params(product))
+        await conn.commit()
+        product_id = cursor.lastrowid
+    catalog_cache.bump()
+    try:
+        await search_index.refresh([product.productId])
+    except Exception as e:
+        # The product is committed; a 500 here would only make clients retry into a duplicate
+        logger.warning("Search index refresh failed for product %s: %s", product.productId, e)
+        search_index.mark_stale()
 
     return {"message": "Product created", "productId": product_id}
 
 
-@router.get("/", response_model=List[ProductResponse])
-def get_products():
-    """Fetch product statistics from the database."""
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, price, category.name as categoryName FROM products INNER JOIN category ON products.categoryId = category.categoryId where isForSale = 1 ORDER by productId DESC;")
-    products = cursor.fetchall()
-    for product in products:
-        product["price"] = str(product["price"])
-    cursor.close()
-    conn.close()
+@router.post("/bulk", response_model=dict)
+async def create_products_bulk(
+    request: Request,
+    chunkSize: int = Query(BULK_INSERT_CHUNK_SIZE, ge=1, le=10000),
+    principal: Principal = Depends(verify_token),
+):
+    """Insert many products from a JSON array or an NDJSON body.
+
+    The body is parsed as it streams in and validated row by row against
+    ``ProductCreate``; valid rows are written ``chunkSize`` at a time, one
+    multi-row INSERT and one commit per chunk. Rows are identified by their
+    0-based position in the upload: every row not listed in ``errors`` was
+    created. If a chunk is rejected (e.g. a duplicate productId) its rows are
+    retried one by one so only the offending rows fail.
+    """
+    created = 0
+    failed = 0
+    errors = []  # The first MAX_REPORTED_ERRORS failures; the rest are only counted
+    chunk = []  # (row index, ProductCreate)
+    row_index = -1
+
+    def fail(entry):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(entry)
+
+    async def flush():
+        nonlocal created
+        inserted, failures = await _insert_product_chunk(chunk)
+        created += inserted
+        for entry in failures:
+            fail(entry)
+        chunk.clear()
 
-    if not products:
-        raise HTTPException(status_code=404, detail="No products found")
-    
-    get_product_metadata()
+    try:
+        async for row_index, row in _iter_upload_rows(request.stream()):
+            if isinstance(row, Exception):
+                fail({"row": row_index, "errors": [str(row)]})
+                continue
+            try:
+                product = ProductCreate.model_validate(row)
+            except ValidationError as e:
+                fail({
+                    "row": row_index,
+                    "productId": row.get("productId") if isinstance(row, dict) else None,
+                    "errors": [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()],
+                })
+                continue
+            chunk.append((row_index, product))
+            if len(chunk) >= chunkSize:
+                await flush()
+    except ValueError as e:
+        # Malformed JSON array: keep what was committed and report where parsing stopped
+        fail({"row": row_index + 1, "errors": [str(e)]})
+    if chunk:
+        await flush()
+    if created:
+        catalog_cache.bump()
+        search_index.mark_stale()
+
+    return {
+        "received": row_index + 1,
+        "created": created,
+        "failed": failed,
+        "errors": errors,
+        "errorsTruncated": failed > len(errors),
+    }
+
+
+# Failures listed in a bulk upload response; past this they are only counted
+MAX_REPORTED_ERRORS = 1000
+# Longest single row an upload may hold; the parser never buffers more than this
+MAX_UPLOAD_ROW_CHARS = 1024 * 1024
+_PARTIAL_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+_PARTIAL_NUMBER_TAIL = re.compile(r"[.eE][-+]?")
+
+
+def _cut_off(error, buffer):
+    """Whether a decode error only means the value runs past the end of ``buffer``.
+
+    Errors earlier in the buffer are malformed input, except for the ones a
+    chunk boundary can cause there: an unterminated string, a literal or
+    number sign cut short, a number cut after ``.``/``e`` and a ``\\u``
+    escape missing digits.
+    """
+    tail = buffer[error.pos:]
+    if not tail or error.msg.startswith("Unterminated string"):
+        return True
+    if error.msg == "Invalid \\uXXXX escape":
+        return len(tail) <= 5  # Also raised for a complete escape that ends the buffer
+    return any(literal.startswith(tail) for literal in _PARTIAL_LITERALS) or bool(_PARTIAL_NUMBER_TAIL.fullmatch(tail))
+
+
+async def _iter_upload_rows(stream):
+    """Yield ``(index, row)`` from a JSON array or NDJSON byte stream without buffering it whole.
+
+    A body starting with ``[`` is read as a JSON array, anything else as one
+    JSON document per line. Unparseable NDJSON lines are yielded as the
+    exception so the caller can report them and carry on; a malformed array
+    element raises ValueError as soon as it is seen, as does a row longer
+    than ``MAX_UPLOAD_ROW_CHARS``.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    mode = None
+    index = 0
+    finished = False
+
+    async for chunk in stream:
+        buffer += text.decode(chunk)
+        pos = 0
+        while not finished:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if mode is None:
+                if buffer[pos] == "[":
+                    mode = "array"
+                    pos += 1
+                else:
+                    mode = "ndjson"
+                continue
+            if mode == "ndjson":
+                end = buffer.find("\n", pos)
+                if end == -1:
+                    break
+                line, pos = buffer[pos:end], end + 1
+                try:
+                    yield index, json.loads(line)
+                except ValueError as e:
+                    yield index, e
+                index += 1
+                continue
+            # JSON array: values separated by commas and closed by "]"
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                finished = True
+                break
+            try:
+                row, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if not _cut_off(e, buffer):
+                    raise ValueError(f"Malformed JSON array element at row {index}: {e.msg}")
+                break  # The value continues in the next chunk
+            if end == len(buffer):
+                break  # A number may continue in the next chunk; "," or "]" must follow
+            pos = end
+            yield index, row
+            index += 1
+        buffer = buffer[pos:]
+        if len(buffer) > MAX_UPLOAD_ROW_CHARS:
+            # One row still incomplete after this much text is garbage, not a product
+            raise ValueError(f"Row {index} is longer than {MAX_UPLOAD_ROW_CHARS} characters")
+
+    buffer += text.decode(b"", final=True)
+    if mode == "ndjson" and buffer.strip():
+        try:
+            yield index, json.loads(buffer)
+        except ValueError as e:
+            yield index, e
+    elif mode == "array" and not finished:
+        raise ValueError("Malformed or truncated JSON array")
+
+
+async def _insert_product_chunk(chunk):
+    """Insert a chunk in one transaction, falling back to row-by-row inserts if the chunk is rejected."""
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        try:
+            await cursor.executemany(PRODUCT_INSERT, [_product_params(product) for _, product in chunk])
+            await conn.commit()
+            return len(chunk), []
+        except pymysql.MySQLError:
+            await conn.rollback()
+
+        inserted, failures = 0, []
+        for row_index, product in chunk:
+            try:
+                await cursor.execute(PRODUCT_INSERT, _product_params(product))
+                await conn.commit()
+                inserted += 1
+            except pymysql.MySQLError as e:
+                await conn.rollback()
+                failures.append({"row": row_index, "productId": product.productId, "errors": [str(e)]})
+        return inserted, failures
 
+
+@router.get("/", response_model=List[ProductResponse])
+async def get_products(request: Request, onchain: bool = False, chain: ChainClient = Depends(get_chain)):
+    """Fetch product statistics from the database; ETag'd, see utils/fastjson.py."""
+    if FAST_JSON_RESPONSES and not onchain:
+        async def encode():
+            return row_encoder.encode("products", PRODUCT_FIELDS, await _products_or_404(("products",), _load_products))
+        return conditional_json_response(request, await tagged_json(("products", "json"), encode))
+
+    products = await _products_or_404(("products",), _load_products)
+    if onchain:
+        return await _with_onchain_state(chain, products)
     return products
 
 @router.get("/limit/{limit}", response_model=List[ProductResponse])
-def get_limited_products(limit: int):
-    """Fetch product statistics from the database."""
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, price, category.name as categoryName, description FROM products INNER JOIN category ON products.categoryId = category.categoryId where isForSale = 1 ORDER by productId DESC LIMIT %s;", (limit,))
-    products = cursor.fetchall()
-    for product in products:
-        product["price"] = str(product["price"])
-    cursor.close()
-    conn.close()
+async def get_limited_products(request: Request, limit: int, onchain: bool = False,
+                               chain: ChainClient = Depends(get_chain)):
+    """Fetch product statistics from the database; ETag'd, see utils/fastjson.py."""
+    key, load = ("products_limit", limit), lambda: _load_limited_products(limit)
+    if FAST_JSON_RESPONSES and not onchain:
+        async def encode():
+            return row_encoder.encode("products_limit", PRODUCT_FIELDS, await _products_or_404(key, load))
+        return conditional_json_response(request, await tagged_json((*key, "json"), encode))
+
+    products = await _products_or_404(key, load)
+    if onchain:
+        return await _with_onchain_state(chain, products)
+    return products
 
+async def _products_or_404(key, load):
+    products = await catalog_cache.get_or_load(key, load)
     if not products:
         raise HTTPException(status_code=404, detail="No products found")
-    
     return products
 
+@router.get("/page", response_model=ProductPage)
+async def get_product_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(24, ge=1, le=100),
+    category: Optional[str] = None,
+    region: Optional[str] = None,
+    minPrice: Optional[int] = Query(None, ge=0),
+    maxPrice: Optional[int] = Query(None, ge=0),
+    harvestFrom: Optional[datetime] = None,
+    harvestTo: Optional[datetime] = None,
+    expiresFrom: Optional[datetime] = None,
+    expiresTo: Optional[datetime] = None,
+    onchain: bool = False,
+    chain: ChainClient = Depends(get_chain),
+):
+    """Keyset-paginated, filterable listing of products for sale, newest batch first.
+
+    Each page seeks past the previous page's last ``productId`` instead of
+    using OFFSET, so the work per page stays the same however deep the client
+    pages. Pass the returned ``next`` token back as ``cursor``.
+    """
+    conditions = ["isForSale = 1"]
+    params = []
+    if cursor is not None:
+        after = decode_cursor(cursor, "productId")["productId"]
+        if not isinstance(after, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        conditions.append("products.productId < %s")
+        params.append(after)
+    if category is not None:
+        conditions.append("category.name = %s")
+        params.append(category)
+    if region is not None:
+        conditions.append("products.region = %s")
+        params.append(region)
+    if minPrice is not None:
+        conditions.append("price >= %s")
+        params.append(minPrice)
+    if maxPrice is not None:
+        conditions.append("price <= %s")
+        params.append(maxPrice)
+    if harvestFrom is not None:
+        conditions.append("harvestDate >= %s")
+        params.append(harvestFrom)
+    if harvestTo is not None:
+        conditions.append("harvestDate <= %s")
+        params.append(harvestTo)
+    if expiresFrom is not None:
+        conditions.append("expirationDate >= %s")
+        params.append(expiresFrom)
+    if expiresTo is not None:
+        conditions.append("expirationDate <= %s")
+        params.append(expiresTo)
+
+    # Fetch one extra row to learn whether another page exists
+    params.append(limit + 1)
+
+    async def load_page():
+        async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(PRODUCT_PAGE.format(conditions=" AND ".join(conditions)), params)
+            products = await cur.fetchall()
+
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            next_cursor = encode_cursor({"productId": products[-1]["productId"]})
+        for product in products:
+            product["price"] = str(product["price"])
+        return {"items": products, "next": next_cursor}
+
+    # The filtered WHERE clause plus its parameters is the query shape
+    page = await catalog_cache.get_or_load(("page", *conditions, *params), load_page)
+    if onchain:
+        return {**page, "items": await _with_onchain_state(chain, page["items"])}
+    if FAST_JSON_RESPONSES:
+        items = await _encoded(("page", *conditions, *params, "json"), "page", page["items"])
+        return json_bytes_response(b'{"items":' + items + b',"next":' + orjson.dumps(page["next"]) + b"}")
+    return page
+
+@router.get("/search", response_model=ProductSearchPage)
+async def search_products(
+    q: str = Query("", max_length=200),
+    category: Optional[str] = None,
+    region: Optional[str] = None,
+    status: Optional[ProductStatus] = None,
+    minPrice: Optional[int] = Query(None, ge=0),
+    maxPrice: Optional[int] = Query(None, ge=0),
+    limit: int = Query(24, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+):
+    """Rank for-sale products by relevance to ``q`` (prefix-aware) with facet counts.
+
+    Without ``q`` every product matching the filters is returned, newest first.
+    """
+    return await search_index.search(
+        q, category, region, status.value if status else None, minPrice, maxPrice, limit, offset
+    )
+
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product_by_id(product_id: int):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
-        SELECT id, products.productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc, price, category.name as categoryName, 
-        ownerAddress, region, description, quantity 
-        FROM products 
-        INNER JOIN category ON products.categoryId = category.categoryId 
-        WHERE products.productId = %s
-    """, (product_id,))
-    product = cursor.fetchone()
-    product["price"] = str(product["price"])
-    print(product["price"])
-    cursor.close()
-    conn.close()
+async def get_product_by_id(product_id: int, onchain: bool = False, chain: ChainClient = Depends(get_chain)):
+    product = await catalog_cache.get_or_load(("product", product_id), lambda: _load_product(product_id))
 
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    if onchain:
+        return (await _with_onchain_state(chain, [product], journeys=True))[0]
     return product
 
 
 
 @router.post("/buy/{product_id}", response_model=dict)
-def buy_product(
+async def buy_product(
     product_id: int,
-    quantity: int = Body(..., embed=True),
+    quantity: int = Body(..., embed=True, gt=0),
     destination: str = Body(..., embed=True),
-    wallet_address: str = Depends(verify_token),
-    owner_address: str = Body(..., embed=True),
+    principal: Principal = Depends(verify_token),
+    owner_address: Optional[str] = Body(None, embed=True),
 ):
-    # Database connection
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = conn.cursor(dictionary=True)
-
-    try:
-        # Start transaction by turning off autocommit
-        conn.autocommit = False
-        
-        # Fetch product details
-        cursor.execute("SELECT * FROM products WHERE productId = %s", (product_id,))
-        product = cursor.fetchone()
-
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-
-        if not product["isForSale"]:
-            raise HTTPException(status_code=400, detail="Product is not for sale")
-            
-        # Check if there's enough quantity available
-        if product["quantity"] < quantity:
+    """Buy ``quantity`` of a product from its owner.
+
+    The seller is the product's ``ownerAddress`` as read in the purchase
+    transaction. ``owner_address`` is optional: when sent, a purchase from
+    any other seller is refused with 409 (the product changed hands since the
+    client loaded it).
+    """
+    attempts = PURCHASE_CONFIG["max_attempts"]
+    for attempt in range(1, attempts + 1):
+        try:
+            remaining = await _purchase(product_id, quantity, destination, principal.user_id, owner_address)
+            break
+        except pymysql.err.OperationalError as e:
+            if e.args[0] not in RETRYABLE_ERRORS or attempt == attempts:
+                raise HTTPException(status_code=503 if e.args[0] in RETRYABLE_ERRORS else 500,
+                                    detail=f"Transaction failed: {e}")
+            await asyncio.sleep(PURCHASE_CONFIG["retry_backoff"] * 2 ** (attempt - 1) * random.random())
+        except pymysql.MySQLError as e:
+            raise HTTPException(status_code=500, detail=f"Transaction failed: {e}")
+    catalog_cache.bump()
+    search_index.set_stock(product_id, remaining)
+
+    return {
+        "message": "Product purchased successfully",
+        "quantityPurchased": quantity,
+        "remainingQuantity": remaining,
+        "destination": destination,
+        "transactionRecorded": True
+    }
+
+
+RETRYABLE_ERRORS = (ER.LOCK_DEADLOCK, ER.LOCK_WAIT_TIMEOUT)
+
+
+async def _purchase(product_id, quantity, destination, buyer_id, expected_owner=None):
+    """Run one purchase as a short transaction and return the remaining stock.
+
+    Stock is taken with a single conditional UPDATE, so the row lock is held
+    only from that statement to the commit and two buyers can never both take
+    the last units. ``LAST_INSERT_ID(expr)`` hands the new quantity back in the
+    UPDATE's OK packet, which saves reading the row again. The seller is read
+    from the locked row, and the buyer, seller and product rollups are updated
+    in the same transaction.
+    """
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        # MySQL applies single-table SET clauses left to right, so isForSale sees the new quantity
+        await cursor.execute(PRODUCT_PURCHASE, (quantity, product_id, quantity))
+        if cursor.rowcount == 0:
+            await conn.rollback()
+            await cursor.execute("SELECT isForSale FROM products WHERE productId = %s", (product_id,))
+            product = await cursor.fetchone()
+            if not product:
+                raise HTTPException(status_code=404, detail="Product not found")
+            if not product[0]:
+                raise HTTPException(status_code=400, detail="Product is not for sale")
             raise HTTPException(status_code=400, detail="Insufficient quantity available")
-        
-        # Get user ID from wallet address
-        cursor.execute("SELECT userId FROM users WHERE walletAddress = %s", (wallet_address,))
-        user = cursor.fetchone()
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        user_id = user["userId"]
-
-                # Get user ID from wallet address
-        cursor.execute("SELECT userId FROM users WHERE walletAddress = %s", (owner_address,))
-        seller = cursor.fetchone()
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        seller_id = seller["userId"]
-        
-        # Calculate new quantity
-        new_quantity = product["quantity"] - quantity
-        
-        # Update product quantity and set isForSale to FALSE if quantity becomes 0
-        if new_quantity == 0:
-            cursor.execute("""
-                UPDATE products 
-                SET quantity = %s, isForSale = FALSE 
-                WHERE productId = %s
-            """, (new_quantity, product_id))
-        else:
-            cursor.execute("""
-                UPDATE products 
-                SET quantity = %s
-                WHERE productId = %s
-            """, (new_quantity, product_id))
-        print(owner_address)
-        # Record the transaction with user-provided destination
-        cursor.execute("""
+        remaining = cursor.lastrowid
+
+        await cursor.execute(PURCHASE_SELLER, (product_id,))
+        owner_address, seller_id = await cursor.fetchone()
+        if expected_owner is not None and owner_address.lower() != expected_owner.lower():
+            await conn.rollback()
+            raise HTTPException(status_code=409, detail="Product owner has changed")
+        if seller_id is None:
+            await conn.rollback()
+            raise HTTPException(status_code=404, detail="Seller not found")
+
+        await cursor.execute("""
             INSERT INTO transactions (productId, buyerId, sellerId, destination, quantity, timestamp)
-            VALUES (%s, %s, %s,%s, %s, NOW())
-        """, (product_id, user_id, seller_id, destination, quantity))
-        
-        # Commit the transaction
-        conn.commit()
-        
-        return {
-            "message": "Product purchased successfully", 
-            "quantityPurchased": quantity,
-            "remainingQuantity": new_quantity,
-            "destination": destination,
-            "transactionRecorded": True
-        }
-            
-    except Exception as e:
-        # Rollback in case of error
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Transaction failed: {str(e)}")
-    finally:
-        # Restore autocommit mode if needed
-        if conn and conn.is_connected():
-            conn.autocommit = True
-            cursor.close()
-            conn.close()
-
-def get_product_metadata():
+            VALUES (%s, %s, %s, %s, %s, NOW())
+        """, (product_id, buyer_id, seller_id, destination, quantity))
+        await record_trade(cursor, product_id, buyer_id, seller_id, quantity)
+        await conn.commit()
+    return remaining
+
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+
+async def _encoded(key, shape, products):
+    """JSON array bytes for cached catalog rows, built once per catalog version."""
+    async def encode():
+        return row_encoder.encode(shape, PRODUCT_FIELDS, products)
+    return await catalog_cache.get_or_load(key, encode)
+
+async def _with_onchain_state(chain, products, journeys=False):
+    """Attach live batch state to copies of the (cached) product rows in one RPC round trip."""
     try:
-        user_address = "0xdD2FD4581271e230360230F9337D5c0430Bf44C0"
-        transactions = product_contract.functions.txCounter().call()
-        print(transactions)
-
-    except Exception as e:
-        return {"error": str(e)}
-
-
+        chain = await chain.ready()
+        state = {}
+        if chain is not None:
+            state = await chain.batch_reader.read([product["productId"] for product in products], journeys=journeys)
+    except (httpx.HTTPError, OSError, ValueError, KeyError) as e:
+        logger.warning("On-chain enrichment failed: %s", e, extra={"sample_rate": 0.1})
+        state = {}
+    return [{**product, "onchain": state.get(product["productId"])} for product in products]
+
+# ============= Catalog loaders (results are cached per catalog version) =============
+async def _load_products():
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(PRODUCTS_FOR_SALE)
+        products = await cursor.fetchall()
+    for product in products:
+        product["price"] = str(product["price"])
+    return products
 
+async def _load_limited_products(limit: int):
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(PRODUCTS_FOR_SALE_LIMIT, (limit,))
+        products = await cursor.fetchall()
+    for product in products:
+        product["price"] = str(product["price"])
+    return products
 
+async def _load_product(product_id: int):
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(PRODUCT_BY_ID, (product_id,))
+        product = await cursor.fetchone()
+    if product is not None:
+        product["price"] = str(product["price"])
+    return product
@@ -1,8 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends
-from db.connection import get_connection
-from utils.auth import verify_token
+from fastapi import APIRouter, HTTPException, Depends, Query
+import aiomysql
+from db.async_connection import get_async_connection
+from utils.auth import Principal, verify_token
+from utils.pagination import decode_cursor, encode_cursor
+from utils.rollups import load_summary
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -18,46 +21,141 @@ class Transaction(BaseModel):
     timestamp: datetime
     productName: Optional[str] = None
 
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next: Optional[str] = None  # Opaque cursor for the following page, None on the last one
+
+class TradeTotals(BaseModel):
+    tradeCount: int
+    units: int
+    valueWei: str
+    firstTradeAt: datetime
+    lastTradeAt: datetime
+
+class TradeDay(BaseModel):
+    day: date
+    tradeCount: int
+    units: int
+    valueWei: str
+
+class TradeSummary(BaseModel):
+    totals: Optional[TradeTotals] = None  # None until the first trade
+    daily: List[TradeDay]
+
+class UserTradeSummary(BaseModel):
+    buyer: TradeSummary
+    seller: TradeSummary
+
+
+# One branch per role, so each reads idx_transactions_buyer / idx_transactions_seller in
+# timestamp order instead of merging both indexes for an OR. Self-trades come from the first branch.
+TRANSACTION_HISTORY = """
+    (SELECT t.transactionId, t.productId, t.buyerId, t.sellerId, t.destination,
+        t.quantity, t.timestamp, p.name as productName
+     FROM transactions t
+     LEFT JOIN products p ON t.productId = p.productId
+     WHERE t.buyerId = %s)
+    UNION ALL
+    (SELECT t.transactionId, t.productId, t.buyerId, t.sellerId, t.destination,
+        t.quantity, t.timestamp, p.name as productName
+     FROM transactions t
+     LEFT JOIN products p ON t.productId = p.productId
+     WHERE t.sellerId = %s AND NOT (t.buyerId <=> %s))
+    ORDER BY timestamp DESC
+"""
+
+# Keyset page of one role's history, newest first; (timestamp, transactionId) is the
+# index order of idx_transactions_buyer / idx_transactions_seller, as InnoDB appends the key
+HISTORY_PAGE = """
+    SELECT t.transactionId, t.productId, t.buyerId, t.sellerId, t.destination,
+        t.quantity, t.timestamp, p.name as productName
+    FROM transactions t
+    LEFT JOIN products p ON t.productId = p.productId
+    WHERE t.{column} = %s{after}
+    ORDER BY t.timestamp DESC, t.transactionId DESC
+    LIMIT %s
+"""
+HISTORY_AFTER = " AND (t.timestamp < %s OR (t.timestamp = %s AND t.transactionId < %s))"
+
+HISTORY_COLUMNS = {"purchases": "buyerId", "sales": "sellerId"}
 
 # Get user's own transactions
 @router.get("/user/me", response_model=List[Transaction])
-def get_my_transactions(
-    wallet_address: str = Depends(verify_token),
+async def get_my_transactions(
+    principal: Principal = Depends(verify_token),
 ):
-    print(wallet_address)
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        # Get user ID from wallet address
-        cursor.execute("SELECT userId FROM users WHERE walletAddress = %s", (wallet_address,))
-        user = cursor.fetchone()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user["userId"]
-        
-        # Get user's transactions with product details
-        cursor.execute("""
-            SELECT 
-                t.transactionId, t.productId, t.buyerId, t.sellerId, t.destination, 
-                t.quantity, t.timestamp, 
-                p.name as productName
-            FROM transactions t
-            LEFT JOIN products p ON t.productId = p.productId
-            WHERE t.buyerId = %s or t.sellerId = %s
-            ORDER BY t.timestamp DESC
-        """, (user_id, user_id, ))
-        
-        transactions = cursor.fetchall()
-        print(transactions)
-        return transactions
+    """The caller's whole buy and sell history, newest first.
+
+    Unbounded; prefer the paginated ``/user/me/purchases`` and ``/user/me/sales``.
+    """
+    user_id = principal.user_id
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        try:
+            # Get user's transactions with product details
+            await cursor.execute(TRANSACTION_HISTORY, (user_id, user_id, user_id))
+            return await cursor.fetchall()
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve transactions: {str(e)}")
-    finally:
-        cursor.close()
-        conn.close()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to retrieve transactions: {str(e)}")
+
+@router.get("/user/me/purchases", response_model=TransactionPage)
+async def get_my_purchases(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    principal: Principal = Depends(verify_token),
+):
+    """The caller's purchases, newest first; pass the returned ``next`` back as ``cursor``."""
+    return await _history_page("purchases", principal.user_id, cursor, limit)
+
+@router.get("/user/me/sales", response_model=TransactionPage)
+async def get_my_sales(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    principal: Principal = Depends(verify_token),
+):
+    """The caller's sales, newest first; pass the returned ``next`` back as ``cursor``."""
+    return await _history_page("sales", principal.user_id, cursor, limit)
+
+async def _history_page(role, user_id, cursor, limit):
+    params = [user_id]
+    after = ""
+    if cursor is not None:
+        position = decode_cursor(cursor, "timestamp", "transactionId")
+        try:
+            timestamp = datetime.fromisoformat(position["timestamp"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(position["transactionId"], int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = HISTORY_AFTER
+        params += [timestamp, timestamp, position["transactionId"]]
+    # Fetch one extra row to learn whether another page exists
+    params.append(limit + 1)
+
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(HISTORY_PAGE.format(column=HISTORY_COLUMNS[role], after=after), params)
+        rows = await cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor({"timestamp": last["timestamp"].isoformat(), "transactionId": last["transactionId"]})
+    return {"items": rows, "next": next_cursor}
+
+# ============= Rollups (maintained by buy_product) =============
+@router.get("/user/me/summary", response_model=UserTradeSummary)
+async def get_my_summary(
+    days: int = Query(30, ge=1, le=366),
+    principal: Principal = Depends(verify_token),
+):
+    """The caller's totals and daily buckets for the last ``days`` days, as buyer and as seller."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        return await load_summary(cursor, ("buyer", "seller"), principal.user_id, days)
+
+@router.get("/products/{product_id}/summary", response_model=TradeSummary)
+async def get_product_summary(product_id: int, days: int = Query(30, ge=1, le=366)):
+    """Sales totals and daily buckets for the last ``days`` days of one product."""
+    async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        summary = await load_summary(cursor, ("product",), product_id, days)
+    return summary["product"]
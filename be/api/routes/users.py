@@ -1,98 +1,154 @@
-import os
-import time
 from typing import List
 from fastapi import APIRouter, HTTPException, Depends
-from db.connection import get_connection
+from db.async_connection import get_async_connection
 from schemas.product import ProductCreate, ProductResponse
-import random
-import jwt
-from web3 import Web3
-from eth_account.messages import encode_defunct
-from dotenv import load_dotenv
-
-load_dotenv()
+from core.config import SIGNATURE_CONFIG
+from utils.auth import issue_token, wallet_user_cache
+from utils.nonces import InvalidNonce, ReplayGuardFull, check_nonce, issue_nonce, replay_guard
+from utils.signatures import SignatureQueueFull, signature_verifier
 
 router = APIRouter()
-SECRET_KEY = os.getenv("SECRET_KEY")
-
-w3 = Web3(Web3.HTTPProvider("https://127.0.0.1:8545"))  
 from pydantic import BaseModel
 class VerifySignatureRequest(BaseModel):
     wallet_address: str
+    nonce: str
     signature: str
 
-# Generate a random nonce
-def generate_nonce():
-    return str(random.randint(100000, 999999))
 
+class VerifySignatureBatchRequest(BaseModel):
+    items: List[VerifySignatureRequest]
 
-@router.get("/auth/nonce/{wallet_address}")
-def get_nonce(wallet_address: str):
-    """Generate a nonce and store it in MySQL for the user."""
-    wallet_address = wallet_address.lower()
+# userId of a wallet, creating the user on its first login. LAST_INSERT_ID(userId) makes
+# lastrowid the existing id on a duplicate, so either way it is one statement.
+UPSERT_USER = "INSERT INTO users (walletAddress) VALUES (%s) ON DUPLICATE KEY UPDATE userId = LAST_INSERT_ID(userId)"
 
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = conn.cursor()
 
-    # Check if user exists
-    cursor.execute("SELECT nonce FROM users WHERE walletAddress = %s", (wallet_address,))
-    user = cursor.fetchone()
-    if user:
-        nonce = user[0]  # Use existing nonce
-    else:
-        nonce = generate_nonce()
-        cursor.execute("INSERT INTO users (walletAddress, nonce) VALUES (%s, %s)", (wallet_address, nonce))
-        conn.commit()
+def auth_message(nonce):
+    return f"Sign this message to authenticate: {nonce}"
 
-    cursor.close()
-    conn.close()
 
-    return {"nonce": nonce}
+def too_busy():
+    return HTTPException(status_code=503, detail="Too many logins in progress, retry shortly",
+                         headers={"Retry-After": "1"})
 
 
-@router.post("/auth/verify")
-def verify_signature(request: VerifySignatureRequest):
-    wallet_address = request.wallet_address.lower()
-    signature = request.signature
+async def user_ids_for(wallets):
+    """wallet -> userId for verified wallets, inserting new users; no query for wallets seen recently."""
+    ids = {wallet: wallet_user_cache.get(wallet) for wallet in wallets}
+    missing = [wallet for wallet, user_id in ids.items() if user_id is None]
+    if not missing:
+        return ids
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        if len(missing) == 1:
+            await cursor.execute(UPSERT_USER, (missing[0],))
+            found = {missing[0]: cursor.lastrowid}
+        else:
+            placeholders = ", ".join(["(%s)"] * len(missing))
+            await cursor.execute(f"INSERT IGNORE INTO users (walletAddress) VALUES {placeholders}", missing)
+            placeholders = ", ".join(["%s"] * len(missing))
+            await cursor.execute(
+                f"SELECT walletAddress, userId FROM users WHERE walletAddress IN ({placeholders})", missing
+            )
+            found = dict(await cursor.fetchall())
+        await conn.commit()
+    for wallet, user_id in found.items():
+        wallet_user_cache.set(wallet, user_id)
+    ids.update(found)
+    return ids
 
-    conn = get_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    cursor = conn.cursor()
 
-    # Fetch nonce from MySQL
-    cursor.execute("SELECT nonce FROM users WHERE walletAddress = %s", (wallet_address,))
-    user = cursor.fetchone()
-    if not user:
-        raise HTTPException(status_code=400, detail="Nonce not found")
+@router.get("/auth/nonce/{wallet_address}")
+async def get_nonce(wallet_address: str):
+    """A signed challenge for the wallet to sign; nothing is stored (see utils/nonces.py)."""
+    return {"nonce": issue_nonce(wallet_address.lower())}
 
-    nonce = user[0]
-    message = f"Sign this message to authenticate: {nonce}"
 
-    # Properly encode message using `encode_defunct`
-    encoded_message = encode_defunct(text=message)
+@router.post("/auth/verify")
+async def verify_signature(request: VerifySignatureRequest):
+    wallet_address = request.wallet_address.lower()
+
+    try:
+        mac, expires = check_nonce(wallet_address, request.nonce)
+    except InvalidNonce as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if replay_guard.seen(mac):
+        raise HTTPException(status_code=401, detail="Nonce already used")
 
     try:
-        # Recover signer address 
-        recovered_address = w3.eth.account.recover_message(encoded_message, signature=signature)
-    except Exception as e:
+        # Recover signer address (CPU-bound, so it runs in the signature worker processes)
+        recovered_address = await signature_verifier.recover(auth_message(request.nonce), request.signature)
+    except SignatureQueueFull:
+        raise too_busy()
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid signature: {str(e)}")
 
     if recovered_address.lower() != wallet_address:
         raise HTTPException(status_code=401, detail="Signature verification failed")
 
-    # Generate JWT token
-    token = jwt.encode({"wallet": wallet_address, "exp": time.time() + 3600}, SECRET_KEY, algorithm="HS256")
-
-    # Reset nonce for security (prevent replay attacks)
-    new_nonce = generate_nonce()
-    cursor.execute("UPDATE users SET nonce = %s WHERE walletAddress = %s", (new_nonce, wallet_address))
-    
-    cursor.close()
-    conn.close()
+    try:
+        # Checked again: a concurrent request may have used the nonce while this one was recovering
+        if not replay_guard.claim(mac, expires):
+            raise HTTPException(status_code=401, detail="Nonce already used")
+    except ReplayGuardFull:
+        raise too_busy()
+
+    user_id = (await user_ids_for([wallet_address]))[wallet_address]
+    return {"token": issue_token(wallet_address, user_id)}
+
+
+@router.post("/auth/verify/batch")
+async def verify_signatures(request: VerifySignatureBatchRequest):
+    """Verify many wallet logins at once (a gateway or a test harness replaying logins).
+
+    All signatures are recovered together in the worker processes and new
+    users are inserted with at most two statements for the whole batch.
+    Each item gets ``{"token"}`` or ``{"status", "detail"}`` as the single
+    endpoint would have answered it; the whole request is refused with 503
+    when the signature queue is full.
+    """
+    if len(request.items) > SIGNATURE_CONFIG["max_batch"]:
+        raise HTTPException(status_code=400, detail=f"At most {SIGNATURE_CONFIG['max_batch']} items per request")
+    wallets = [item.wallet_address.lower() for item in request.items]
+    results = [None] * len(wallets)
+
+    checked = []
+    for index, (wallet, item) in enumerate(zip(wallets, request.items)):
+        try:
+            mac, expires = check_nonce(wallet, item.nonce)
+        except InvalidNonce as e:
+            results[index] = {"status": 400, "detail": str(e)}
+            continue
+        if replay_guard.seen(mac):
+            results[index] = {"status": 401, "detail": "Nonce already used"}
+        else:
+            checked.append((index, mac, expires))
 
-    return {"token": token}
\ No newline at end of file
+    try:
+        recovered = await signature_verifier.recover_many(
+            [(auth_message(request.items[index].nonce), request.items[index].signature) for index, _, _ in checked]
+        )
+    except SignatureQueueFull:
+        raise too_busy()
+
+    verified = []
+    for (index, mac, expires), (address, error) in zip(checked, recovered):
+        if error is not None:
+            results[index] = {"status": 400, "detail": f"Invalid signature: {error}"}
+        elif address.lower() != wallets[index]:
+            results[index] = {"status": 401, "detail": "Signature verification failed"}
+        else:
+            try:
+                # Also catches the same nonce twice in one batch
+                claimed = replay_guard.claim(mac, expires)
+            except ReplayGuardFull:
+                raise too_busy()
+            if claimed:
+                verified.append(index)
+            else:
+                results[index] = {"status": 401, "detail": "Nonce already used"}
+
+    if verified:
+        user_ids = await user_ids_for(list(dict.fromkeys(wallets[index] for index in verified)))
+        for index in verified:
+            results[index] = {"token": issue_token(wallets[index], user_ids[wallets[index]])}
+    return {"results": results}
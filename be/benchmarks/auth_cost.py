@@ -0,0 +1,72 @@
+"""Per-request cost of ``utils.auth.verify_token`` with and without the token cache.
+
+Replays a small pool of bearer tokens the way a browser session does and
+times three paths in-process (no HTTP, no database):
+
+- ``decode``: the full check (``jwt.decode`` plus claim validation) on every call
+- ``cached``: ``verify_token`` as the routes call it, so repeats are cache hits
+- ``rotating``: ``verify_token`` with the signing key rotated every
+  ``--rotate-every`` calls, to show the cost of invalidation
+
+    python -m benchmarks.auth_cost --calls 200000 --tokens 50
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import utils.auth as auth
+
+
+async def time_calls(verify, credentials, calls, rotate_every=None):
+    started = time.perf_counter()
+    for i in range(calls):
+        if rotate_every and i and i % rotate_every == 0:
+            # Same key value, so tokens stay valid while the cache is flushed
+            auth.rotate_secret_key(auth.SECRET_KEY)
+        await verify(credentials[i % len(credentials)])
+    elapsed = time.perf_counter() - started
+    return {"calls": calls, "usPerCall": round(elapsed / calls * 1e6, 3), "callsPerSec": round(calls / elapsed)}
+
+
+async def main(args):
+    credentials = [
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=auth.issue_token(f"0x{i:040x}", i + 1))
+        for i in range(args.tokens)
+    ]
+
+    async def decode(cred):
+        return await auth._verify(cred.credentials)
+
+    report = {"decode": await time_calls(decode, credentials, args.calls)}
+    auth.token_cache.bump()
+    report["cached"] = await time_calls(auth.verify_token, credentials, args.calls)
+    report["cacheStats"] = auth.token_cache.stats()
+    auth.token_cache.bump()
+    report["rotating"] = await time_calls(auth.verify_token, credentials, args.calls, args.rotate_every)
+    report["speedup"] = round(report["decode"]["usPerCall"] / report["cached"]["usPerCall"], 1)
+
+    for name in ("decode", "cached", "rotating"):
+        print(f"{name:<9} {report[name]['usPerCall']:>9} us/call  {report[name]['callsPerSec']:>9} calls/s")
+    print(f"speedup x{report['speedup']}, hit ratio {report['cacheStats']['hitRatio']}")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--tokens", type=int, default=20, help="distinct tokens replayed round-robin")
+    parser.add_argument("--rotate-every", type=int, default=1000, help="calls between key rotations")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,158 @@
+"""Bytes on the wire and server CPU of a storefront browse session.
+
+A session is ``--polls`` rounds of ``GET /products/``, ``/products/limit/8``
+and ``/categories/``, as the storefront polls them, with a purchase (a
+catalog version bump) every ``--bump-every`` rounds. It is replayed
+in-process through the full middleware stack, with the catalog cache
+seeded with ``--products`` synthetic rows so no database is needed and only
+HTTP-level costs are measured, by clients that:
+
+- ``before``: send neither Accept-Encoding nor If-None-Match (what every poll cost before)
+- ``gzip`` / ``brotli``: accept that encoding but do not revalidate
+- ``after``: accept brotli and revalidate with the last ETag, as a browser does
+
+Bytes are response bodies as sent plus status line and headers; server CPU
+is the thread CPU time spent inside the app.
+
+    python -m benchmarks.browse_session --polls 200 --products 120
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("INDEXER_ENABLED", "false")
+
+import httpx
+
+import main
+from chain.client import ChainClient
+from utils.cache import catalog_cache
+
+PATHS = ("/products/", "/products/limit/8", "/categories/")
+CLIENTS = {
+    "before": {"Accept-Encoding": "identity"},
+    "gzip": {"Accept-Encoding": "gzip"},
+    "brotli": {"Accept-Encoding": "br"},
+    "after": {"Accept-Encoding": "br, gzip"},
+}
+CATEGORIES = ["Arabica", "Robusta", "Liberica", "Excelsa", "Blend", "Decaf"]
+
+
+def synthetic_products(count, rng):
+    harvest = datetime(2024, 3, 1)
+    return [
+        {
+            "id": i, "productId": 1000 + i, "name": f"{rng.choice(CATEGORIES)} lot {i}",
+            "harvestDate": harvest + timedelta(days=i % 90), "expirationDate": harvest + timedelta(days=365 + i % 90),
+            "currentStatus": "Fresh", "imageSrc": f"{rng.getrandbits(64):016x}.jpg",
+            "thumbnailSrc": f"{rng.getrandbits(64):016x}-thumb.webp", "price": str(rng.randrange(10**15, 10**17)),
+            "categoryName": rng.choice(CATEGORIES),
+            "description": f"Washed process, {rng.randrange(1200, 2200)} m, notes of cocoa and citrus.",
+        }
+        for i in range(count, 0, -1)
+    ]
+
+
+def seed(products):
+    """Put the catalog reads the session makes into the cache (what a warm worker holds)."""
+    catalog_cache.set(("products",), products)
+    catalog_cache.set(("products_limit", 8), products[:8])
+    catalog_cache.set(("categories",), CATEGORIES)
+
+
+class CpuTimedApp:
+    """Adds up the thread CPU time spent inside the wrapped ASGI app."""
+
+    def __init__(self, app):
+        self.app = app
+        self.cpu = 0.0
+
+    async def __call__(self, scope, receive, send):
+        started = time.thread_time()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.cpu += time.thread_time() - started
+
+
+def _wire_bytes(response):
+    head = len(f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n")
+    head += sum(len(name) + len(value) + 4 for name, value in response.headers.raw) + 2
+    return head, response.num_bytes_downloaded
+
+
+async def session(name, args):
+    rng = random.Random(args.seed)
+    products = synthetic_products(args.products, rng)
+    catalog_cache.bump()
+    seed(products)
+    app = CpuTimedApp(main.app)
+    etags = {}
+    totals = {"requests": 0, "notModified": 0, "headerBytes": 0, "bodyBytes": 0}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for poll in range(args.polls):
+            if poll and poll % args.bump_every == 0:
+                # A purchase: stock changes, the version moves, the cached bodies and ETags go
+                product = rng.choice(products)
+                product["description"] = product["description"] + " Restocked."
+                catalog_cache.bump()
+                seed(products)
+            for path in PATHS:
+                headers = dict(CLIENTS[name])
+                if name == "after" and path in etags:
+                    headers["If-None-Match"] = etags[path]
+                response = await client.get(path, headers=headers)
+                if response.status_code not in (200, 304):
+                    raise RuntimeError(f"{path}: {response.status_code} {response.text[:200]}")
+                if "etag" in response.headers:
+                    etags[path] = response.headers["etag"]
+                head, body = _wire_bytes(response)
+                totals["requests"] += 1
+                totals["notModified"] += response.status_code == 304
+                totals["headerBytes"] += head
+                totals["bodyBytes"] += body
+    totals["wireBytes"] = totals["headerBytes"] + totals["bodyBytes"]
+    totals["serverCpuMs"] = round(app.cpu * 1000, 1)
+    totals["cpuUsPerRequest"] = round(app.cpu / totals["requests"] * 1e6, 1)
+    return totals
+
+
+async def run(args):
+    # The lifespan (pools, indexer) is not run; the product routes only need the client object
+    main.app.state.chain = ChainClient()
+    report = {"polls": args.polls, "products": args.products, "bumpEvery": args.bump_every}
+    for name in CLIENTS:
+        report[name] = await session(name, args)
+    before = report["before"]["wireBytes"]
+    print(f"{args.polls} polls x {len(PATHS)} requests, {args.products} products, a purchase every "
+          f"{args.bump_every} polls")
+    for name in CLIENTS:
+        entry = report[name]
+        entry["bytesVsBefore"] = round(entry["wireBytes"] / before, 4)
+        print(f"{name:<7} {entry['wireBytes']:>11} bytes ({entry['bytesVsBefore']:.1%})  "
+              f"{entry['notModified']:>5} x 304  server CPU {entry['serverCpuMs']:>8} ms "
+              f"({entry['cpuUsPerRequest']} us/request)")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--products", type=int, default=120, help="synthetic products in the catalog")
+    parser.add_argument("--bump-every", type=int, default=20, help="polls between purchases")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,87 @@
+"""Cold-start cost of an API worker: the time to ``import main`` in a fresh interpreter.
+
+Each run is a new ``python`` process (as a uvicorn worker would be) with the
+indexer disabled; the slowest imports come from ``-X importtime`` on an
+extra run. Check out the revision to compare and run it again:
+
+    python -m benchmarks.cold_start --runs 10 --json cold.json
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.http_load import percentile
+
+IMPORT_MAIN = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def _env():
+    return {**os.environ, "INDEXER_ENABLED": "false"}
+
+
+def import_seconds(runs):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", IMPORT_MAIN], env=_env(), capture_output=True, text=True,
+                                check=True)
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(top):
+    """(cumulative ms, module) of the ``top`` slowest top-level imports under ``main``."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], env=_env(),
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Two-space indent: imported directly by main
+        if name.startswith("   ") and not name.startswith("     ") and cumulative.strip().isdigit():
+            rows.append((round(int(cumulative) / 1000, 1), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def heavy_modules():
+    """Which of the slow chain libraries ``import main`` pulls in."""
+    check = "import sys, main; print(' '.join(m for m in ('web3', 'eth_account', 'eth_abi') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], env=_env(), capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def main(args):
+    samples = import_seconds(args.runs)
+    report = {
+        "runs": args.runs,
+        "medianMs": round(statistics.median(samples) * 1000, 1),
+        "minMs": round(min(samples) * 1000, 1),
+        "p95Ms": round(percentile(samples, 95) * 1000, 1),
+        "slowestImports": [{"module": name, "ms": ms} for ms, name in slowest_imports(args.top)],
+        "heavyModulesLoaded": heavy_modules(),
+    }
+    print(f"import main: median {report['medianMs']}ms, min {report['minMs']}ms over {args.runs} runs")
+    for entry in report["slowestImports"]:
+        print(f"  {entry['ms']:>8}ms  {entry['module']}")
+    print(f"web3 stack imported at startup: {', '.join(report['heavyModulesLoaded']) or 'none'}")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports of main to list")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
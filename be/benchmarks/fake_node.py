@@ -0,0 +1,126 @@
+"""Local stand-in for the JSON-RPC node, for load tests without Hardhat.
+
+Answers the calls the API makes in request paths: ``eth_call`` of the
+AgriTrade ``batches(id)`` and ``getBatchJourney(id)`` views (synthetic but
+well-formed values derived from the id), ``eth_blockNumber`` (advancing every
+``--block-time`` seconds, so the batch reader's per-block cache behaves as
+it would against a chain), ``eth_chainId`` and an empty ``eth_getLogs``.
+Single requests and JSON-RPC batches are both accepted. ``--latency-ms``
+adds a fixed delay per HTTP request to model a remote node.
+
+    python -m benchmarks.fake_node --port 8545 --latency-ms 5
+
+Run it as a module from the ``be`` directory; benchmarks/suite.py starts it
+on its own unless ``--node-url`` points at a real node.
+"""
+import argparse
+import asyncio
+import time
+
+import uvicorn
+from eth_abi import decode, encode
+from eth_utils import function_abi_to_4byte_selector
+from eth_utils.abi import get_abi_input_types, get_abi_output_types
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from chain.contract import load_agri_trade_abi
+
+CHAIN_ID = 31337
+JOURNEY_LEGS = 2
+
+
+def _address(seed):
+    return "0x" + f"{seed:040x}"[-40:]
+
+
+def _batch(batch_id):
+    return (
+        0, _address(0xA11CE + batch_id), f"Farm {batch_id % 97}", 1000, 1000 - batch_id % 500, True,
+        10**16 + batch_id * 10**12, batch_id, 0, _address(0),
+    )
+
+
+def _journey(batch_id):
+    legs = [
+        (batch_id, _address(0x5417 + leg), f"Stop {leg}", f"Stop {leg + 1}", 1_700_000_000 + leg * 86400, 1, leg,
+         "Synthetic leg")
+        for leg in range(JOURNEY_LEGS)
+    ]
+    return (legs,)
+
+
+_VALUES = {"batches": _batch, "getBatchJourney": _journey}
+
+
+class FakeNode:
+    def __init__(self, abi, block_time=2.0, latency=0.0):
+        self.block_time = block_time
+        self.latency = latency
+        self.started = time.monotonic()
+        self.requests = 0
+        self._functions = {}
+        for entry in abi:
+            if entry.get("type") == "function" and entry.get("name") in _VALUES:
+                self._functions[function_abi_to_4byte_selector(entry)] = (
+                    entry["name"], get_abi_input_types(entry), get_abi_output_types(entry),
+                )
+
+    def block_number(self):
+        return 1000 + int((time.monotonic() - self.started) / self.block_time)
+
+    def _eth_call(self, params):
+        data = bytes.fromhex(params[0]["data"].removeprefix("0x"))
+        function = self._functions.get(data[:4])
+        if function is None:
+            # What a node returns for a selector the contract does not have
+            return "0x"
+        name, input_types, output_types = function
+        (batch_id,) = decode(input_types, data[4:])
+        return "0x" + encode(output_types, _VALUES[name](batch_id)).hex()
+
+    def answer(self, request):
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = request.get("method")
+        if method == "eth_call":
+            reply["result"] = self._eth_call(request["params"])
+        elif method == "eth_blockNumber":
+            reply["result"] = hex(self.block_number())
+        elif method == "eth_chainId":
+            reply["result"] = hex(CHAIN_ID)
+        elif method == "eth_getLogs":
+            reply["result"] = []
+        else:
+            reply["error"] = {"code": -32601, "message": f"Method {method} not supported by the fake node"}
+        return reply
+
+    async def endpoint(self, request: Request):
+        self.requests += 1
+        body = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(body, list):
+            return JSONResponse([self.answer(item) for item in body])
+        return JSONResponse(self.answer(body))
+
+
+def build_app(block_time=2.0, latency=0.0):
+    node = FakeNode(load_agri_trade_abi(), block_time, latency)
+    return Starlette(routes=[Route("/", node.endpoint, methods=["POST"])])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--block-time", type=float, default=2.0, help="seconds between synthetic blocks")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every HTTP request")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    uvicorn.run(build_app(args.block_time, args.latency_ms / 1000), host=args.host, port=args.port,
+                log_level="warning")
@@ -0,0 +1,135 @@
+"""Closed-loop HTTP load generator for the marketplace API.
+
+Drives ``GET /products`` and ``POST /products/buy/{id}`` at increasing
+concurrency and reports requests/sec and latency percentiles. To compare the
+async data path with the old threadpool one, run the pre-async revision on a
+second port and pass it as ``--compare-url``:
+
+    git worktree add ../agri-sync <sync-revision>
+    (cd ../agri-sync/be && uvicorn main:app --port 8001)
+    uvicorn main:app --port 8000
+    python benchmarks/http_load.py --url http://127.0.0.1:8000 \\
+        --compare-url http://127.0.0.1:8001 --product-id 1 --owner 0x...
+
+Run from the ``be`` directory so ``.env`` supplies ``SECRET_KEY``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_WALLET = "0x8626f6940e2eb28930efb4cef49b2d1f2c9c1199"
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    done = len(latencies) + errors
+    return {
+        "requests": done,
+        "errors": errors,
+        "rps": round(done / elapsed, 1) if elapsed else 0.0,
+        "p50Ms": _ms(percentile(latencies, 50)),
+        "p95Ms": _ms(percentile(latencies, 95)),
+        "p99Ms": _ms(percentile(latencies, 99)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def run_load(send, concurrency, duration, ok_statuses=(200,)):
+    """Keep ``concurrency`` clients calling ``send()`` back to back for ``duration`` seconds."""
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                response = await send()
+                ok = response.status_code in ok_statuses
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def make_token(wallet):
+    secret = os.getenv("SECRET_KEY")
+    if not secret:
+        sys.exit("SECRET_KEY is not set; run from the be directory or export it")
+    return jwt.encode({"wallet": wallet, "exp": time.time() + 3600}, secret, algorithm="HS256")
+
+
+async def bench_target(base_url, args):
+    headers = {"Authorization": f"Bearer {make_token(args.wallet)}"}
+    buy_body = {"quantity": 1, "destination": "Benchmark", "owner_address": args.owner}
+    results = {}
+    for concurrency in args.concurrency:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            scenarios = {
+                "GET /products": lambda: client.get("/products/"),
+                "POST /products/buy/{id}": lambda: client.post(
+                    f"/products/buy/{args.product_id}", json=buy_body, headers=headers
+                ),
+            }
+            for name, send in scenarios.items():
+                if name.startswith("POST") and not args.owner:
+                    continue
+                result = await run_load(send, concurrency, args.duration)
+                results.setdefault(name, {})[concurrency] = result
+                print(f"{base_url:<26} {name:<24} c={concurrency:<4} "
+                      f"rps={result['rps']:<8} p99={result['p99Ms']}ms errors={result['errors']}")
+    return results
+
+
+async def main(args):
+    report = {"async": await bench_target(args.url, args)}
+    if args.compare_url:
+        report["sync"] = await bench_target(args.compare_url, args)
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API under test")
+    parser.add_argument("--compare-url", help="second API (e.g. the sync revision) to run the same load against")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 100, 200, 500])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and concurrency level")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--product-id", type=int, default=1, help="productId bought by the buy scenario")
+    parser.add_argument("--owner", help="seller wallet of --product-id; the buy scenario is skipped without it")
+    parser.add_argument("--wallet", default=DEFAULT_WALLET, help="buyer wallet put in the JWT")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
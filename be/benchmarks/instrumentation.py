@@ -0,0 +1,106 @@
+"""Overhead of the metrics instrumentation, in microseconds.
+
+Times, in-process (no sockets, no database):
+
+- ``observe``: one ``Histogram.observe`` call, what every request, statement and RPC pays
+- ``request``: ``GET /`` through the ASGI app with and without ``MetricsMiddleware``
+- ``render``: one ``/metrics`` scrape after ``--series`` distinct route series exist
+
+    python -m benchmarks.instrumentation --requests 20000
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("INDEXER_ENABLED", "false")
+
+import main
+from utils.metrics import MetricsMiddleware, Registry
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+def _scope():
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8000),
+    }
+
+
+async def us_per_request(app, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(_scope(), _receive, _send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def compare_requests(inner, requests, repeat):
+    """Best of ``repeat`` alternating runs, so warm-up and drift hit both sides alike."""
+    timed = MetricsMiddleware(inner)
+    await us_per_request(inner, requests // 10)
+    bare = timed_us = float("inf")
+    for _ in range(repeat):
+        bare = min(bare, await us_per_request(inner, requests))
+        timed_us = min(timed_us, await us_per_request(timed, requests))
+    return round(bare, 2), round(timed_us, 2)
+
+
+def us_per_observe(calls):
+    histogram = Registry().histogram("bench_seconds", "Benchmark.", ("route",))
+    started = time.perf_counter()
+    for _ in range(calls):
+        histogram.observe(0.003, "/products/{product_id}")
+    return round((time.perf_counter() - started) / calls * 1e6, 3)
+
+
+def ms_per_render(series):
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "Benchmark.", ("method", "route", "status"))
+    for i in range(series):
+        histogram.observe(0.003, "GET", f"/route/{i}", 200)
+    started = time.perf_counter()
+    registry.render()
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+async def run(args):
+    # The router, not main.app, whose middleware stack already includes MetricsMiddleware
+    bare, timed = await compare_requests(main.app.router, args.requests, args.repeat)
+    report = {
+        "observeUs": us_per_observe(args.requests * 10),
+        "bareRequestUs": bare,
+        "timedRequestUs": timed,
+        "renderMs": ms_per_render(args.series),
+    }
+    report["middlewareUs"] = round(report["timedRequestUs"] - report["bareRequestUs"], 2)
+    print(f"observe {report['observeUs']} us, GET / {report['bareRequestUs']} us bare vs "
+          f"{report['timedRequestUs']} us timed (+{report['middlewareUs']} us), "
+          f"scrape of {args.series} series {report['renderMs']} ms")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs is reported")
+    parser.add_argument("--series", type=int, default=200, help="route series present when timing a scrape")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
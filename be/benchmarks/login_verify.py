@@ -0,0 +1,120 @@
+"""Wallet login throughput: signature recoveries per second, with and without offload.
+
+Signs ``--signatures`` login messages with throwaway keys, then recovers
+them in-process (no HTTP, no database) with ``--concurrency`` logins in
+flight:
+
+- ``inline``: ``recover_signer`` called on the event loop, as a naive route would
+- ``thread``: ``SignatureVerifier(workers=0)``, one thread of the API process
+- ``process``: ``SignatureVerifier(workers=--workers)``, one signature per call
+- ``batched``: the same pool fed ``--batch`` signatures per ``recover_many``
+
+For each it reports logins/s, logins/s per core used and the event loop's
+lag (how late a 10 ms timer fires), which is what every other request on
+the worker feels while logins are being verified.
+
+    python -m benchmarks.login_verify --signatures 400 --workers 4
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.http_load import percentile
+from utils.signatures import SignatureVerifier, recover_signer
+
+TICK = 0.01
+
+
+def sign_logins(count):
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    pairs = []
+    for i in range(count):
+        account = Account.create()
+        message = f"Sign this message to authenticate: {100000 + i}"
+        pairs.append((message, Account.sign_message(encode_defunct(text=message), account.key).signature.hex()))
+    return pairs
+
+
+async def _ticker(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def timed(recover, chunks, concurrency, cores):
+    """Run ``recover(chunk)`` over ``chunks`` with ``concurrency`` callers while measuring loop lag."""
+    queue = list(chunks)
+    lags, stop = [], asyncio.Event()
+
+    async def caller():
+        while queue:
+            await recover(queue.pop())
+
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    rate = sum(len(chunk) for chunk in chunks) / elapsed
+    return {
+        "loginsPerSec": round(rate, 1),
+        "loginsPerSecPerCore": round(rate / cores, 1),
+        "loopLagP99Ms": round((percentile(lags, 99) or 0) * 1000, 2),
+        "loopLagMaxMs": round(max(lags, default=0) * 1000, 2),
+    }
+
+
+async def main(args):
+    pairs = sign_logins(args.signatures)
+    singles = [[pair] for pair in pairs]
+    batches = [pairs[i:i + args.batch] for i in range(0, len(pairs), args.batch)]
+    thread = SignatureVerifier(workers=0, max_pending=len(pairs))
+    pool = SignatureVerifier(workers=args.workers, max_pending=len(pairs), chunk_size=args.chunk_size)
+    pool.warm()
+
+    async def inline(chunk):
+        return [recover_signer(message, signature) for message, signature in chunk]
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    report = {"signatures": len(pairs), "concurrency": args.concurrency, "cpus": os.cpu_count()}
+    try:
+        report["inline"] = await timed(inline, singles, args.concurrency, 1)
+        report["thread"] = await timed(thread.recover_many, singles, args.concurrency, 1)
+        report["process"] = await timed(pool.recover_many, singles, args.concurrency, cores)
+        report["batched"] = await timed(pool.recover_many, batches, max(1, args.concurrency // args.batch),
+                                        cores)
+    finally:
+        pool.shutdown()
+
+    print(f"{len(pairs)} signatures, {args.concurrency} in flight, {report['cpus']} CPUs, {args.workers} workers")
+    for name in ("inline", "thread", "process", "batched"):
+        entry = report[name]
+        print(f"{name:<8} {entry['loginsPerSec']:>8} logins/s  {entry['loginsPerSecPerCore']:>8} per core  "
+              f"loop lag p99 {entry['loopLagP99Ms']:>7}ms  max {entry['loopLagMaxMs']:>7}ms")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signatures", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="logins in flight")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="signature worker processes")
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=16, help="signatures per recover_many in the batched run")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,140 @@
+"""Contention benchmark for ``POST /products/buy/{id}``.
+
+Creates a fresh product with ``--stock`` units, then releases ``--buyers``
+concurrent requests for one unit each at the same instant. Afterwards it
+checks the books straight from MySQL: the units sold, the rows in
+``transactions`` and the remaining stock must add up, and no more than
+``--stock`` purchases may succeed.
+
+    uvicorn main:app --port 8000
+    python -m benchmarks.purchase_contention --buyers 500 --stock 200
+
+Run it as a module from the ``be`` directory so ``.env`` supplies
+``SECRET_KEY`` and the database settings. The buyer and seller wallets must
+exist in ``users``.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from benchmarks.http_load import DEFAULT_WALLET, make_token, summarize
+from db.async_connection import close_async_pool, get_async_connection
+
+
+async def create_product(client, headers, args, product_id):
+    response = await client.post("/products/", headers=headers, json={
+        "name": f"Contention benchmark {product_id}",
+        "categoryId": args.category_id,
+        "ownerAddress": args.owner,
+        "quantity": args.stock,
+        "price": "1",
+        "productId": product_id,
+        "description": "Created by benchmarks/purchase_contention.py",
+    })
+    response.raise_for_status()
+
+
+async def storm(client, headers, args, product_id):
+    """Fire every buyer at once and tally the outcomes."""
+    body = {"quantity": 1, "destination": "Benchmark", "owner_address": args.owner}
+    start = asyncio.Event()
+    latencies, outcomes = [], {}
+
+    async def buyer():
+        await start.wait()
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"/products/buy/{product_id}", json=body, headers=headers)
+            key = response.status_code
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        outcomes[key] = outcomes.get(key, 0) + 1
+        if key == 200:
+            latencies.append(time.perf_counter() - started)
+
+    tasks = [asyncio.create_task(buyer()) for _ in range(args.buyers)]
+    await asyncio.sleep(0)  # Let every buyer reach the start line
+    started = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return outcomes, summarize(latencies, args.buyers - len(latencies), elapsed), elapsed
+
+
+async def ledger(product_id):
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute("SELECT quantity FROM products WHERE productId = %s", (product_id,))
+        (remaining,) = await cursor.fetchone()
+        await cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(quantity), 0) FROM transactions WHERE productId = %s", (product_id,)
+        )
+        rows, sold = await cursor.fetchone()
+    return remaining, rows, int(sold)
+
+
+async def main(args):
+    headers = {"Authorization": f"Bearer {make_token(args.wallet)}"}
+    limits = httpx.Limits(max_connections=args.buyers, max_keepalive_connections=args.buyers)
+    report = []
+    try:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            for run in range(args.runs):
+                product_id = args.product_id_base + int(time.time() * 1000) % 1_000_000 + run
+                await create_product(client, headers, args, product_id)
+                outcomes, stats, elapsed = await storm(client, headers, args, product_id)
+                remaining, rows, sold = await ledger(product_id)
+                succeeded = outcomes.get(200, 0)
+                consistent = (succeeded == rows == sold == args.stock - remaining
+                              and remaining >= 0 and succeeded <= args.stock)
+                result = {
+                    "productId": product_id,
+                    "buyers": args.buyers,
+                    "stock": args.stock,
+                    "succeeded": succeeded,
+                    "outcomes": {str(k): v for k, v in outcomes.items()},
+                    "remaining": remaining,
+                    "transactionRows": rows,
+                    "unitsSold": sold,
+                    "consistent": consistent,
+                    "elapsedS": round(elapsed, 3),
+                    "purchasesPerSec": round(succeeded / elapsed, 1) if elapsed else 0.0,
+                    "successLatency": stats,
+                }
+                report.append(result)
+                print(f"run {run + 1}: {succeeded}/{args.buyers} bought, remaining={remaining}, "
+                      f"transactions={rows}, {result['purchasesPerSec']} purchases/s, "
+                      f"p99={stats['p99Ms']}ms, outcomes={result['outcomes']}, "
+                      f"{'OK' if consistent else 'OVERSOLD / INCONSISTENT'}")
+    finally:
+        await close_async_pool()
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+    if not all(result["consistent"] for result in report):
+        sys.exit(1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API under test")
+    parser.add_argument("--buyers", type=int, default=500, help="concurrent buy requests per run")
+    parser.add_argument("--stock", type=int, default=200, help="units on the product at the start of a run")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--category-id", type=int, default=1)
+    parser.add_argument("--product-id-base", type=int, default=900_000_000,
+                        help="benchmark products get productIds above this")
+    parser.add_argument("--wallet", default=DEFAULT_WALLET, help="buyer wallet put in the JWT")
+    parser.add_argument("--owner", default=DEFAULT_WALLET, help="seller wallet of the benchmark product")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,116 @@
+"""Latency of ``GET /products/search`` queries against the in-process index.
+
+Builds the index from synthetic catalog rows (no database needed) and runs a
+query mix with the result cache bypassed, so every query does the full
+match, rank and facet work. Reports build time and per-query p50/p95/p99.
+
+    python -m benchmarks.search --products 100000
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.http_load import percentile
+from core.config import SEARCH_CONFIG
+from utils.search import ProductSearchIndex, _IndexData
+
+CATEGORIES = ["Arabica", "Robusta", "Espresso", "Liberica", "Excelsa", "Maragogype", "Pacamara", "Caturra"]
+REGIONS = ["Colombia", "Ethiopia", "Guatemala", "Brazil", "Kenya", "Dak Lak", "Lam Dong", "Sumatra"]
+WORDS = ("washed natural honey anaerobic citrus cocoa caramel jasmine berry nutty floral bright syrupy "
+         "smooth bold sweet earthy spicy peach lemon chocolate vanilla roast medium light dark").split()
+
+QUERIES = {
+    "common term": {"q": "arabica"},
+    "prefix": {"q": "ara"},
+    "two terms": {"q": "ethiopia jasmine"},
+    "prefix two terms": {"q": "washed choc"},
+    "rare term": {"q": "lot 4242"},
+    "term + facets": {"q": "honey", "category": "Robusta", "region": "Kenya"},
+    "term + price": {"q": "caramel", "min_price": 50_000_000_000_000_000, "max_price": 150_000_000_000_000_000},
+    "browse, no query": {},
+    "browse by category": {"category": "Pacamara"},
+    "deep page": {"q": "berry", "offset": 480},
+    "no match": {"q": "zzzz"},
+}
+
+
+def make_rows(count, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        category, region = rng.choice(CATEGORIES), rng.choice(REGIONS)
+        rows.append({
+            "id": i + 1,
+            "productId": i + 1,
+            "name": f"{rng.choice(WORDS).title()} {category} lot {i}",
+            "harvestDate": start + timedelta(days=i % 365),
+            "expirationDate": start + timedelta(days=365 + i % 365),
+            "currentStatus": rng.choice(["Fresh", "Fresh", "Fresh", "Expired"]),
+            "imageSrc": None,
+            "thumbnailSrc": None,
+            "price": str(int(rng.uniform(0.01, 0.2) * 10**18)),
+            "categoryName": category,
+            "description": f"A {' '.join(rng.sample(WORDS, 4))} coffee from {region}.",
+            "quantity": rng.randint(1, 500),
+            "ownerAddress": "0x8626f6940e2eb28930efb4cef49b2d1f2c9c1199",
+            "region": region,
+        })
+    return rows
+
+
+async def main(args):
+    rows = make_rows(args.products)
+    index = ProductSearchIndex(**SEARCH_CONFIG)
+    started = time.perf_counter()
+    index._data = _IndexData.build(rows, index.price_buckets)
+    build_s = time.perf_counter() - started
+    print(f"indexed {args.products} products in {build_s:.2f}s "
+          f"({len(index._data.postings)} terms)")
+
+    report = {"products": args.products, "buildS": round(build_s, 2), "queries": {}}
+    for name, params in QUERIES.items():
+        params = {"q": "", "category": None, "region": None, "status": None,
+                  "min_price": None, "max_price": None, "limit": 24, "offset": 0, **params}
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            result = await index._run(**params)
+            samples.append(time.perf_counter() - t0)
+        stats = {
+            "total": result["total"],
+            "p50Ms": round(percentile(samples, 50) * 1000, 3),
+            "p95Ms": round(percentile(samples, 95) * 1000, 3),
+            "p99Ms": round(percentile(samples, 99) * 1000, 3),
+        }
+        report["queries"][name] = stats
+        print(f"{name:<20} matches={stats['total']:<7} p50={stats['p50Ms']}ms "
+              f"p95={stats['p95Ms']}ms p99={stats['p99Ms']}ms")
+
+    # One create_product / buy_product style update each, for the incremental path
+    t0 = time.perf_counter()
+    index._data.add({**rows[0], "productId": args.products + 1, "id": args.products + 1, "name": "Fresh arrival"})
+    report["incrementalAddMs"] = round((time.perf_counter() - t0) * 1000, 3)
+    print(f"incremental add {report['incrementalAddMs']}ms")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
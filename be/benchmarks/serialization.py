@@ -0,0 +1,118 @@
+"""Serialization cost of the catalog list endpoints, in microseconds per row.
+
+Compares, for synthetic rows shaped like ``GET /products/page`` results:
+
+- ``pydantic``: what FastAPI does with ``response_model=List[ProductResponse]``
+  (validate every row, ``jsonable_encoder``, stdlib ``json``)
+- ``fastCold``: ``utils.fastjson.RowEncoder`` right after a catalog write,
+  when every row is encoded with orjson for the first time
+- ``fastWarm``: the same encoder once the rows are cached for the version
+
+    python -m benchmarks.serialization --rows 1000 10000 100000
+
+Run it as a module from the ``be`` directory.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+import main
+from api.routes.products import PRODUCT_FIELDS
+from utils.cache import CatalogCache
+from utils.fastjson import RowEncoder
+
+
+def make_rows(count):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "productId": 100000 + i,
+            "name": f"Arabica lot {i}",
+            "harvestDate": start + timedelta(days=i % 365),
+            "expirationDate": start + timedelta(days=365 + i % 365),
+            "currentStatus": "Fresh",
+            "imageSrc": f"{i:064x}.jpg",
+            "thumbnailSrc": f"/images/variants/{i:064x}_320.webp",
+            "price": str(random.randint(1, 10**18)),
+            "categoryName": random.choice(["Arabica", "Robusta", "Liberica"]),
+            "description": "Washed process, notes of citrus and cocoa",
+            "quantity": random.randint(1, 500),
+            "ownerAddress": "0x8626f6940e2eb28930efb4cef49b2d1f2c9c1199",
+            "region": random.choice(["Dak Lak", "Lam Dong", "Gia Lai"]),
+        }
+        for i in range(count)
+    ]
+
+
+def response_field():
+    for route in main.app.routes:
+        if getattr(route, "path", None) == "/products/" and "GET" in route.methods:
+            return route.response_field
+    raise RuntimeError("GET /products/ route not found")
+
+
+async def per_row_us(fn, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best / len(rows) * 1e6, 3)
+
+
+async def main_async(args):
+    field = response_field()
+    report = {}
+    for count in args.rows:
+        rows = make_rows(count)
+
+        async def pydantic_path():
+            content = await serialize_response(field=field, response_content=rows)
+            return JSONResponse(content).body
+
+        async def fast_cold():
+            return RowEncoder(CatalogCache()).encode("bench", PRODUCT_FIELDS, rows)
+
+        warm = RowEncoder(CatalogCache())
+        warm.encode("bench", PRODUCT_FIELDS, rows)
+
+        async def fast_warm():
+            return warm.encode("bench", PRODUCT_FIELDS, rows)
+
+        # Both paths must produce the same document
+        assert json.loads(await pydantic_path()) == json.loads(await fast_cold())
+
+        result = {
+            "pydantic": await per_row_us(pydantic_path, rows, args.repeat),
+            "fastCold": await per_row_us(fast_cold, rows, args.repeat),
+            "fastWarm": await per_row_us(fast_warm, rows, args.repeat),
+        }
+        result["speedupCold"] = round(result["pydantic"] / result["fastCold"], 1)
+        result["speedupWarm"] = round(result["pydantic"] / result["fastWarm"], 1)
+        report[count] = result
+        print(f"rows={count:<7} pydantic={result['pydantic']}us/row  fastCold={result['fastCold']}us/row "
+              f"(x{result['speedupCold']})  fastWarm={result['fastWarm']}us/row (x{result['speedupWarm']})")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs is reported")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
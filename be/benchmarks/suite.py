@@ -0,0 +1,306 @@
+"""End-to-end load test of the API against local stand-ins, with a JSON report.
+
+Starts ``benchmarks/fake_node.py`` in place of the chain node and the API
+itself (uvicorn, indexer off) pointed at it, optionally seeds the configured
+MySQL with a synthetic dataset, then drives each scenario at each
+concurrency level with closed-loop clients:
+
+- ``browse``: ``GET /products/``
+- ``detail`` / ``detailOnchain``: ``GET /products/{id}`` without and with ``?onchain=true``
+- ``login``: ``GET /users/auth/nonce/{wallet}`` then a signed ``POST /users/auth/verify``
+- ``cart``: ``GET /cart/`` for users that have cart rows
+- ``buy``: ``POST /products/buy/{id}`` of one unit, spread over ``--buy-products`` products
+- ``images``: ``GET /images/coffee-pictures/{file}`` over the uploaded pictures
+
+The report holds throughput, error counts and p50/p95/p99 per scenario and
+concurrency, the git revision and the run settings. ``--compare`` prints
+the change between two reports, so two commits can be measured the same way:
+
+    python -m benchmarks.suite --seed-products 20000 --json before.json
+    git checkout <other revision>
+    python -m benchmarks.suite --json after.json
+    python -m benchmarks.suite --compare before.json after.json
+
+Run it as a module from the ``be`` directory so ``.env`` supplies
+``SECRET_KEY`` and the database settings. There is no in-process stand-in
+for MySQL: point ``DB_NAME`` at a scratch database, since seeding inserts
+rows and the buy scenario tops up and sells stock.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from benchmarks.http_load import run_load
+from core.config import IMAGE_CONFIG
+from db.connection import get_connection
+from db.explain_check import seed
+from utils.auth import issue_token
+
+SCENARIOS = ("browse", "detail", "detailOnchain", "login", "cart", "buy", "images")
+BUY_STOCK = 10**9
+
+
+# ============= Processes =============
+def start_process(module_args, env=None):
+    return subprocess.Popen([sys.executable, "-m", *module_args], env={**os.environ, **(env or {})})
+
+
+async def wait_ready(check, what, timeout):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while True:
+            try:
+                if await check(client):
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit(f"{what} did not become ready within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+async def node_ready(client, url):
+    response = await client.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []})
+    return response.status_code == 200
+
+
+async def api_ready(client, url):
+    response = await client.get(f"{url}/health/db")
+    return response.status_code == 200 and response.json()["pool"] is not None
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision.strip() + ("-dirty" if dirty.strip() else "")
+
+
+# ============= Dataset =============
+def load_fixtures(args):
+    """Ids, wallets and tokens the scenarios pick from, read from the (seeded) database."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT productId FROM products WHERE isForSale = 1 ORDER BY productId DESC LIMIT %s",
+                       (args.sample_products,))
+        product_ids = [row[0] for row in cursor.fetchall()]
+        if not product_ids:
+            raise SystemExit("No products for sale; seed the database first (--seed-products)")
+
+        # Products the buy scenario sells from, topped up so a run never sells out
+        cursor.execute("""
+            SELECT products.productId, users.walletAddress FROM products
+            INNER JOIN users ON users.walletAddress = products.ownerAddress
+            WHERE products.isForSale = 1 ORDER BY products.productId DESC LIMIT %s
+        """, (args.buy_products,))
+        buy_targets = cursor.fetchall()
+        if buy_targets:
+            cursor.executemany("UPDATE products SET quantity = %s WHERE productId = %s",
+                               [(BUY_STOCK, product_id) for product_id, _ in buy_targets])
+            conn.commit()
+
+        cursor.execute("SELECT userId, walletAddress FROM users ORDER BY userId LIMIT %s", (args.users,))
+        buyers = cursor.fetchall()
+        cursor.execute("""
+            SELECT users.userId, users.walletAddress FROM users
+            WHERE users.userId IN (SELECT userId FROM shoppingCart) ORDER BY users.userId LIMIT %s
+        """, (args.users,))
+        cart_users = cursor.fetchall()
+        cursor.close()
+
+    upload_dir = IMAGE_CONFIG["upload_dir"]
+    images = sorted(name for name in os.listdir(upload_dir) if os.path.isfile(os.path.join(upload_dir, name)))
+    return {
+        "productIds": product_ids,
+        "buyTargets": buy_targets,
+        "buyerTokens": [issue_token(wallet, user_id) for user_id, wallet in buyers],
+        "cartTokens": [issue_token(wallet, user_id) for user_id, wallet in cart_users],
+        # Deterministic keys, so repeated runs log in as the same users
+        "accounts": [Account.from_key((i + 1).to_bytes(32, "big")) for i in range(args.login_accounts)],
+        "images": images[:args.sample_images],
+    }
+
+
+# ============= Scenarios =============
+class Login:
+    """Nonce + signed verify. Every nonce is new, so the client signs each one (a few ms here)."""
+
+    def __init__(self, client, accounts, rng):
+        self.client = client
+        self.accounts = accounts
+        self.rng = rng
+
+    def _sign(self, account, nonce):
+        message = encode_defunct(text=f"Sign this message to authenticate: {nonce}")
+        return "0x" + bytes(account.sign_message(message).signature).hex()
+
+    async def __call__(self):
+        account = self.rng.choice(self.accounts)
+        wallet = account.address.lower()
+        response = await self.client.get(f"/users/auth/nonce/{wallet}")
+        if response.status_code != 200:
+            return response
+        nonce = response.json()["nonce"]
+        return await self.client.post("/users/auth/verify", json={"wallet_address": wallet, "nonce": nonce,
+                                                                  "signature": self._sign(account, nonce)})
+
+
+def build_scenarios(client, fixtures, rng):
+    """name -> zero-argument coroutine function sending one request (or one login)."""
+    def bearer(tokens):
+        return {"Authorization": f"Bearer {rng.choice(tokens)}"}
+
+    async def buy():
+        product_id, owner = rng.choice(fixtures["buyTargets"])
+        return await client.post(f"/products/buy/{product_id}", headers=bearer(fixtures["buyerTokens"]),
+                                 json={"quantity": 1, "destination": "Benchmark", "owner_address": owner})
+
+    scenarios = {
+        "browse": lambda: client.get("/products/"),
+        "detail": lambda: client.get(f"/products/{rng.choice(fixtures['productIds'])}"),
+        "detailOnchain": lambda: client.get(f"/products/{rng.choice(fixtures['productIds'])}?onchain=true"),
+        "login": Login(client, fixtures["accounts"], rng),
+    }
+    if fixtures["cartTokens"]:
+        scenarios["cart"] = lambda: client.get("/cart/", headers=bearer(fixtures["cartTokens"]))
+    if fixtures["buyTargets"] and fixtures["buyerTokens"]:
+        scenarios["buy"] = buy
+    if fixtures["images"]:
+        scenarios["images"] = lambda: client.get(f"/images/coffee-pictures/{rng.choice(fixtures['images'])}")
+    return scenarios
+
+
+async def run_suite(base_url, fixtures, args):
+    rng = random.Random(args.seed)
+    results = {}
+    for concurrency in args.concurrency:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            scenarios = build_scenarios(client, fixtures, rng)
+            for name in args.scenarios:
+                if name not in scenarios:
+                    print(f"{name:<14} skipped: the dataset has nothing for it")
+                    continue
+                # Untimed warm-up: fills caches and, for logins, creates the users
+                await run_load(scenarios[name], concurrency, args.warmup)
+                result = await run_load(scenarios[name], concurrency, args.duration)
+                results.setdefault(name, {})[str(concurrency)] = result
+                print(f"{name:<14} c={concurrency:<4} rps={result['rps']:<8} p50={result['p50Ms']}ms "
+                      f"p95={result['p95Ms']}ms p99={result['p99Ms']}ms errors={result['errors']}")
+    return results
+
+
+# ============= Reports =============
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    for name, levels in after["results"].items():
+        for concurrency, result in levels.items():
+            old = before["results"].get(name, {}).get(concurrency)
+            if old is None:
+                continue
+            changes = []
+            for key in ("rps", "p50Ms", "p95Ms", "p99Ms"):
+                if old[key] and result[key] is not None:
+                    changes.append(f"{key} {old[key]} -> {result[key]} ({(result[key] / old[key] - 1) * 100:+.1f}%)")
+            print(f"{name:<14} c={concurrency:<4} " + "  ".join(changes))
+
+
+async def main(args):
+    processes = []
+    try:
+        node_url = args.node_url
+        if node_url is None:
+            node_url = f"http://127.0.0.1:{args.node_port}"
+            processes.append(start_process(["benchmarks.fake_node", "--port", str(args.node_port),
+                                             "--latency-ms", str(args.node_latency_ms)]))
+            await wait_ready(lambda client: node_ready(client, node_url), "fake node", args.startup_timeout)
+
+        if args.seed_products:
+            seed(args.seed_products)
+        fixtures = load_fixtures(args)
+
+        base_url = args.api_url
+        if base_url is None:
+            base_url = f"http://127.0.0.1:{args.port}"
+            processes.append(start_process(
+                ["uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+                env={"WEB3_PROVIDER_URL": node_url, "INDEXER_ENABLED": "false"},
+            ))
+        await wait_ready(lambda client: api_ready(client, base_url), "API", args.startup_timeout)
+
+        report = {
+            "revision": git_revision(),
+            "startedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "settings": {
+                "concurrency": args.concurrency,
+                "durationS": args.duration,
+                "nodeLatencyMs": args.node_latency_ms if args.node_url is None else None,
+                "seededProducts": args.seed_products,
+                "sampleProducts": len(fixtures["productIds"]),
+            },
+            "results": await run_suite(base_url, fixtures, args),
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Wrote {args.json}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two reports and exit")
+    parser.add_argument("--api-url", help="use an API that is already running instead of starting one")
+    parser.add_argument("--port", type=int, default=8000, help="port for the API the suite starts")
+    parser.add_argument("--node-url", help="use this JSON-RPC node instead of starting the fake one")
+    parser.add_argument("--node-port", type=int, default=8545)
+    parser.add_argument("--node-latency-ms", type=float, default=2.0, help="fake node delay per request")
+    parser.add_argument("--seed-products", type=int, default=0, help="insert this many synthetic products first")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="untimed seconds before each measurement")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--sample-products", type=int, default=1000, help="products the detail scenarios pick from")
+    parser.add_argument("--buy-products", type=int, default=50, help="products the buy scenario spreads over")
+    parser.add_argument("--users", type=int, default=200, help="buyers and cart owners to issue tokens for")
+    parser.add_argument("--login-accounts", type=int, default=100)
+    parser.add_argument("--sample-images", type=int, default=200)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the request mix")
+    parser.add_argument("--json", help="write the report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.compare:
+        compare(*arguments.compare)
+    else:
+        asyncio.run(main(arguments))
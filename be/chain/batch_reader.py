@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import json
+import time
+
+from eth_abi import decode
+from eth_abi.exceptions import DecodingError
+from eth_utils.abi import get_abi_output_types
+from web3 import AsyncWeb3
+
+BATCH_STATES = ("Available", "Purchased", "Shipped", "Delivered", "Transferred")
+SHIPMENT_STATUSES = ("NotShipped", "InTransit", "Delivered", "Confirmed", "Disputed")
+
+
+def _enum_name(names, value):
+    return names[value] if value < len(names) else str(value)
+
+
+def _format_batch(values):
+    parent_id, creator, location, quantity, available, is_for_sale, price, origin_id, state, pending_owner = values
+    return {
+        "parentId": parent_id,
+        "creator": creator,
+        "location": location,
+        "quantity": quantity,
+        "available": available,
+        "isForSale": is_for_sale,
+        "price": str(price),
+        "originId": origin_id,
+        "state": _enum_name(BATCH_STATES, state),
+        "pendingOwner": pending_owner,
+    }
+
+
+def _format_journey(values):
+    return [
+        {
+            "batchId": batch_id,
+            "shipper": shipper,
+            "from": origin,
+            "to": destination,
+            "timestamp": timestamp,
+            "status": _enum_name(SHIPMENT_STATUSES, status),
+            "legIndex": leg_index,
+            "details": details,
+        }
+        for batch_id, shipper, origin, destination, timestamp, status, leg_index, details in values[0]
+    ]
+
+
+_FORMATTERS = {"batches": _format_batch, "getBatchJourney": _format_journey}
+
+
+def _replies_by_id(replies):
+    """Map a batch reply to ``{id: reply}``; servers may answer a batch in any order."""
+    if not isinstance(replies, list) or not all(isinstance(reply, dict) for reply in replies):
+        # A node that rejects the whole batch answers with a single error object
+        error = replies.get("error") if isinstance(replies, dict) else replies
+        raise ValueError(f"Batch call failed: {error!r}")
+    return {reply.get("id"): reply for reply in replies}
+
+
+class BatchReader:
+    """Reads ``batches(id)`` and ``getBatchJourney(id)`` for many ids in one JSON-RPC batch.
+
+    Every ``read`` costs at most one HTTP round trip: the ``eth_call``s for all
+    uncached ids go out as a single JSON-RPC array. Results are cached for the
+    block they were read at; the block number rides along in the same batch
+    whenever the last known one is older than ``block_ttl`` seconds, and a new
+    block empties the cache.
+
+    Concurrent reads coalesce: ids another request is already fetching are
+    awaited rather than asked for again, so a burst of requests for the same
+    products costs one round trip.
+
+    web3's own ``batch_requests()`` flags the whole provider as batching, which
+    is unsafe with concurrent requests on one client, so the batch is built
+    here and posted through the shared ``chain.rpc.RpcSession``.
+    """
+
+    def __init__(self, contract, session, block_ttl=1.0):
+        self.contract = contract
+        self.session = session
+        self.block_ttl = block_ttl
+        self._output_types = {
+            entry["name"]: get_abi_output_types(entry)
+            for entry in contract.abi
+            if entry.get("type") == "function" and entry.get("name") in _FORMATTERS
+        }
+        self._ids = itertools.count(1)
+        self._block = None
+        self._block_seen_at = 0.0
+        self._values = {}  # (function name, batch id) -> formatted result at self._block
+        self._pending = {}  # (function name, batch id) -> future done when its fetch finishes
+        self.round_trips = 0
+        self.calls = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+
+    def _call_payload(self, function_name, batch_id, block_tag):
+        return {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": "eth_call",
+            "params": [
+                {"to": self.contract.address, "data": self.contract.encode_abi(function_name, args=[batch_id])},
+                block_tag,
+            ],
+        }
+
+    async def read(self, batch_ids, journeys=False):
+        """Return ``{batch_id: {"batch": {...}, "journey": [...]}}`` for the requested ids."""
+        keys = [("batches", batch_id) for batch_id in batch_ids]
+        if journeys:
+            keys += [("getBatchJourney", batch_id) for batch_id in batch_ids]
+
+        fresh = self._block is not None and time.monotonic() - self._block_seen_at < self.block_ttl
+        missing = [key for key in dict.fromkeys(keys) if not fresh or key not in self._values]
+        self.cache_hits += len(keys) - len(missing)
+
+        joined = [self._pending[key] for key in missing if key in self._pending]
+        fetch = [key for key in missing if key not in self._pending]
+        self.coalesced += len(joined)
+        if fetch:
+            await self._fetch(fetch, fresh)
+        if joined:
+            # Never raises: a failed shared fetch just leaves those ids without state
+            await asyncio.wait(joined)
+
+        state = {}
+        for batch_id in batch_ids:
+            entry = {"batch": self._values.get(("batches", batch_id))}
+            if journeys:
+                entry["journey"] = self._values.get(("getBatchJourney", batch_id))
+            state[batch_id] = entry
+        return state
+
+    async def _fetch(self, keys, fresh):
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._pending.update(futures)
+        try:
+            block_tag = hex(self._block) if fresh else "latest"
+            payload = [self._call_payload(name, batch_id, block_tag) for name, batch_id in keys]
+            if not fresh:
+                block_request = {"jsonrpc": "2.0", "id": next(self._ids), "method": "eth_blockNumber", "params": []}
+                payload.append(block_request)
+
+            body = await self.session.post(json.dumps(payload).encode(), "batch")
+            self.round_trips += 1
+            self.calls += len(payload)
+            replies = _replies_by_id(json.loads(body))
+
+            if not fresh:
+                block_reply = replies.get(block_request["id"], {})
+                if "result" not in block_reply:
+                    raise ValueError(f"eth_blockNumber failed: {block_reply.get('error', 'no reply')}")
+                block = int(block_reply["result"], 16)
+                if block != self._block:
+                    self._values = {}
+                self._block = block
+                self._block_seen_at = time.monotonic()
+
+            for request, (name, batch_id) in zip(payload, keys):
+                reply = replies.get(request["id"], {})
+                if "result" not in reply:
+                    continue
+                try:
+                    values = decode(self._output_types[name], AsyncWeb3.to_bytes(hexstr=reply["result"]))
+                except DecodingError:
+                    continue  # Empty "0x" result: no contract code at that address/block
+                self._values[(name, batch_id)] = _FORMATTERS[name](values)
+        finally:
+            for key, future in futures.items():
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+                future.set_result(None)
+
+    def stats(self):
+        return {
+            "block": self._block,
+            "cachedResults": len(self._values),
+            "roundTrips": self.round_trips,
+            "calls": self.calls,
+            "cacheHits": self.cache_hits,
+            "coalesced": self.coalesced,
+        }
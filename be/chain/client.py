@@ -0,0 +1,78 @@
+"""The API's shared web3 client, AgriTrade contract and batch reader.
+
+All three talk to the node through one ``chain.rpc.RpcSession`` (keep-alive
+connections, timeouts, retries), and identical concurrent reads share a
+single request (see chain/rpc.py and chain/batch_reader.py).
+
+Importing web3 takes well over a second, so no API module imports it at
+load time. ``main``'s lifespan creates one ``ChainClient`` on
+``app.state.chain`` and builds it in a worker thread while the server
+already accepts requests; routes get it with ``Depends(get_chain)`` and
+``await chain.ready()`` the parts they use, which waits for the same build
+if it has not finished yet.
+
+Without ``AGRI_TRADE_ADDRESS`` nothing is built and ``ready()`` returns None.
+"""
+import asyncio
+import threading
+
+from fastapi import Request
+
+from chain.contract import load_used_abi
+from core.config import AGRI_TRADE_ADDRESS, RPC_CONFIG, WEB3_PROVIDER_URL
+
+
+class ChainClient:
+    def __init__(self, provider_url=WEB3_PROVIDER_URL, contract_address=AGRI_TRADE_ADDRESS, rpc_config=RPC_CONFIG):
+        self.provider_url = provider_url
+        self.contract_address = contract_address
+        self.rpc_config = rpc_config
+        self.session = None
+        self.w3 = None
+        self.contract = None
+        self.batch_reader = None
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.contract_address)
+
+    def build(self):
+        """Import web3 and create the client, contract and reader. Blocking and idempotent."""
+        with self._lock:
+            if self.batch_reader is None and self.configured:
+                from web3 import AsyncWeb3
+
+                from chain.batch_reader import BatchReader
+                from chain.rpc import RpcSession, SharedSessionProvider
+
+                config = self.rpc_config
+                session = RpcSession(self.provider_url, **config)
+                w3 = AsyncWeb3(SharedSessionProvider(session, config["block_ttl"], config["cache_entries"]))
+                contract = w3.eth.contract(address=AsyncWeb3.to_checksum_address(self.contract_address),
+                                           abi=load_used_abi())
+                self.session, self.w3, self.contract = session, w3, contract
+                # Set last: a non-None reader means the whole client is usable
+                self.batch_reader = BatchReader(contract, session, config["block_ttl"])
+        return self
+
+    async def ready(self):
+        """This client once built (off the event loop), or None when no contract address is configured."""
+        if not self.configured:
+            return None
+        if self.batch_reader is None:
+            await asyncio.to_thread(self.build)
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def stats(self):
+        if self.batch_reader is None:
+            return None
+        return {**self.batch_reader.stats(), "retries": self.session.retried, "provider": self.w3.provider.stats()}
+
+
+def get_chain(request: Request) -> ChainClient:
+    return request.app.state.chain
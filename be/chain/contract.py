@@ -0,0 +1,67 @@
+import json
+import os
+
+from core.config import AGRI_TRADE_ARTIFACT
+
+# Relative artifact paths are resolved against the be directory, not the working directory
+BE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The parts of the ABI the API reads (chain/batch_reader.py) and indexes (chain/indexer.py)
+USED_FUNCTIONS = ("batches", "getBatchJourney")
+INDEXED_EVENTS = ("BatchCreated", "BatchPurchased", "BatchTransformed", "ShipmentLeg", "PurchaseConfirmed")
+
+
+def artifact_path(path=AGRI_TRADE_ARTIFACT):
+    return os.path.normpath(os.path.join(BE_DIR, path))
+
+
+def load_agri_trade_abi(path=AGRI_TRADE_ARTIFACT):
+    """Read the AgriTrade ABI out of the Hardhat build artifact."""
+    with open(artifact_path(path), 'r') as file:
+        contract_data = json.load(file)
+    return contract_data.get("abi")
+
+
+def trim_abi(abi):
+    return [
+        entry for entry in abi
+        if (entry.get("type") == "function" and entry.get("name") in USED_FUNCTIONS)
+        or (entry.get("type") == "event" and entry.get("name") in INDEXED_EVENTS)
+    ]
+
+
+_used_abi = None
+
+
+def load_used_abi(path=AGRI_TRADE_ARTIFACT):
+    """The trimmed ABI (``USED_FUNCTIONS`` and ``INDEXED_EVENTS``) the API builds its contract from.
+
+    The full artifact also carries bytecode and every other function, so the
+    trimmed copy is kept next to it as ``<name>.used-abi.json`` and reused
+    while the artifact's size and mtime are unchanged (Hardhat rewrites the
+    artifact on every compile). Loaded once per process.
+    """
+    global _used_abi
+    if _used_abi is not None:
+        return _used_abi
+    source = artifact_path(path)
+    stat = os.stat(source)
+    key = f"{stat.st_size}:{stat.st_mtime_ns}"
+    cache = os.path.splitext(source)[0] + ".used-abi.json"
+    try:
+        with open(cache, "r") as file:
+            cached = json.load(file)
+        if cached.get("source") == key:
+            _used_abi = cached["abi"]
+            return _used_abi
+    except (OSError, ValueError):
+        pass
+
+    abi = trim_abi(load_agri_trade_abi(path))
+    try:
+        with open(cache, "w") as file:
+            json.dump({"source": key, "abi": abi}, file)
+    except OSError:
+        pass  # Read-only checkout: trim again next start
+    _used_abi = abi
+    return _used_abi
@@ -0,0 +1,299 @@
+"""Background indexer for AgriTrade contract events.
+
+Tails the contract's batch, purchase and shipment events in block ranges,
+stores them in ``chainEvents`` and keeps a checkpoint in ``chainCheckpoint``
+so restarts resume where they stopped. The hashes of recently indexed blocks
+are kept in ``chainBlocks``; when the node's hash for the checkpoint block no
+longer matches (a reorg, or a restarted Hardhat/anvil node), the index is
+rewound to the newest block both sides still agree on and re-read from there.
+
+Runs inside the API process (see ``start_indexer``) or standalone against a
+local node:
+
+    python -m chain.indexer          # follow the chain
+    python -m chain.indexer --once   # index up to the current head and exit
+"""
+import argparse
+import asyncio
+import json
+
+from chain.client import ChainClient
+from chain.contract import INDEXED_EVENTS
+from core.config import INDEXER_CONFIG
+from db.async_connection import get_async_connection
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+CHECKPOINT_NAME = "AgriTrade"
+
+
+def _event_columns(name, args):
+    """Pick (batchId, relatedBatchId, txId, account) out of an event's arguments."""
+    if name == "BatchCreated":
+        return args["id"], args["parentId"] or None, None, args["owner"]
+    if name == "BatchPurchased":
+        return args["batchId"], None, args["txId"], args["buyer"]
+    if name == "BatchTransformed":
+        return args["sourceBatchId"], args["newBatchId"], None, None
+    if name == "ShipmentLeg":
+        return args["batchId"], None, None, None
+    if name == "PurchaseConfirmed":
+        return None, None, args["txId"], args["buyer"]
+    return None, None, None, None
+
+
+def _hex(value):
+    # Same as Web3.to_hex for the HexBytes web3 returns, without importing web3 here
+    return "0x" + bytes(value).hex()
+
+
+def _json_value(value):
+    # uint256 amounts do not fit JSON numbers safely, so keep them as strings
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return _hex(value)
+    return value
+
+
+class EventIndexer:
+    def __init__(self, w3, contract, start_block=0, confirmations=0, batch_size=2000,
+                 poll_interval=2.0, reorg_depth=64, **_):
+        from eth_utils import event_abi_to_log_topic
+
+        self.w3 = w3
+        self.contract = contract
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.reorg_depth = reorg_depth
+        self._topics = {
+            _hex(event_abi_to_log_topic(entry)): entry["name"]
+            for entry in contract.abi
+            if entry.get("type") == "event" and entry.get("name") in INDEXED_EVENTS
+        }
+        self.head_block = None
+        self.indexed_block = None
+        self.reorgs = 0
+        self.last_error = None
+
+    # ============= Node helpers =============
+    async def _block_hash(self, number):
+        from web3.exceptions import BlockNotFound
+
+        try:
+            block = await self.w3.eth.get_block(number)
+        except BlockNotFound:
+            return None
+        return _hex(block["hash"])
+
+    def _decode(self, log):
+        name = self._topics.get(_hex(log["topics"][0]))
+        if name is None:
+            return None
+        event = getattr(self.contract.events, name)().process_log(log)
+        args = dict(event["args"])
+        batch_id, related_batch_id, tx_id, account = _event_columns(name, args)
+        return (
+            log["blockNumber"], _hex(log["blockHash"]), _hex(log["transactionHash"]),
+            log["logIndex"], name, batch_id, related_batch_id, tx_id,
+            account.lower() if account else None,
+            json.dumps({key: _json_value(value) for key, value in args.items()}),
+        )
+
+    # ============= Checkpoint and reorg handling =============
+    async def _load_checkpoint(self, cursor):
+        await cursor.execute("SELECT blockNumber, blockHash FROM chainCheckpoint WHERE name = %s", (CHECKPOINT_NAME,))
+        return await cursor.fetchone()
+
+    async def _save_checkpoint(self, cursor, number, block_hash):
+        await cursor.execute("""
+            INSERT INTO chainCheckpoint (name, blockNumber, blockHash, updatedAt) VALUES (%s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE blockNumber = VALUES(blockNumber), blockHash = VALUES(blockHash), updatedAt = NOW()
+        """, (CHECKPOINT_NAME, number, block_hash))
+
+    async def _resolve_checkpoint(self):
+        """Return the checkpoint to resume from, rewinding it first if the chain reorganised."""
+        async with get_async_connection() as conn, conn.cursor() as cursor:
+            checkpoint = await self._load_checkpoint(cursor)
+            if checkpoint is None or await self._block_hash(checkpoint[0]) == checkpoint[1]:
+                return checkpoint
+
+            number = checkpoint[0]
+            await cursor.execute("""
+                SELECT blockNumber, blockHash FROM chainBlocks
+                WHERE blockNumber < %s ORDER BY blockNumber DESC LIMIT %s
+            """, (number, self.reorg_depth))
+            ancestor = None
+            for candidate in await cursor.fetchall():
+                if await self._block_hash(candidate[0]) == candidate[1]:
+                    ancestor = candidate
+                    break
+
+            rewind_to = ancestor[0] if ancestor else self.start_block - 1
+            logger.warning("Reorg detected at block %s, rewinding to block %s", number, rewind_to)
+            await cursor.execute("DELETE FROM chainEvents WHERE blockNumber > %s", (rewind_to,))
+            await cursor.execute("DELETE FROM chainBlocks WHERE blockNumber > %s", (rewind_to,))
+            if ancestor:
+                await self._save_checkpoint(cursor, *ancestor)
+            else:
+                await cursor.execute("DELETE FROM chainCheckpoint WHERE name = %s", (CHECKPOINT_NAME,))
+            await conn.commit()
+            self.reorgs += 1
+            return ancestor
+
+    async def _index_range(self, from_block, to_block):
+        """Store the events of one block range; None if ``to_block`` is not available yet."""
+        end_hash = await self._block_hash(to_block)
+        if end_hash is None:
+            # Node behind its own head or mid-reorg; the checkpoint needs a hash, so retry next tick
+            logger.info("Block %s not found, retrying range from block %s later", to_block, from_block)
+            return None
+        logs = await self.w3.eth.get_logs({
+            "address": self.contract.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [list(self._topics)],
+        })
+        rows = [row for row in map(self._decode, logs) if row is not None]
+        blocks = {row[0]: row[1] for row in rows}
+        blocks[to_block] = end_hash
+
+        # Events, block hashes and the checkpoint move together in one transaction
+        async with get_async_connection() as conn, conn.cursor() as cursor:
+            if rows:
+                await cursor.executemany("""
+                    INSERT IGNORE INTO chainEvents (blockNumber, blockHash, txHash, logIndex, eventName,
+                                                    batchId, relatedBatchId, txId, account, args)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, rows)
+            await cursor.executemany("""
+                INSERT INTO chainBlocks (blockNumber, blockHash) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE blockHash = VALUES(blockHash)
+            """, list(blocks.items()))
+            await cursor.execute("DELETE FROM chainBlocks WHERE blockNumber < %s", (to_block - self.reorg_depth,))
+            await self._save_checkpoint(cursor, to_block, end_hash)
+            await conn.commit()
+        self.indexed_block = to_block
+        return len(rows)
+
+    async def sync_once(self):
+        """Index every confirmed block after the checkpoint. Returns the number of events stored."""
+        self.head_block = await self.w3.eth.block_number
+        target = self.head_block - self.confirmations
+        checkpoint = await self._resolve_checkpoint()
+        next_block = self.start_block if checkpoint is None else checkpoint[0] + 1
+        if checkpoint is not None:
+            self.indexed_block = checkpoint[0]
+
+        stored = 0
+        while next_block <= target:
+            to_block = min(next_block + self.batch_size - 1, target)
+            count = await self._index_range(next_block, to_block)
+            if count is None:
+                break
+            stored += count
+            next_block = to_block + 1
+        return stored
+
+    async def run(self):
+        delay = self.poll_interval
+        while True:
+            try:
+                await self.sync_once()
+                self.last_error = None
+                delay = self.poll_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Node or database hiccup: keep the API up and back off
+                self.last_error = str(e)
+                logger.error("Indexer error: %s", e)
+                delay = min(delay * 2, 60)
+            await asyncio.sleep(delay)
+
+    def status(self):
+        lag = None
+        if self.head_block is not None and self.indexed_block is not None:
+            lag = max(0, self.head_block - self.indexed_block)
+        return {
+            "headBlock": self.head_block,
+            "indexedBlock": self.indexed_block,
+            "lag": lag,
+            "reorgs": self.reorgs,
+            "lastError": self.last_error,
+        }
+
+
+def build_indexer(chain):
+    """An indexer on a built ``chain.client.ChainClient``'s web3 client and contract."""
+    return EventIndexer(chain.w3, chain.contract, **INDEXER_CONFIG)
+
+
+_indexer = None
+_task = None
+
+
+async def _run(chain):
+    global _indexer
+    try:
+        if await chain.ready() is None:
+            logger.warning("AGRI_TRADE_ADDRESS is not set; the event indexer is not started")
+            return
+    except Exception as e:
+        logger.error("Indexer not started, the chain client failed to build: %s", e)
+        return
+    _indexer = build_indexer(chain)
+    await _indexer.run()
+
+
+def start_indexer(chain):
+    """Index in a background task, once ``chain`` (built in a thread if needed) is ready."""
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run(chain))
+    return _task
+
+
+async def stop_indexer():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def indexer_status():
+    if _indexer is None:
+        return {"running": False}
+    return {"running": _task is not None and not _task.done(), **_indexer.status()}
+
+
+async def _main(once):
+    from db.async_connection import close_async_pool
+
+    chain = ChainClient()
+    if not chain.configured:
+        raise SystemExit("AGRI_TRADE_ADDRESS is not set")
+    indexer = build_indexer(chain.build())
+    try:
+        if once:
+            stored = await indexer.sync_once()
+            print(f"Indexed {stored} events up to block {indexer.indexed_block}")
+        else:
+            await indexer.run()
+    finally:
+        await close_async_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index AgriTrade contract events into MySQL.")
+    parser.add_argument("--once", action="store_true", help="index up to the current head and exit")
+    asyncio.run(_main(parser.parse_args().once))
@@ -0,0 +1,163 @@
+"""The API's JSON-RPC transport: one keep-alive session, coalesced and cached reads.
+
+``RpcSession`` owns the single pooled HTTP client to the node, shared by
+web3 (``SharedSessionProvider``) and the batch reader, with a timeout per
+call and bounded retries with jittered backoff for connection errors and
+429/5xx replies. Every HTTP exchange is timed on /metrics.
+
+``SharedSessionProvider`` is web3's ``AsyncHTTPProvider`` posting through
+that session. Identical reads in flight at the same time share one
+request, and state reads (``eth_call``, balances, code) are kept for
+``block_ttl`` seconds or until a newer block number is seen, all through
+``CatalogCache.get_or_load``.
+"""
+import asyncio
+import json
+import random
+import time
+
+import httpx
+from web3 import AsyncHTTPProvider
+
+from utils.cache import CatalogCache
+from utils.metrics import observe_rpc
+
+# Reads that are safe to retry and to share between identical concurrent calls
+READ_METHODS = {
+    "eth_call", "eth_getBalance", "eth_getCode", "eth_getStorageAt", "eth_getTransactionCount",
+    "eth_getBlockByNumber", "eth_getBlockByHash", "eth_getLogs", "eth_getTransactionReceipt",
+    "eth_blockNumber", "eth_chainId", "net_version",
+}
+# State reads whose answers are kept for the current block
+BLOCK_CACHED_METHODS = {"eth_call", "eth_getBalance", "eth_getCode", "eth_getStorageAt", "eth_getTransactionCount"}
+# Answers that never change
+STATIC_METHODS = {"eth_chainId", "net_version", "eth_getBlockByHash"}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class RpcSession:
+    """Keep-alive HTTP session to the node with per-call timeouts and bounded retries."""
+
+    def __init__(self, url, timeout=10.0, retries=2, retry_backoff=0.1, max_connections=20, **_):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_connections = max_connections
+        self._client = None
+        self.retried = 0
+
+    def _http(self):
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout,
+                                             headers={"Content-Type": "application/json"})
+        return self._client
+
+    async def post(self, body, label, retry=True, timeout=None):
+        """POST an encoded JSON-RPC request or batch and return the raw reply body."""
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            try:
+                response = await self._http().post(self.url, content=body, timeout=timeout or self.timeout)
+                if response.status_code in RETRY_STATUSES and attempt < attempts:
+                    observe_rpc(label, time.perf_counter() - started, failed=True)
+                else:
+                    response.raise_for_status()
+                    observe_rpc(label, time.perf_counter() - started)
+                    return response.content
+            except httpx.TransportError:
+                observe_rpc(label, time.perf_counter() - started, failed=True)
+                if attempt == attempts:
+                    raise
+            except httpx.HTTPStatusError:
+                observe_rpc(label, time.perf_counter() - started, failed=True)
+                raise
+            self.retried += 1
+            await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1) * random.random())
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class _NotCached(Exception):
+    """Carries a reply (a JSON-RPC error) out of a cache load without caching it."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class SharedSessionProvider(AsyncHTTPProvider):
+    """web3 provider sending through an ``RpcSession``, sharing and caching identical reads.
+
+    Block-numbered reads (blocks, logs, receipts) are shared while in flight
+    but never kept: the indexer compares block hashes to detect reorgs and
+    must always see the node's current answer.
+    """
+
+    def __init__(self, session, block_ttl=1.0, cache_entries=1024, **kwargs):
+        super().__init__(session.url, **kwargs)
+        self.session = session
+        self._block_results = CatalogCache(max_entries=cache_entries, ttl=block_ttl)
+        self._static_results = CatalogCache(max_entries=64, ttl=86400.0)
+        # A zero TTL keeps nothing, so this one only joins callers of a request in flight
+        self._in_flight = CatalogCache(max_entries=cache_entries, ttl=0.0)
+        self._block = None
+
+    async def _make_request(self, method, request_data):
+        return await self.session.post(request_data, method, retry=method in READ_METHODS)
+
+    async def _send(self, method, params):
+        response = await AsyncHTTPProvider.make_request(self, method, params)
+        if method == "eth_blockNumber" and "result" in response:
+            block = int(response["result"], 16)
+            if self._block is not None and block > self._block:
+                # State read at "latest" before this block is stale now
+                self._block_results.bump()
+            self._block = max(block, self._block or 0)
+        return response
+
+    def _results_for(self, method):
+        if method in STATIC_METHODS:
+            return self._static_results
+        if method in BLOCK_CACHED_METHODS:
+            return self._block_results
+        return self._in_flight
+
+    async def make_request(self, method, params):
+        if method not in READ_METHODS:
+            return await self._send(method, params)
+        # Params include the block tag, so the same call at another block is another key
+        key = (method, json.dumps(params, sort_keys=True, default=repr))
+
+        async def load():
+            response = await self._send(method, params)
+            if "result" not in response:
+                raise _NotCached(response)
+            return response
+
+        try:
+            response = await self._results_for(method).get_or_load(key, load)
+        except _NotCached as e:
+            return e.response
+        # Each caller gets its own copy of the (shared) reply dict
+        return dict(response)
+
+    async def make_batch_request(self, batch_requests):
+        request_data = self.encode_batch_rpc_request(batch_requests)
+        raw_response = await self.session.post(
+            request_data, "batch", retry=all(method in READ_METHODS for method, _ in batch_requests)
+        )
+        response = self.decode_rpc_response(raw_response)
+        if not isinstance(response, list):
+            return response
+        return sorted(response, key=lambda reply: reply.get("id", 0))
+
+    def stats(self):
+        return {"block": self._block, "blockResults": self._block_results.stats(),
+                "staticResults": self._static_results.stats()}
@@ -9,3 +9,134 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD", "admin"),
     "database": os.getenv("DB_NAME", "innovation")
 }
+
+# Connection pool settings (sizes are connection counts, times are seconds)
+DB_POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+    "wait_timeout": float(os.getenv("DB_POOL_WAIT_TIMEOUT", "5")),
+    "max_idle_time": float(os.getenv("DB_POOL_MAX_IDLE_TIME", "300")),
+    "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+    "validate_after": float(os.getenv("DB_POOL_VALIDATE_AFTER", "30")),
+}
+
+# In-process catalog cache (entry count, seconds)
+CATALOG_CACHE_CONFIG = {
+    "max_entries": int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024")),
+    "ttl": float(os.getenv("CATALOG_CACHE_TTL", "30")),
+}
+
+# Blockchain node and AgriTrade contract
+WEB3_PROVIDER_URL = os.getenv("WEB3_PROVIDER_URL", "http://127.0.0.1:8545")
+AGRI_TRADE_ARTIFACT = os.getenv("AGRI_TRADE_ARTIFACT", "../dapp/artifacts/contracts/AgriTrade.sol/AgriTrade.json")
+# Unset leaves the API up with on-chain enrichment and the indexer disabled
+AGRI_TRADE_ADDRESS = os.getenv("AGRI_TRADE_ADDRESS")
+
+# Shared JSON-RPC session to the node (seconds, attempts, connections, entries)
+RPC_CONFIG = {
+    "timeout": float(os.getenv("RPC_TIMEOUT", "10")),
+    "retries": int(os.getenv("RPC_RETRIES", "2")),
+    "retry_backoff": float(os.getenv("RPC_RETRY_BACKOFF", "0.1")),
+    "max_connections": int(os.getenv("RPC_MAX_CONNECTIONS", "20")),
+    # State reads are reused for this long, or until a newer block is seen
+    "block_ttl": float(os.getenv("RPC_BLOCK_TTL", "1")),
+    "cache_entries": int(os.getenv("RPC_CACHE_ENTRIES", "1024")),
+}
+
+# Background event indexer (block counts, seconds)
+INDEXER_CONFIG = {
+    "enabled": os.getenv("INDEXER_ENABLED", "true").lower() == "true",
+    "start_block": int(os.getenv("INDEXER_START_BLOCK", "0")),
+    "confirmations": int(os.getenv("INDEXER_CONFIRMATIONS", "0")),
+    "batch_size": int(os.getenv("INDEXER_BATCH_SIZE", "2000")),
+    "poll_interval": float(os.getenv("INDEXER_POLL_INTERVAL", "2")),
+    "reorg_depth": int(os.getenv("INDEXER_REORG_DEPTH", "64")),
+}
+
+# Serve catalog lists as pre-encoded orjson bytes instead of re-validating rows through pydantic
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+# GET /products/search in-process index (seconds, wei price facet boundaries)
+SEARCH_CONFIG = {
+    "price_buckets": [int(bound) for bound in os.getenv(
+        "SEARCH_PRICE_BUCKETS", "50000000000000000,100000000000000000,200000000000000000,500000000000000000"
+    ).split(",")],
+    "refresh_interval": float(os.getenv("SEARCH_REFRESH_INTERVAL", "300")),
+    "max_prefix_terms": int(os.getenv("SEARCH_MAX_PREFIX_TERMS", "64")),
+    "result_cache_entries": int(os.getenv("SEARCH_RESULT_CACHE_ENTRIES", "512")),
+}
+
+# Rows per transaction for POST /products/bulk
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+
+# buy_product retries on deadlock / lock wait timeout (attempts, seconds)
+PURCHASE_CONFIG = {
+    "max_attempts": int(os.getenv("PURCHASE_MAX_ATTEMPTS", "3")),
+    "retry_backoff": float(os.getenv("PURCHASE_RETRY_BACKOFF", "0.02")),
+}
+
+# Verified bearer tokens; entries also expire with the token's own exp (entry count, seconds)
+TOKEN_CACHE_CONFIG = {
+    "max_entries": int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+    "ttl": float(os.getenv("TOKEN_CACHE_TTL", "3600")),
+}
+
+# wallet -> userId lookups for tokens issued before userId was embedded (entry count, seconds)
+WALLET_CACHE_CONFIG = {
+    "max_entries": int(os.getenv("WALLET_CACHE_MAX_ENTRIES", "10000")),
+    "ttl": float(os.getenv("WALLET_CACHE_TTL", "3600")),
+}
+
+# Signed login challenges (seconds; claimed nonces remembered per worker until they expire)
+NONCE_CONFIG = {
+    "ttl": int(os.getenv("LOGIN_NONCE_TTL", "300")),
+    "replay_entries": int(os.getenv("LOGIN_NONCE_REPLAY_ENTRIES", "100000")),
+}
+
+# Login signature recovery (worker processes, 0 = a thread in the API process; signature counts)
+SIGNATURE_CONFIG = {
+    "workers": int(os.getenv("SIGNATURE_WORKERS", "2")),
+    # Signatures queued or in progress before logins are refused with 503
+    "max_pending": int(os.getenv("SIGNATURE_MAX_PENDING", "1024")),
+    "chunk_size": int(os.getenv("SIGNATURE_CHUNK_SIZE", "32")),
+    # Most signatures POST /users/auth/verify/batch accepts per request
+    "max_batch": int(os.getenv("SIGNATURE_MAX_BATCH", "100")),
+}
+
+# Image uploads and derived variants (bytes, pixels, worker processes)
+IMAGE_CONFIG = {
+    "upload_dir": os.getenv("IMAGE_UPLOAD_DIR", "./data/coffee-pictures"),
+    "variant_dir": os.getenv("IMAGE_VARIANT_DIR", "./data/image-variants"),
+    "max_upload_bytes": int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024))),
+    "thumbnail_size": int(os.getenv("IMAGE_THUMBNAIL_SIZE", "320")),
+    "display_size": int(os.getenv("IMAGE_DISPLAY_SIZE", "1280")),
+    "webp_quality": int(os.getenv("IMAGE_WEBP_QUALITY", "80")),
+    "workers": int(os.getenv("IMAGE_WORKERS", "2")),
+    # Browser caching for names that are not content-hashed (those are immutable)
+    "cache_max_age": int(os.getenv("IMAGE_CACHE_MAX_AGE", "3600")),
+    # In-memory cache of hot content-hashed files such as thumbnails
+    "hot_cache_bytes": int(os.getenv("IMAGE_HOT_CACHE_BYTES", str(32 * 1024 * 1024))),
+    "hot_file_max_bytes": int(os.getenv("IMAGE_HOT_FILE_MAX_BYTES", str(256 * 1024))),
+}
+
+# Request / SQL / RPC instrumentation exported on /metrics (seconds, entry count)
+METRICS_CONFIG = {
+    "enabled": os.getenv("METRICS_ENABLED", "true").lower() == "true",
+    "slow_query_threshold": float(os.getenv("SLOW_QUERY_THRESHOLD", "0.2")),
+    "slow_query_log_size": int(os.getenv("SLOW_QUERY_LOG_SIZE", "100")),
+}
+
+# Response compression (bytes; gzip level 1-9, brotli quality 0-11)
+COMPRESSION_CONFIG = {
+    "enabled": os.getenv("COMPRESSION_ENABLED", "true").lower() == "true",
+    "minimum_size": int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")),
+    "gzip_level": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    # Above 5 brotli costs far more CPU per response for a few percent fewer bytes
+    "brotli_quality": int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+}
+
+# Application logging; LOG_SAMPLE_RATE is the share of debug/info records written
+LOG_CONFIG = {
+    "level": os.getenv("LOG_LEVEL", "INFO").upper(),
+    "sample_rate": float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+}
@@ -1,3 +1,5 @@
+-- Recreates every table from scratch. To upgrade a database that already
+-- holds data, run the migrations instead: python -m db.migrate (from be/)
 create database if not exists innovation;
 use innovation;
 
@@ -7,6 +9,12 @@ drop table favorites;
 drop table products;
 drop table category;
 drop table users;
+drop table chainEvents;
+drop table chainBlocks;
+drop table chainCheckpoint;
+drop table images;
+drop table tradeTotals;
+drop table tradeDaily;
 
 
 CREATE TABLE IF NOT EXISTS category (
@@ -29,15 +37,19 @@ CREATE TABLE IF NOT EXISTS products (
     quantity INT NOT NULL CHECK (quantity >= 0),
     price BIGINT,
     description TEXT,
-    FOREIGN KEY (categoryId) REFERENCES Category(categoryId)
+    FOREIGN KEY (categoryId) REFERENCES Category(categoryId),
+    KEY idx_products_sale (isForSale, productId),
+    KEY idx_products_category_sale (categoryId, isForSale, productId),
+    KEY idx_products_region_sale (region, isForSale, productId)
 );
 
 
 CREATE TABLE IF NOT EXISTS users (
     userId BIGINT PRIMARY KEY AUTO_INCREMENT,
-    walletAddress VARCHAR(255) UNIQUE NOT NULL,
+    walletAddress VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin UNIQUE NOT NULL,  -- always lowercase
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    nonce VARCHAR(10) NOT NULL
+    nonce VARCHAR(10) NULL DEFAULT NULL,  -- unused since login nonces are signed, not stored
+    CONSTRAINT chk_users_wallet_lower CHECK (walletAddress = LOWER(walletAddress))
 );
 
 
@@ -57,7 +69,8 @@ CREATE TABLE IF NOT EXISTS shoppingCart (
     quantity INT DEFAULT 1 CHECK (quantity > 0),
     addedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (userId) REFERENCES users(userId) ON DELETE CASCADE,
-    FOREIGN KEY (productId) REFERENCES products(id) ON DELETE CASCADE
+    FOREIGN KEY (productId) REFERENCES products(id) ON DELETE CASCADE,
+    KEY idx_cart_user (userId, addedAt)
 );
 
 CREATE TABLE IF NOT EXISTS transactions (
@@ -68,11 +81,84 @@ CREATE TABLE IF NOT EXISTS transactions (
     destination VARCHAR(255) NOT NULL,
     timestamp DATETIME NOT NULL,
     quantity INT NOT NULL,
-    FOREIGN KEY (productId) REFERENCES products(productId) ON DELETE CASCADE
+    FOREIGN KEY (productId) REFERENCES products(productId) ON DELETE CASCADE,
+    KEY idx_transactions_buyer (buyerId, timestamp),
+    KEY idx_transactions_seller (sellerId, timestamp),
+    KEY idx_transactions_time (timestamp)
+);
+
+-- On-chain event index, written by chain/indexer.py
+CREATE TABLE IF NOT EXISTS chainEvents (
+    eventId BIGINT PRIMARY KEY AUTO_INCREMENT,
+    blockNumber BIGINT NOT NULL,
+    blockHash VARCHAR(66) NOT NULL,
+    txHash VARCHAR(66) NOT NULL,
+    logIndex INT NOT NULL,
+    eventName VARCHAR(64) NOT NULL,
+    batchId BIGINT,
+    relatedBatchId BIGINT,  -- newBatchId for BatchTransformed, parentId for BatchCreated
+    txId BIGINT,
+    account VARCHAR(255),  -- lowercased owner/buyer address
+    args JSON NOT NULL,
+    UNIQUE KEY uq_chainEvents_log (txHash, logIndex),
+    KEY idx_chainEvents_block (blockNumber),
+    KEY idx_chainEvents_batch (batchId, blockNumber, logIndex),
+    KEY idx_chainEvents_related (relatedBatchId),
+    KEY idx_chainEvents_tx (txId),
+    KEY idx_chainEvents_name (eventName, blockNumber)
+);
+
+CREATE TABLE IF NOT EXISTS chainBlocks (
+    blockNumber BIGINT PRIMARY KEY,
+    blockHash VARCHAR(66) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chainCheckpoint (
+    name VARCHAR(64) PRIMARY KEY,
+    blockNumber BIGINT NOT NULL,
+    blockHash VARCHAR(66) NOT NULL,
+    updatedAt DATETIME NOT NULL
+);
+
+-- Uploaded images and their derived variants, written by api/routes/images.py
+CREATE TABLE IF NOT EXISTS images (
+    imageId BIGINT PRIMARY KEY AUTO_INCREMENT,
+    fileName VARCHAR(255) UNIQUE NOT NULL,  -- what products.imageSrc refers to
+    contentHash CHAR(64) NOT NULL,  -- sha256 of the original bytes
+    contentType VARCHAR(64) NOT NULL,
+    bytes BIGINT NOT NULL,
+    width INT NOT NULL,
+    height INT NOT NULL,
+    thumbnailPath VARCHAR(255),
+    webpPath VARCHAR(255),
+    createdAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_images_hash (contentHash)
+);
+
+-- Trade rollups per buyer, seller and product, kept current by buy_product (utils/rollups.py)
+CREATE TABLE IF NOT EXISTS tradeTotals (
+    scope ENUM('buyer', 'seller', 'product') NOT NULL,
+    subjectId BIGINT NOT NULL,  -- userId for buyer/seller, productId for product
+    tradeCount INT NOT NULL,
+    units BIGINT NOT NULL,
+    valueWei DECIMAL(38, 0) NOT NULL,
+    firstTradeAt DATETIME NOT NULL,
+    lastTradeAt DATETIME NOT NULL,
+    PRIMARY KEY (scope, subjectId)
+);
+
+CREATE TABLE IF NOT EXISTS tradeDaily (
+    scope ENUM('buyer', 'seller', 'product') NOT NULL,
+    subjectId BIGINT NOT NULL,
+    day DATE NOT NULL,
+    tradeCount INT NOT NULL,
+    units BIGINT NOT NULL,
+    valueWei DECIMAL(38, 0) NOT NULL,
+    PRIMARY KEY (scope, subjectId, day)
 );
 
 INSERT INTO users (walletAddress, nonce)
-VALUES ("0x8626f6940E2eb28930eFb4CeF49B2d1F2C9C1199", "12331");
+VALUES ("0x8626f6940e2eb28930efb4cef49b2d1f2c9c1199", "12331");
 
 select * from users;
 SELECT * FROM Products ORDER by productId DESC;
@@ -1,10 +1,20 @@
 from web3 import Web3
 from faker import Faker
+import argparse
 import random
+import time
 import mysql.connector
 from datetime import datetime, timedelta
 import json
 
+parser = argparse.ArgumentParser(description="Seed the blockchain and MySQL with sample coffee products.")
+parser.add_argument("--num-products", type=int, default=200, help="number of createBatch transactions / product rows")
+parser.add_argument("--pipelined", action="store_true",
+                    help="keep many transactions in flight and bulk-insert rows (for large load-test datasets)")
+parser.add_argument("--concurrency", type=int, default=64, help="transactions in flight in --pipelined mode")
+parser.add_argument("--rows-per-commit", type=int, default=5000, help="product rows per MySQL commit in --pipelined mode")
+args = parser.parse_args()
+
 # ✅ Initialize Faker
 fake = Faker()
 
@@ -46,52 +56,208 @@ def get_or_create_category(cursor, category_name):
         return cursor.lastrowid
     return category_result[0]
 
+# ============= Pipelined seeding helpers =============
+BATCH_CREATED_TOPIC = Web3.to_hex(Web3.keccak(text="BatchCreated(uint256,uint256,address,uint256)"))
+
+class NonceManager:
+    """Hands out consecutive nonces locally instead of asking the node before every send."""
+
+    def __init__(self, web3, address):
+        self._next = web3.eth.get_transaction_count(address, "pending")
+
+    def next(self):
+        nonce = self._next
+        self._next += 1
+        return nonce
+
+def resolve_categories(cursor, category_names):
+    """Look every category up once, inserting the missing ones in a single statement."""
+    cursor.execute("SELECT name, categoryId FROM Category")
+    category_ids = dict(cursor.fetchall())
+    missing = [(name,) for name in category_names if name not in category_ids]
+    if missing:
+        cursor.executemany("INSERT INTO Category (name) VALUES (%s)", missing)
+        conn.commit()
+        cursor.execute("SELECT name, categoryId FROM Category")
+        category_ids = dict(cursor.fetchall())
+    return category_ids
+
+def rpc_batch(calls):
+    """Send [(method, params), ...] as one JSON-RPC batch; replies come back in request order."""
+    responses = web3.provider.make_batch_request(calls)
+    if not isinstance(responses, list):
+        raise RuntimeError(f"Batch request failed: {responses.get('error')}")
+    return responses
+
+def batch_id_from_receipt(receipt):
+    # BatchCreated(uint256 indexed id, ...): the id is the first indexed topic
+    for log in receipt["logs"]:
+        if log["topics"] and log["topics"][0] == BATCH_CREATED_TOPIC and log["address"].lower() == CONTRACT_ADDRESS.lower():
+            return int(log["topics"][1], 16)
+    return None
+
+def seed_products_pipelined(num_products, concurrency, rows_per_commit, stall_timeout=120):
+    """Mint ``num_products`` batches with many transactions in flight and bulk-insert the product rows.
+
+    Transactions are signed with locally managed nonces and sent a window at a
+    time in one JSON-RPC batch. Receipts for everything in flight are polled in
+    one batch too, and each batch id comes from its own BatchCreated log rather
+    than a racy batchCounter() read.
+    """
+    nonces = NonceManager(web3, WALLET_ADDRESS)
+    category_ids = resolve_categories(cursor, categories)
+    chain_id = web3.eth.chain_id
+    gas_price = web3.to_wei("5", "gwei")
+
+    pending = {}  # tx hash -> product row still missing its batch id
+    rows, created_ids = [], []
+    sent = confirmed = failed = inserted = 0
+    insert_seconds = 0.0
+    started = last_progress = time.perf_counter()
+
+    def flush():
+        nonlocal rows, inserted, insert_seconds
+        if not rows:
+            return
+        insert_started = time.perf_counter()
+        cursor.executemany("""
+            INSERT INTO products (productId, name, categoryId, harvestDate, expirationDate, ownerAddress,
+                                   region, imageSrc, quantity, price, description, isForSale)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        conn.commit()
+        insert_seconds += time.perf_counter() - insert_started
+        inserted += len(rows)
+        rows = []
+
+    while confirmed + failed < num_products:
+        # Top the in-flight window back up
+        window = []
+        while len(pending) + len(window) < concurrency and sent + len(window) < num_products:
+            index = sent + len(window)
+            region = random.choice(regions)
+            quantity = random.randint(50, 200)
+            price = int(round(random.uniform(0.01, 0.2), 4) * 10**18)
+            harvest_date = fake.date_between(start_date=one_year_ago, end_date=two_months_ago)
+            row = (
+                fake.word().capitalize() + " Coffee",
+                category_ids[random.choice(categories)],
+                harvest_date,
+                harvest_date + timedelta(days=random.randint(90, 365)),
+                fake.hexify(text="0x^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^"),
+                region,
+                f"coffee-{index % 1000 + 1}.jpg",
+                quantity,
+                price,
+                f"A premium {random.choice(categories)} coffee from {region}.",
+                True,
+            )
+            txn = contract.functions.createBatch(True, price, region, quantity).build_transaction({
+                "from": WALLET_ADDRESS,
+                "gas": 3000000,
+                "gasPrice": gas_price,
+                "nonce": nonces.next(),
+                "chainId": chain_id,
+            })
+            signed_txn = web3.eth.account.sign_transaction(txn, PRIVATE_KEY)
+            window.append((Web3.to_hex(signed_txn.raw_transaction), row))
+
+        if window:
+            responses = rpc_batch([("eth_sendRawTransaction", [raw]) for raw, _ in window])
+            for (_, row), response in zip(window, responses):
+                if "error" in response:
+                    # A rejected send leaves a nonce gap that would stall every later transaction
+                    flush()
+                    raise RuntimeError(f"Transaction rejected after {sent} sends: {response['error']}")
+                pending[response["result"]] = row
+            sent += len(window)
+
+        hashes = list(pending)
+        responses = rpc_batch([("eth_getTransactionReceipt", [tx_hash]) for tx_hash in hashes])
+        mined = 0
+        for tx_hash, response in zip(hashes, responses):
+            receipt = response.get("result")
+            if not receipt:
+                continue
+            mined += 1
+            row = pending.pop(tx_hash)
+            batch_id = batch_id_from_receipt(receipt)
+            if int(receipt["status"], 16) != 1 or batch_id is None:
+                failed += 1
+                continue
+            confirmed += 1
+            created_ids.append(batch_id)
+            rows.append((batch_id, *row))
+
+        if len(rows) >= rows_per_commit:
+            flush()
+            print(f"✅ {confirmed}/{num_products} batches minted, {inserted} rows inserted")
+
+        now = time.perf_counter()
+        if mined:
+            last_progress = now
+        elif now - last_progress > stall_timeout:
+            flush()
+            raise RuntimeError(f"No receipts for {stall_timeout}s with {len(pending)} transactions in flight")
+        elif not window:
+            time.sleep(0.05)
+
+    flush()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Pipelined seeding: {confirmed} batches minted, {failed} failed, {inserted} rows inserted in {elapsed:.1f}s")
+    print(f"   {confirmed / elapsed:.1f} tx/s, {inserted / elapsed:.1f} rows/s overall, "
+          f"{inserted / insert_seconds if insert_seconds else 0:.1f} rows/s while inserting")
+    return created_ids
+
 # ✅ Generate Products and Mint NFTs
-num_products = 200  # Adjust as needed
+num_products = args.num_products
 batch_ids = []  # Store batch IDs for later transformation
 
-for _ in range(num_products):
-    name = fake.word().capitalize() + " Coffee"
-    category_id = get_or_create_category(cursor, random.choice(categories))
-    harvest_date = fake.date_between(start_date=one_year_ago, end_date=two_months_ago)
-    expiration_date = harvest_date + timedelta(days=random.randint(90, 365))
-    owner_address = fake.hexify(text="0x^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^")
-    region = random.choice(regions)
-    image_src = f"coffee-{_ + 1}.jpg"
-    quantity = random.randint(50, 200)
-    price = int(round(random.uniform(0.01, 0.2), 4) * 10**18)
-    description = f"A premium {random.choice(categories)} coffee from {region}."
-
-    # ✅ Call createBatch on blockchain first to get the batchId
-    nonce = web3.eth.get_transaction_count(WALLET_ADDRESS)
-    txn = contract.functions.createBatch(
-        True, price, region, quantity
-    ).build_transaction({
-        "from": WALLET_ADDRESS,
-        "gas": 3000000,
-        "gasPrice": web3.to_wei("5", "gwei"),
-        "nonce": nonce
-    })
+if args.pipelined:
+    batch_ids = seed_products_pipelined(num_products, args.concurrency, args.rows_per_commit)
+else:
+    for _ in range(num_products):
+        name = fake.word().capitalize() + " Coffee"
+        category_id = get_or_create_category(cursor, random.choice(categories))
+        harvest_date = fake.date_between(start_date=one_year_ago, end_date=two_months_ago)
+        expiration_date = harvest_date + timedelta(days=random.randint(90, 365))
+        owner_address = fake.hexify(text="0x^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^")
+        region = random.choice(regions)
+        image_src = f"coffee-{_ + 1}.jpg"
+        quantity = random.randint(50, 200)
+        price = int(round(random.uniform(0.01, 0.2), 4) * 10**18)
+        description = f"A premium {random.choice(categories)} coffee from {region}."
+
+        # ✅ Call createBatch on blockchain first to get the batchId
+        nonce = web3.eth.get_transaction_count(WALLET_ADDRESS)
+        txn = contract.functions.createBatch(
+            True, price, region, quantity
+        ).build_transaction({
+            "from": WALLET_ADDRESS,
+            "gas": 3000000,
+            "gasPrice": web3.to_wei("5", "gwei"),
+            "nonce": nonce
+        })
     
-    signed_txn = web3.eth.account.sign_transaction(txn, PRIVATE_KEY)
-    tx_hash = web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-    receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+        signed_txn = web3.eth.account.sign_transaction(txn, PRIVATE_KEY)
+        tx_hash = web3.eth.send_raw_transaction(signed_txn.raw_transaction)
+        receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
 
-    # ✅ Get Batch ID from Blockchain
-    blockchain_batch_id = contract.functions.batchCounter().call()
-    batch_ids.append(blockchain_batch_id)
+        # ✅ Get Batch ID from Blockchain
+        blockchain_batch_id = contract.functions.batchCounter().call()
+        batch_ids.append(blockchain_batch_id)
     
-    # ✅ Store Product in MySQL with batchId
-    cursor.execute("""
-        INSERT INTO products (productId, name, categoryId, harvestDate, expirationDate, ownerAddress, 
-                               region, imageSrc, quantity, price, description, isForSale)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """, (blockchain_batch_id, name, category_id, harvest_date, expiration_date, owner_address, 
-          region, image_src, quantity, price, description, True))
-    conn.commit()
-    product_id = cursor.lastrowid  
+        # ✅ Store Product in MySQL with batchId
+        cursor.execute("""
+            INSERT INTO products (productId, name, categoryId, harvestDate, expirationDate, ownerAddress, 
+                                   region, imageSrc, quantity, price, description, isForSale)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (blockchain_batch_id, name, category_id, harvest_date, expiration_date, owner_address, 
+              region, image_src, quantity, price, description, True))
+        conn.commit()
+        product_id = cursor.lastrowid  
     
-    print(f"✅ Created Product ID: {product_id} with Batch ID: {blockchain_batch_id} - {name} from {region}")
+        print(f"✅ Created Product ID: {product_id} with Batch ID: {blockchain_batch_id} - {name} from {region}")
 
 print(f"✅ Successfully generated {num_products} coffee products and minted NFTs!")
 
@@ -0,0 +1,228 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+import pymysql
+from core.config import DB_CONFIG, DB_POOL_CONFIG
+from db.connection import DatabaseUnavailable, _PoolBookkeeping, _PooledConnection
+from utils.log import get_logger
+from utils.metrics import observe_query
+
+logger = get_logger(__name__)
+
+
+class _TimedConnection(aiomysql.Connection):
+    """aiomysql connection that reports every statement's latency to utils.metrics."""
+
+    async def query(self, sql, unbuffered=False):
+        started = time.perf_counter()
+        try:
+            return await super().query(sql, unbuffered)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+    async def commit(self):
+        started = time.perf_counter()
+        try:
+            await super().commit()
+        finally:
+            observe_query("COMMIT", time.perf_counter() - started)
+
+
+class AsyncConnectionPool(_PoolBookkeeping):
+    """asyncio counterpart of ``db.connection.ConnectionPool`` built on aiomysql.
+
+    Same sizing, bounded wait, validation and recycling rules; waiting happens
+    on the event loop instead of blocking a worker thread.
+    """
+
+    def __init__(self, config, min_size=2, max_size=20, wait_timeout=5.0,
+                 max_idle_time=300.0, max_lifetime=1800.0, validate_after=30.0):
+        super().__init__(min_size, max_size, wait_timeout, max_idle_time, max_lifetime, validate_after)
+        # aiomysql follows PyMySQL naming, which calls the schema ``db``
+        self._config = {
+            "host": config["host"],
+            "user": config["user"],
+            "password": config["password"],
+            "db": config["database"],
+            "autocommit": False,
+        }
+        self._cond = asyncio.Condition()
+
+    # ============= Connection lifecycle =============
+    async def _open(self):
+        # What aiomysql.connect does, with the timed connection class
+        conn = _TimedConnection(**self._config)
+        await conn._connect()
+        self._created += 1
+        return _PooledConnection(conn)
+
+    def _close_quietly(self, entry):
+        # Closes the socket without the QUIT round trip, so it never awaits
+        entry.conn.close()
+
+    async def _validate(self, entry, now):
+        if now - entry.last_used <= self.validate_after:
+            return True
+        try:
+            await entry.conn.ping(reconnect=False)
+            return True
+        except pymysql.Error:
+            return False
+
+    async def fill(self):
+        """Open connections until ``min_size`` are available."""
+        while True:
+            async with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = await self._open()
+            except BaseException:
+                # Connect errors, OSError and cancellation alike must give the slot back
+                async with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            async with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    async def acquire(self):
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            entry = None
+            async with self._cond:
+                while True:
+                    if self._closed:
+                        raise DatabaseUnavailable("Connection pool is closed")
+                    now = time.monotonic()
+                    entry = self._take_idle(now)
+                    if entry is not None or self._size < self.max_size:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._timed_out()
+                    self._waiting += 1
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    finally:
+                        self._waiting -= 1
+                if entry is None:
+                    self._size += 1
+                self._in_use += 1
+
+            if entry is None:
+                try:
+                    return await self._open()
+                except (pymysql.Error, OSError) as e:
+                    await self._forget()
+                    raise DatabaseUnavailable(f"Database connection error: {e}") from e
+                except BaseException:
+                    # Cancelled mid-connect: without this the slot is counted as in use forever
+                    await self._forget()
+                    raise
+
+            try:
+                valid = await self._validate(entry, time.monotonic())
+            except BaseException:
+                # Cancelled mid-ping: the connection may be half-way through a reply, so drop it
+                self._close_quietly(entry)
+                await self._forget()
+                raise
+            if valid:
+                return entry
+            # Dead connection: drop it and try again within the same deadline
+            self._close_quietly(entry)
+            await self._forget(recycled=True)
+
+    async def _forget(self, recycled=False):
+        async with self._cond:
+            self._dropped(recycled)
+            self._cond.notify()
+
+    async def release(self, entry, discard=False):
+        conn = entry.conn
+        if not discard:
+            try:
+                if conn.get_transaction_status():
+                    await conn.rollback()
+            except pymysql.Error:
+                discard = True
+
+        now = time.monotonic()
+        if discard or conn.closed or self._closed or self._is_stale(entry, now):
+            self._close_quietly(entry)
+            await self._forget(recycled=not discard and not self._closed)
+            return
+
+        async with self._cond:
+            self._returned(entry, now)
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def connection(self):
+        entry = await self.acquire()
+        discard = False
+        try:
+            yield entry.conn
+        except BaseException:
+            try:
+                await entry.conn.rollback()
+            except (pymysql.Error, asyncio.CancelledError):
+                discard = True
+            raise
+        finally:
+            await self.release(entry, discard=discard)
+
+    async def close(self):
+        async with self._cond:
+            idle = self._drain_idle()
+            self._cond.notify_all()
+        for entry in idle:
+            await entry.conn.ensure_closed()
+
+    def stats(self):
+        return self._stats()
+
+_pool = None
+
+
+def get_async_pool():
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+    return _pool
+
+
+def get_async_connection():
+    """Check a connection out of the shared asyncio pool.
+
+    Use as ``async with get_async_connection() as conn:``; the connection is
+    rolled back if needed and returned to the pool when the block exits.
+    """
+    return get_async_pool().connection()
+
+
+async def open_async_pool():
+    try:
+        await get_async_pool().fill()
+    except (pymysql.Error, OSError) as e:
+        logger.error("Database connection error: %s", e)
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def async_pool_stats():
+    if _pool is None:
+        return None
+    return _pool.stats()
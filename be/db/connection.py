@@ -1,11 +1,299 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+
 import mysql.connector
-from core.config import DB_CONFIG
+from core.config import DB_CONFIG, DB_POOL_CONFIG
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when the pool cannot hand out a connection in time."""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class _PoolBookkeeping(ABC):
+    """Sizing, counters and idle-connection reaping shared by ``ConnectionPool``
+    and ``db.async_connection.AsyncConnectionPool``.
+
+    Only state lives here; the pools hold their own lock (a threading or an
+    asyncio condition) around every call and supply ``_close_quietly``.
+    """
+
+    def __init__(self, min_size, max_size, wait_timeout, max_idle_time, max_lifetime, validate_after):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.max_idle_time = max_idle_time
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+
+        self._idle = deque()
+        self._size = 0  # open connections, idle or checked out
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+        self._timeouts = 0
+        self._closed = False
+
+    @abstractmethod
+    def _close_quietly(self, entry):
+        """Close a connection the pool no longer counts, without raising or blocking."""
+
+    def _is_stale(self, entry, now):
+        return (now - entry.created_at > self.max_lifetime
+                or now - entry.last_used > self.max_idle_time)
+
+    def _take_idle(self, now):
+        """The most recently used idle connection that is not stale, or None; stale ones are recycled."""
+        while self._idle:
+            candidate = self._idle.pop()
+            if not self._is_stale(candidate, now):
+                return candidate
+            self._size -= 1
+            self._recycled += 1
+            self._close_quietly(candidate)
+        return None
+
+    def _timed_out(self):
+        self._timeouts += 1
+        return DatabaseUnavailable(f"Timed out after {self.wait_timeout}s waiting for a database connection")
+
+    def _dropped(self, recycled):
+        """Account for a checked-out connection that was closed instead of returned."""
+        self._size -= 1
+        self._in_use -= 1
+        if recycled:
+            self._recycled += 1
+
+    def _returned(self, entry, now):
+        """Put a checked-out connection back on the idle stack and reap the long-idle ones."""
+        entry.last_used = now
+        self._in_use -= 1
+        self._idle.append(entry)
+        # Oldest idle connections sit at the left end of the deque
+        while len(self._idle) > self.min_size and now - self._idle[0].last_used > self.max_idle_time:
+            stale = self._idle.popleft()
+            self._size -= 1
+            self._recycled += 1
+            self._close_quietly(stale)
+
+    def _drain_idle(self):
+        """Mark the pool closed and hand back the idle connections for the caller to close."""
+        self._closed = True
+        idle, self._idle = list(self._idle), deque()
+        self._size -= len(idle)
+        return idle
+
+    def _stats(self):
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "inUse": self._in_use,
+            "waiting": self._waiting,
+            "created": self._created,
+            "recycled": self._recycled,
+            "timeouts": self._timeouts,
+            "minSize": self.min_size,
+            "maxSize": self.max_size,
+        }
+
+
+class ConnectionPool(_PoolBookkeeping):
+    """Bounded pool of mysql-connector connections.
+
+    Idle connections are reused LIFO so the hot ones stay warm and the rest age
+    out. A connection is recycled once it passes ``max_lifetime`` or sits idle
+    longer than ``max_idle_time``, and is pinged on checkout when it has been
+    idle longer than ``validate_after``.
+    """
+
+    def __init__(self, config, min_size=2, max_size=20, wait_timeout=5.0,
+                 max_idle_time=300.0, max_lifetime=1800.0, validate_after=30.0):
+        super().__init__(min_size, max_size, wait_timeout, max_idle_time, max_lifetime, validate_after)
+        self._config = dict(config)
+        self._cond = threading.Condition()
+
+    # ============= Connection lifecycle =============
+    def _open(self):
+        conn = mysql.connector.connect(**self._config)
+        with self._cond:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _close_quietly(self, entry):
+        try:
+            entry.conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def _validate(self, entry, now):
+        if now - entry.last_used <= self.validate_after:
+            return True
+        try:
+            entry.conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def fill(self):
+        """Open connections until ``min_size`` are available."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._open()
+            except mysql.connector.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise DatabaseUnavailable("Connection pool is closed")
+                    now = time.monotonic()
+                    entry = self._take_idle(now)
+                    if entry is not None or self._size < self.max_size:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._timed_out()
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if entry is None:
+                    self._size += 1
+                self._in_use += 1
+
+            if entry is None:
+                try:
+                    return self._open()
+                except mysql.connector.Error as e:
+                    self._forget()
+                    raise DatabaseUnavailable(f"Database connection error: {e}") from e
+
+            if self._validate(entry, time.monotonic()):
+                return entry
+            # Dead connection: drop it and try again within the same deadline
+            self._close_quietly(entry)
+            self._forget(recycled=True)
+
+    def _forget(self, recycled=False):
+        with self._cond:
+            self._dropped(recycled)
+            self._cond.notify()
+
+    def release(self, entry, discard=False):
+        conn = entry.conn
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except mysql.connector.Error:
+                discard = True
+
+        now = time.monotonic()
+        if discard or self._closed or self._is_stale(entry, now):
+            self._close_quietly(entry)
+            self._forget(recycled=not discard and not self._closed)
+            return
+
+        with self._cond:
+            self._returned(entry, now)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        # Connections are handed back as-is apart from a rollback; callers that
+        # flip autocommit are expected to restore it before leaving the block.
+        entry = self.acquire()
+        discard = False
+        try:
+            yield entry.conn
+        except BaseException:
+            try:
+                entry.conn.rollback()
+            except mysql.connector.Error:
+                discard = True
+            raise
+        finally:
+            self.release(entry, discard=discard)
+
+    def close(self):
+        with self._cond:
+            idle = self._drain_idle()
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry)
+
+    def stats(self):
+        with self._cond:
+            return self._stats()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+                try:
+                    pool.fill()
+                except mysql.connector.Error as e:
+                    logger.error("Database connection error: %s", e)
+                _pool = pool
+    return _pool
+
 
 def get_connection():
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            return conn
-    except mysql.connector.Error as e:
-        print(f"Database connection error: {e}")
-    return None
+    """Check a connection out of the shared pool.
+
+    Use as ``with get_connection() as conn:``; the connection is rolled back if
+    needed and returned to the pool when the block exits, even on errors.
+    """
+    return get_pool().connection()
+
+
+def pool_stats():
+    if _pool is None:
+        return None
+    return _pool.stats()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,240 @@
+"""EXPLAIN regression checks for the SQL the routes run.
+
+Runs ``EXPLAIN`` on each route's query against the configured MySQL and
+exits with status 1 when a plan reads a whole table or sorts with a
+filesort, unless that check explicitly allows it (with the reason next to
+it). Plans depend on table statistics, so run it against a database with
+realistic volumes; ``--seed-products`` first fills a scratch database with
+synthetic products, users, transactions and cart rows:
+
+    python -m db.migrate
+    python -m db.explain_check --seed-products 200000
+    python -m db.explain_check            # re-check without seeding
+
+Run it from the ``be`` directory. Seeding only inserts rows, but never
+point it at a database whose data matters.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from api.routes.cart import CART_ITEMS, CHECKOUT_LINES
+from api.routes.onchain import BATCH_EVENTS, TX_EVENTS
+from api.routes.products import (
+    PRODUCT_BY_ID, PRODUCT_INSERT, PRODUCT_PAGE, PRODUCT_PURCHASE, PRODUCTS_FOR_SALE, PRODUCTS_FOR_SALE_LIMIT,
+)
+from api.routes.transactions import HISTORY_AFTER, HISTORY_COLUMNS, HISTORY_PAGE, TRANSACTION_HISTORY
+from db.connection import get_connection
+from utils.auth import USER_BY_WALLET
+from utils.rollups import DAILY_FOR, RECORD_DAILY, RECORD_TOTALS, TOTALS_FOR
+from utils.search import _PRODUCT_ROWS
+
+CATEGORIES = ["Arabica", "Robusta", "Espresso", "Liberica", "Excelsa", "Maragogype", "Pacamara", "Caturra"]
+REGIONS = ["Colombia", "Ethiopia", "Guatemala", "Brazil", "Kenya", "Dak Lak", "Lam Dong", "Sumatra"]
+SEED_CHUNK = 5000
+
+
+# ============= Checks =============
+def build_checks(samples):
+    """(name, sql, params, allowed problems) for every route query; ``samples`` are real key values."""
+    def page(*conditions):
+        return PRODUCT_PAGE.format(conditions=" AND ".join(["isForSale = 1", *conditions]))
+
+    checks = [
+        # The search index loads every product for sale by design
+        ("search index load", _PRODUCT_ROWS, (), {"full scan"}),
+        # Reads every product for sale too, but in idx_products_sale order; a scan here is a regression
+        ("GET /products", PRODUCTS_FOR_SALE, (), set()),
+        ("GET /products/limit", PRODUCTS_FOR_SALE_LIMIT, (24,), set()),
+        ("GET /products/page", page(), (25,), set()),
+        ("GET /products/page (next page)", page("products.productId < %s"), (samples["productId"], 25), set()),
+        ("GET /products/page (category)", page("category.name = %s"), (samples["category"], 25), set()),
+        ("GET /products/page (region)", page("products.region = %s"), (samples["region"], 25), set()),
+        ("GET /products/{id}", PRODUCT_BY_ID, (samples["productId"],), set()),
+        ("POST /products/buy/{id}", PRODUCT_PURCHASE, (1, samples["productId"], 1), set()),
+        ("auth wallet lookup", USER_BY_WALLET, (samples["wallet"],), set()),
+        ("GET /transactions/products/{id}/summary totals", TOTALS_FOR.format(scopes="'product'"),
+         (samples["productId"],), set()),
+        ("GET /transactions/products/{id}/summary daily", DAILY_FOR.format(scopes="'product'"),
+         (samples["productId"], 30), set()),
+    ]
+    if samples.get("historyUser") is not None:
+        user = samples["historyUser"]
+        checks.append(("GET /transactions/user/me", TRANSACTION_HISTORY, (user, user, user), set()))
+        for role, column in HISTORY_COLUMNS.items():
+            checks.append((f"GET /transactions/user/me/{role}", HISTORY_PAGE.format(column=column, after=""),
+                           (user, 51), set()))
+            checks.append((f"GET /transactions/user/me/{role} (next page)",
+                           HISTORY_PAGE.format(column=column, after=HISTORY_AFTER),
+                           (user, samples["historyTime"], samples["historyTime"], samples["historyTx"], 51), set()))
+        checks.append(("GET /transactions/user/me/summary daily", DAILY_FOR.format(scopes="'buyer', 'seller'"),
+                       (user, 30), set()))
+        rollup = {"product": samples["productId"], "buyer": user, "seller": user, "quantity": 1}
+        checks.append(("buy rollup totals", RECORD_TOTALS, rollup, set()))
+        checks.append(("buy rollup daily", RECORD_DAILY, rollup, set()))
+    if samples.get("cartUser") is not None:
+        checks.append(("GET /cart", CART_ITEMS, (samples["cartUser"],), set()))
+        checks.append(("POST /cart/checkout lines", CHECKOUT_LINES, (samples["cartUser"],), set()))
+    if samples.get("batchId") is not None:
+        # A batch or transaction has a handful of events; sorting those is cheaper than another index
+        checks.append(("GET /chain/batches/{id}/events", BATCH_EVENTS, (samples["batchId"],) * 2, {"filesort"}))
+        checks.append(("GET /chain/transactions/{id}/events", TX_EVENTS, (samples["txId"],), {"filesort"}))
+    return checks
+
+
+def plan_problems(plan, allowed, small_table_rows):
+    problems = []
+    for row in plan:
+        table = row["table"]
+        # Union and derived results are bounded by their own (checked) branches
+        if not table or table.startswith("<"):
+            continue
+        if row["type"] == "ALL" and (row["rows"] or 0) > small_table_rows and "full scan" not in allowed:
+            problems.append(f"full scan of {table} (~{row['rows']} rows)")
+        if "Using filesort" in (row["Extra"] or "") and "filesort" not in allowed:
+            problems.append(f"filesort on {table}")
+    return problems
+
+
+def sample_values(cursor):
+    samples = {}
+    cursor.execute("SELECT productId, region FROM products WHERE isForSale = 1 ORDER BY productId DESC LIMIT 1")
+    row = cursor.fetchone()
+    if row is None:
+        raise SystemExit("No products for sale; seed the database first (--seed-products)")
+    samples["productId"], samples["region"] = row["productId"], row["region"]
+    cursor.execute("""
+        SELECT category.name FROM products
+        INNER JOIN category ON products.categoryId = category.categoryId
+        WHERE products.productId = %s
+    """, (samples["productId"],))
+    samples["category"] = cursor.fetchone()["name"]
+    cursor.execute("SELECT walletAddress FROM users ORDER BY userId LIMIT 1")
+    row = cursor.fetchone()
+    samples["wallet"] = row["walletAddress"] if row else "0x0"
+    cursor.execute("SELECT buyerId, timestamp, transactionId FROM transactions ORDER BY transactionId DESC LIMIT 1")
+    row = cursor.fetchone()
+    samples["historyUser"] = row["buyerId"] if row else None
+    if row:
+        samples["historyTime"], samples["historyTx"] = row["timestamp"], row["transactionId"]
+    cursor.execute("SELECT userId FROM shoppingCart ORDER BY cartId DESC LIMIT 1")
+    row = cursor.fetchone()
+    samples["cartUser"] = row["userId"] if row else None
+    # Databases upgraded before migration 0000 may not have the chain tables yet
+    if _table_exists(cursor, "chainEvents"):
+        cursor.execute("SELECT batchId, txId FROM chainEvents WHERE batchId IS NOT NULL AND txId IS NOT NULL LIMIT 1")
+        row = cursor.fetchone()
+        if row:
+            samples["batchId"], samples["txId"] = row["batchId"], row["txId"]
+    return samples
+
+
+def _table_exists(cursor, table):
+    cursor.execute(
+        "SELECT COUNT(*) AS n FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return cursor.fetchone()["n"] > 0
+
+
+def run_checks(small_table_rows, verbose=False):
+    failed = 0
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        samples = sample_values(cursor)
+        for name, sql, params, allowed in build_checks(samples):
+            cursor.execute("EXPLAIN " + sql.strip().rstrip(";"), params)
+            plan = cursor.fetchall()
+            problems = plan_problems(plan, allowed, small_table_rows)
+            print(f"{'FAIL' if problems else 'ok  '} {name}")
+            for problem in problems:
+                print(f"       {problem}")
+            if problems or verbose:
+                for row in plan:
+                    print(f"       {row['table']}: type={row['type']} key={row['key']} rows={row['rows']} "
+                          f"extra={row['Extra']}")
+            failed += bool(problems)
+        cursor.close()
+    print(f"{failed} of the checks regressed" if failed else "All plans use indexes")
+    return failed
+
+
+# ============= Synthetic data =============
+def seed(products):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT IGNORE INTO category (name) VALUES (%s)", [(name,) for name in CATEGORIES])
+        cursor.execute("SELECT categoryId FROM category")
+        category_ids = [row[0] for row in cursor.fetchall()]
+
+        wallets = [f"0x{rng.getrandbits(160):040x}" for _ in range(max(products // 20, 10))]
+        for i in range(0, len(wallets), SEED_CHUNK):
+            cursor.executemany("INSERT IGNORE INTO users (walletAddress, nonce) VALUES (%s, %s)",
+                               [(wallet, str(rng.randint(10000, 99999))) for wallet in wallets[i:i + SEED_CHUNK]])
+            conn.commit()
+        cursor.execute("SELECT userId FROM users")
+        user_ids = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SELECT COALESCE(MAX(productId), 0) FROM products")
+        first_product = cursor.fetchone()[0] + 1
+        product_ids = range(first_product, first_product + products)
+        for i in range(0, products, SEED_CHUNK):
+            rows = []
+            for product_id in product_ids[i:i + SEED_CHUNK]:
+                for_sale = rng.random() < 0.9
+                harvest = start + timedelta(days=rng.randint(0, 365))
+                rows.append((
+                    f"Seed lot {product_id}", rng.choice(category_ids), harvest, harvest + timedelta(days=365),
+                    rng.choice(["Fresh", "Expired"]), rng.choice(wallets), rng.choice(REGIONS), None,
+                    rng.randint(1, 500) if for_sale else 0, rng.randint(10**16, 2 * 10**17), for_sale, product_id,
+                    "Synthetic product for query plan checks",
+                ))
+            cursor.executemany(PRODUCT_INSERT, rows)
+            conn.commit()
+        print(f"Seeded {products} products and {len(wallets)} users")
+
+        for i in range(0, products * 2, SEED_CHUNK):
+            rows = [
+                (rng.choice(product_ids), rng.choice(user_ids), rng.choice(user_ids), "Seed destination",
+                 start + timedelta(seconds=rng.randint(0, 365 * 86400)), rng.randint(1, 10))
+                for _ in range(min(SEED_CHUNK, products * 2 - i))
+            ]
+            cursor.executemany("""
+                INSERT INTO transactions (productId, buyerId, sellerId, destination, timestamp, quantity)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, rows)
+            conn.commit()
+
+        cursor.execute("SELECT id FROM products WHERE productId >= %s", (first_product,))
+        row_ids = [row[0] for row in cursor.fetchall()]
+        cart_rows = [
+            (rng.choice(user_ids), rng.choice(row_ids), rng.randint(1, 5),
+             start + timedelta(seconds=rng.randint(0, 365 * 86400)))
+            for _ in range(products // 5)
+        ]
+        for i in range(0, len(cart_rows), SEED_CHUNK):
+            cursor.executemany("INSERT INTO shoppingCart (userId, productId, quantity, addedAt) VALUES (%s, %s, %s, %s)",
+                               cart_rows[i:i + SEED_CHUNK])
+            conn.commit()
+        print(f"Seeded {products * 2} transactions and {len(cart_rows)} cart rows")
+
+        # Fresh statistics, so the plans reflect the new volumes
+        for table in ("category", "users", "products", "transactions", "shoppingCart"):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail when a route query's plan regresses to a scan or filesort.")
+    parser.add_argument("--seed-products", type=int, default=0, help="insert this many synthetic products first")
+    parser.add_argument("--small-table-rows", type=int, default=1000,
+                        help="full scans of tables at most this big are not reported")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only failing ones")
+    args = parser.parse_args()
+    if args.seed_products:
+        seed(args.seed_products)
+    sys.exit(1 if run_checks(args.small_table_rows, args.verbose) else 0)
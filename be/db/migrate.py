@@ -0,0 +1,153 @@
+"""Versioned, additive schema migrations.
+
+Migrations are the ``db/migrations/NNNN_description.sql`` files, applied in
+version order and recorded in ``schemaMigrations`` together with a checksum
+of the file. Unlike ``data/agricultureWebSchema.sql`` nothing is dropped, so
+it is safe to run against a database that already holds data:
+
+    python -m db.migrate            # apply everything pending
+    python -m db.migrate --status   # list applied and pending versions
+    python -m db.migrate --dry-run  # print the pending statements only
+
+Run it from the ``be`` directory. MySQL commits DDL implicitly, so a
+migration is not atomic; instead every statement is written to be safe to
+repeat, and "already exists" errors (an index or constraint created by the
+schema file or by an interrupted run) count as applied.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from db.connection import get_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+_FILE_NAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# The object a statement creates is already there
+ALREADY_APPLIED = {errorcode.ER_DUP_KEYNAME, errorcode.ER_DUP_FIELDNAME, errorcode.ER_CHECK_CONSTRAINT_DUP_NAME}
+
+# Serialises concurrent runners (e.g. several deploys starting at once)
+LOCK_NAME = "innovation.schemaMigrations"
+LOCK_TIMEOUT = 60
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+    def statements(self):
+        """The file's statements, without comments; each one ends with ``;`` at the end of a line."""
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith("--")]
+        return [statement.strip() for statement in re.split(r";\s*$", "\n".join(lines), flags=re.M)
+                if statement.strip()]
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for file_name in sorted(os.listdir(directory)):
+        match = _FILE_NAME.match(file_name)
+        if match:
+            migrations.append(Migration(int(match[1]), match[2], os.path.join(directory, file_name)))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise SystemExit(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schemaMigrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            appliedAt DATETIME NOT NULL
+        )
+    """)
+
+
+def _applied(cursor):
+    cursor.execute("SELECT version, checksum FROM schemaMigrations")
+    return dict(cursor.fetchall())
+
+
+def _apply(conn, cursor, migration):
+    for statement in migration.statements():
+        try:
+            cursor.execute(statement)
+        except mysql.connector.Error as e:
+            if e.errno not in ALREADY_APPLIED:
+                raise
+            print(f"  already present, skipped: {e.msg}")
+    cursor.execute(
+        "INSERT INTO schemaMigrations (version, name, checksum, appliedAt) VALUES (%s, %s, %s, NOW())",
+        (migration.version, migration.name, migration.checksum),
+    )
+    conn.commit()
+
+
+def migrate(target=None, dry_run=False):
+    """Apply pending migrations up to ``target`` (all by default). Returns the versions applied."""
+    migrations = [m for m in load_migrations() if target is None or m.version <= target]
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+            if cursor.fetchone()[0] != 1:
+                raise SystemExit("Another migration run holds the lock")
+            try:
+                _ensure_table(cursor)
+                applied = _applied(cursor)
+                for migration in migrations:
+                    if migration.version in applied and applied[migration.version] != migration.checksum:
+                        # Applied files are history; changes belong in a new migration
+                        print(f"Warning: {migration.path} changed after it was applied")
+                pending = [m for m in migrations if m.version not in applied]
+                for migration in pending:
+                    print(f"{'Would apply' if dry_run else 'Applying'} {migration.version:04d}_{migration.name}")
+                    if dry_run:
+                        for statement in migration.statements():
+                            print(f"  {statement};")
+                        continue
+                    _apply(conn, cursor, migration)
+                return [] if dry_run else [migration.version for migration in pending]
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+def status():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _ensure_table(cursor)
+        applied = _applied(cursor)
+        cursor.close()
+    for migration in load_migrations():
+        state = "applied" if migration.version in applied else "pending"
+        if state == "applied" and applied[migration.version] != migration.checksum:
+            state = "applied (file changed since)"
+        print(f"{migration.version:04d}_{migration.name:<40} {state}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--dry-run", action="store_true", help="print pending statements without running them")
+    parser.add_argument("--to", type=int, help="stop after this version")
+    args = parser.parse_args()
+    if args.status:
+        status()
+        sys.exit(0)
+    applied = migrate(args.to, args.dry_run)
+    print(f"Applied {len(applied)} migration(s)" if not args.dry_run else "Dry run, nothing applied")
@@ -0,0 +1,51 @@
+-- Tables that were first added to data/agricultureWebSchema.sql only: the
+-- on-chain event index (chain/indexer.py) and uploaded images
+-- (api/routes/images.py). Databases created before them get them here;
+-- the definitions are copied from the schema file. Numbered 0000 so they
+-- exist before any later migration touches them.
+
+CREATE TABLE IF NOT EXISTS chainEvents (
+    eventId BIGINT PRIMARY KEY AUTO_INCREMENT,
+    blockNumber BIGINT NOT NULL,
+    blockHash VARCHAR(66) NOT NULL,
+    txHash VARCHAR(66) NOT NULL,
+    logIndex INT NOT NULL,
+    eventName VARCHAR(64) NOT NULL,
+    batchId BIGINT,
+    relatedBatchId BIGINT,  -- newBatchId for BatchTransformed, parentId for BatchCreated
+    txId BIGINT,
+    account VARCHAR(255),  -- lowercased owner/buyer address
+    args JSON NOT NULL,
+    UNIQUE KEY uq_chainEvents_log (txHash, logIndex),
+    KEY idx_chainEvents_block (blockNumber),
+    KEY idx_chainEvents_batch (batchId, blockNumber, logIndex),
+    KEY idx_chainEvents_related (relatedBatchId),
+    KEY idx_chainEvents_tx (txId),
+    KEY idx_chainEvents_name (eventName, blockNumber)
+);
+
+CREATE TABLE IF NOT EXISTS chainBlocks (
+    blockNumber BIGINT PRIMARY KEY,
+    blockHash VARCHAR(66) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chainCheckpoint (
+    name VARCHAR(64) PRIMARY KEY,
+    blockNumber BIGINT NOT NULL,
+    blockHash VARCHAR(66) NOT NULL,
+    updatedAt DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS images (
+    imageId BIGINT PRIMARY KEY AUTO_INCREMENT,
+    fileName VARCHAR(255) UNIQUE NOT NULL,  -- what products.imageSrc refers to
+    contentHash CHAR(64) NOT NULL,  -- sha256 of the original bytes
+    contentType VARCHAR(64) NOT NULL,
+    bytes BIGINT NOT NULL,
+    width INT NOT NULL,
+    height INT NOT NULL,
+    thumbnailPath VARCHAR(255),
+    webpPath VARCHAR(255),
+    createdAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_images_hash (contentHash)
+);
@@ -0,0 +1,16 @@
+-- Composite indexes for the hot predicates, so listings, history and the cart
+-- read in index order instead of scanning and filesorting.
+-- Built online (INPLACE, LOCK=NONE): reads and writes continue during the build.
+
+-- Catalog listings: isForSale = 1 ORDER BY productId DESC, optionally per category or region
+ALTER TABLE products ADD INDEX idx_products_sale (isForSale, productId), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE products ADD INDEX idx_products_category_sale (categoryId, isForSale, productId), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE products ADD INDEX idx_products_region_sale (region, isForSale, productId), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Transaction history per buyer / seller, newest first, and time-range reports
+ALTER TABLE transactions ADD INDEX idx_transactions_buyer (buyerId, timestamp), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE transactions ADD INDEX idx_transactions_seller (sellerId, timestamp), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE transactions ADD INDEX idx_transactions_time (timestamp), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Cart contents per user, newest first
+ALTER TABLE shoppingCart ADD INDEX idx_cart_user (userId, addedAt), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,8 @@
+-- Wallet addresses are always looked up lowercased. Store them that way and
+-- compare them bytewise, so the unique index lookup needs no case folding.
+
+UPDATE users SET walletAddress = LOWER(walletAddress)
+WHERE CAST(walletAddress AS BINARY) <> CAST(LOWER(walletAddress) AS BINARY);
+
+ALTER TABLE users MODIFY walletAddress VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL;
+ALTER TABLE users ADD CONSTRAINT chk_users_wallet_lower CHECK (walletAddress = LOWER(walletAddress));
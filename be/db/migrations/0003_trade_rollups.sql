@@ -0,0 +1,56 @@
+-- Per-user (as buyer and as seller) and per-product trade rollups, maintained
+-- by buy_product in the purchase transaction (see utils/rollups.py), so summaries
+-- read a handful of rows instead of aggregating the transaction history.
+
+CREATE TABLE IF NOT EXISTS tradeTotals (
+    scope ENUM('buyer', 'seller', 'product') NOT NULL,
+    subjectId BIGINT NOT NULL,  -- userId for buyer/seller, productId for product
+    tradeCount INT NOT NULL,
+    units BIGINT NOT NULL,
+    valueWei DECIMAL(38, 0) NOT NULL,
+    firstTradeAt DATETIME NOT NULL,
+    lastTradeAt DATETIME NOT NULL,
+    PRIMARY KEY (scope, subjectId)
+);
+
+CREATE TABLE IF NOT EXISTS tradeDaily (
+    scope ENUM('buyer', 'seller', 'product') NOT NULL,
+    subjectId BIGINT NOT NULL,
+    day DATE NOT NULL,
+    tradeCount INT NOT NULL,
+    units BIGINT NOT NULL,
+    valueWei DECIMAL(38, 0) NOT NULL,
+    PRIMARY KEY (scope, subjectId, day)
+);
+
+-- Backfill from the existing history, valued at the products' current price.
+-- INSERT IGNORE keeps a re-run from double counting; apply before deploying the writers.
+INSERT IGNORE INTO tradeTotals (scope, subjectId, tradeCount, units, valueWei, firstTradeAt, lastTradeAt)
+SELECT 'buyer', t.buyerId, COUNT(*), SUM(t.quantity), SUM(CAST(COALESCE(p.price, 0) AS DECIMAL(38, 0)) * t.quantity), MIN(t.timestamp), MAX(t.timestamp)
+FROM transactions t LEFT JOIN products p ON p.productId = t.productId
+WHERE t.buyerId IS NOT NULL GROUP BY t.buyerId;
+
+INSERT IGNORE INTO tradeTotals (scope, subjectId, tradeCount, units, valueWei, firstTradeAt, lastTradeAt)
+SELECT 'seller', t.sellerId, COUNT(*), SUM(t.quantity), SUM(CAST(COALESCE(p.price, 0) AS DECIMAL(38, 0)) * t.quantity), MIN(t.timestamp), MAX(t.timestamp)
+FROM transactions t LEFT JOIN products p ON p.productId = t.productId
+WHERE t.sellerId IS NOT NULL GROUP BY t.sellerId;
+
+INSERT IGNORE INTO tradeTotals (scope, subjectId, tradeCount, units, valueWei, firstTradeAt, lastTradeAt)
+SELECT 'product', t.productId, COUNT(*), SUM(t.quantity), SUM(CAST(COALESCE(p.price, 0) AS DECIMAL(38, 0)) * t.quantity), MIN(t.timestamp), MAX(t.timestamp)
+FROM transactions t LEFT JOIN products p ON p.productId = t.productId
+WHERE t.productId IS NOT NULL GROUP BY t.productId;
+
+INSERT IGNORE INTO tradeDaily (scope, subjectId, day, tradeCount, units, valueWei)
+SELECT 'buyer', t.buyerId, DATE(t.timestamp), COUNT(*), SUM(t.quantity), SUM(CAST(COALESCE(p.price, 0) AS DECIMAL(38, 0)) * t.quantity)
+FROM transactions t LEFT JOIN products p ON p.productId = t.productId
+WHERE t.buyerId IS NOT NULL GROUP BY t.buyerId, DATE(t.timestamp);
+
+INSERT IGNORE INTO tradeDaily (scope, subjectId, day, tradeCount, units, valueWei)
+SELECT 'seller', t.sellerId, DATE(t.timestamp), COUNT(*), SUM(t.quantity), SUM(CAST(COALESCE(p.price, 0) AS DECIMAL(38, 0)) * t.quantity)
+FROM transactions t LEFT JOIN products p ON p.productId = t.productId
+WHERE t.sellerId IS NOT NULL GROUP BY t.sellerId, DATE(t.timestamp);
+
+INSERT IGNORE INTO tradeDaily (scope, subjectId, day, tradeCount, units, valueWei)
+SELECT 'product', t.productId, DATE(t.timestamp), COUNT(*), SUM(t.quantity), SUM(CAST(COALESCE(p.price, 0) AS DECIMAL(38, 0)) * t.quantity)
+FROM transactions t LEFT JOIN products p ON p.productId = t.productId
+WHERE t.productId IS NOT NULL GROUP BY t.productId, DATE(t.timestamp);
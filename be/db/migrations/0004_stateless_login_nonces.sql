@@ -0,0 +1,5 @@
+-- Login challenges are signed by the API (utils/nonces.py) instead of stored,
+-- so new users are inserted without a nonce. The column stays for older
+-- deployments still running next to this one.
+
+ALTER TABLE users MODIFY nonce VARCHAR(10) NULL DEFAULT NULL;
@@ -1,14 +1,80 @@
-from fastapi import FastAPI
-from api.routes import products, images, categories, users, cart, transactions
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from api.routes import products, images, categories, users, cart, transactions, onchain
+from chain.client import ChainClient
+from chain.indexer import indexer_status, start_indexer, stop_indexer
+from core.config import COMPRESSION_CONFIG, INDEXER_CONFIG, METRICS_CONFIG
+from db.async_connection import async_pool_stats, close_async_pool, open_async_pool
+from db.connection import DatabaseUnavailable, pool_stats
+from utils.auth import token_cache, wallet_user_cache
+from utils.cache import catalog_cache
+from utils.compression import CompressionMiddleware
+from utils.images import shutdown_image_executor
+from utils.log import get_logger, sampler
+from utils.metrics import MetricsMiddleware, registry, slow_query_log
+from utils.nonces import replay_guard
+from utils.search import search_index
+from utils.signatures import signature_verifier
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+logger = get_logger(__name__)
+
+
+async def _warm_up(chain):
+    try:
+        await asyncio.to_thread(chain.build)
+    except Exception as e:
+        # Requests that need the chain retry the build and report their own errors
+        logger.warning("Chain client warm-up failed: %s", e)
+    try:
+        # Spawns the signature workers; the first login would otherwise pay for it
+        await asyncio.to_thread(signature_verifier.warm)
+    except Exception as e:
+        logger.warning("Signature worker warm-up failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared resources once per worker and close them on shutdown.
+
+    The web3 client and contract are built in a thread (``chain.client``), so
+    the worker serves catalog requests while web3 is still being imported.
+    """
+    app.state.chain = ChainClient()
+    await open_async_pool()
+    warm_up = asyncio.create_task(_warm_up(app.state.chain))
+    if INDEXER_CONFIG["enabled"]:
+        start_indexer(app.state.chain)
+    yield
+    await stop_indexer()
+    await warm_up
+    await app.state.chain.close()
+    shutdown_image_executor()
+    signature_verifier.shutdown()
+    await close_async_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS settings
 origins = ["http://localhost:3000", "http://127.0.0.1:5173", "http://localhost:5173"]
 app.add_middleware(
     CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
 )
+if COMPRESSION_CONFIG["enabled"]:
+    app.add_middleware(CompressionMiddleware, **COMPRESSION_CONFIG)
+# Added last so it is outermost and its timings include CORS handling and compression
+if METRICS_CONFIG["enabled"]:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailable):
+    # One per failed request while the database is down, so keep a sample
+    logger.warning("Database connection error: %s", exc, extra={"sample_rate": 0.1})
+    return JSONResponse(status_code=503, content={"detail": "Database connection failed"})
 
 # Include API routes
 app.include_router(products.router, prefix="/products", tags=["Products"])
@@ -17,7 +83,105 @@ app.include_router(categories.router, prefix="/categories", tags=["Categories"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(cart.router, prefix="/cart", tags=["Cart"])
 app.include_router(transactions.router, prefix="/transactions", tags=["Transactions"])
+app.include_router(onchain.router, prefix="/chain", tags=["Chain"])
 @app.get("/")
 def root():
     return {"message": "Welcome to the Coffee Marketplace API"}
 
+@app.get("/health/db")
+async def db_health():
+    """Connection pool statistics (in use, waiting, created, recycled)."""
+    return {"pool": async_pool_stats(), "syncPool": pool_stats()}
+
+@app.get("/health/cache")
+async def cache_health():
+    """Catalog cache counters (hits, misses, evictions) and the current catalog version."""
+    return catalog_cache.stats()
+
+@app.get("/health/images")
+async def images_health():
+    """Hot image cache counters (entries, bytes, hits)."""
+    return images.hot_images.stats()
+
+@app.get("/health/search")
+async def search_health():
+    """Search index size, age and result cache counters."""
+    return search_index.stats()
+
+@app.get("/health/auth")
+async def auth_health():
+    """Verified-token and wallet -> userId cache counters, signature recovery queue, claimed login nonces."""
+    return {"tokens": token_cache.stats(), "wallets": wallet_user_cache.stats(),
+            "signatures": signature_verifier.stats(), "nonces": replay_guard.stats()}
+
+@app.get("/health/slow-queries")
+async def slow_queries():
+    """Recent statements over the slow-query threshold, slowest first, literals masked."""
+    return {"thresholdS": slow_query_log.threshold, "queries": slow_query_log.entries()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the request, SQL and RPC histograms and component gauges."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# ============= Gauges read from component stats at scrape time =============
+POOL_GAUGES = ("size", "idle", "inUse", "waiting")
+POOL_COUNTERS = ("created", "recycled", "timeouts")
+CACHE_COUNTERS = ("hits", "misses", "evictions")
+
+
+@registry.collector
+def collect_pools():
+    pools = {"async": async_pool_stats(), "sync": pool_stats()}
+    families = []
+    for key in POOL_GAUGES:
+        families.append((f"db_pool_{key.lower()}", "gauge", f"Connection pool {key}.",
+                         [({"pool": name}, stats[key]) for name, stats in pools.items() if stats]))
+    for key in POOL_COUNTERS:
+        families.append((f"db_pool_{key}_total", "counter", f"Connections {key} by the pool.",
+                         [({"pool": name}, stats[key]) for name, stats in pools.items() if stats]))
+    return families
+
+
+@registry.collector
+def collect_caches():
+    caches = {
+        "catalog": catalog_cache.stats(),
+        "tokens": token_cache.stats(),
+        "wallets": wallet_user_cache.stats(),
+        "searchResults": search_index.stats()["results"],
+        "hotImages": images.hot_images.stats(),
+    }
+    families = [("cache_entries", "gauge", "Entries held by each cache.",
+                 [({"cache": name}, stats["entries"]) for name, stats in caches.items()])]
+    for key in CACHE_COUNTERS:
+        families.append((f"cache_{key}_total", "counter", f"Cache {key}.",
+                         [({"cache": name}, stats[key]) for name, stats in caches.items()]))
+    families.append(("catalog_version", "gauge", "Catalog cache version.", [({}, catalog_cache.version)]))
+    return families
+
+
+@registry.collector
+def collect_components():
+    search = search_index.stats()
+    indexer = indexer_status()
+    chain = getattr(app.state, "chain", None)
+    reader = (chain.stats() if chain else None) or {}
+    signatures = signature_verifier.stats()
+    return [
+        ("search_index_documents", "gauge", "Products in the search index.", [({}, search["documents"])]),
+        ("search_index_age_seconds", "gauge", "Seconds since the search index was built.", [({}, search["builtAgoS"])]),
+        ("indexer_lag_blocks", "gauge", "Blocks between the chain head and the indexer.", [({}, indexer.get("lag"))]),
+        ("batch_reader_round_trips_total", "counter", "Batched eth_call round trips.", [({}, reader.get("roundTrips"))]),
+        ("batch_reader_calls_total", "counter", "Contract reads requested.", [({}, reader.get("calls"))]),
+        ("batch_reader_coalesced_total", "counter", "Contract reads joined to one already in flight.",
+         [({}, reader.get("coalesced"))]),
+        ("rpc_retries_total", "counter", "JSON-RPC requests retried after a connection error or 429/5xx.",
+         [({}, reader.get("retries"))]),
+        ("signatures_pending", "gauge", "Login signatures queued or being recovered.", [({}, signatures["pending"])]),
+        ("signatures_recovered_total", "counter", "Login signatures recovered.", [({}, signatures["recovered"])]),
+        ("signatures_rejected_total", "counter", "Login signatures refused because the queue was full.",
+         [({}, signatures["rejected"])]),
+        ("log_records_dropped_total", "counter", "Log records dropped by sampling.", [({}, sampler.dropped)]),
+    ]
@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -31,10 +31,36 @@ class ProductResponse(BaseModel):
     expirationDate: Optional[datetime] = None
     currentStatus: str
     imageSrc: Optional[str] = None
+    thumbnailSrc: Optional[str] = None  # Small WebP rendition, when the image has been processed
     price: str
     categoryName: Optional[str] = None
     description: Optional[str] = None  # Added description field
     quantity: Optional[int] = None  
     ownerAddress: Optional[str] = None
     region: Optional[str] = None
-    productId: int
\ No newline at end of file
+    productId: int
+    onchain: Optional[dict] = None  # Live batch state, only with ?onchain=true
+
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    next: Optional[str] = None  # Opaque cursor for the following page, None on the last one
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucketCount(BaseModel):
+    min: str
+    max: Optional[str] = None  # None for the open-ended top bucket
+    count: int
+
+class SearchFacets(BaseModel):
+    category: List[FacetCount]
+    region: List[FacetCount]
+    status: List[FacetCount]
+    price: List[PriceBucketCount]
+
+class ProductSearchPage(BaseModel):
+    items: List[ProductResponse]
+    total: int  # Matches across all pages
+    facets: SearchFacets
@@ -1,21 +1,112 @@
+import hashlib
 import time
+from dataclasses import dataclass
 import jwt
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from core.config import TOKEN_CACHE_CONFIG, WALLET_CACHE_CONFIG
+from db.async_connection import get_async_connection
+from utils.cache import CatalogCache
 
 # Move your SECRET_KEY here or import it from a config file
 SECRET_KEY = "4f86320f08bec7df1c96740d5e0611471fd11485b070ddcb8c8847beb333a568e58fc35e7d63325cbc544ea7cbc20507b2f21449a01e0077e727bf6b16bb3fdc8e3cb382eb0dcaa5fe5f7f408aec2f0d5a047513f6425d7f03f3f03f22fd665eaf63dee213283897bccf35dc98d2bb1dc729debb1a3616108ca8c0dce44e69a8047f10ce7012ac515a2346ac5ec208586d70c273da47cb4e61501473f03e713da641a4d43245264b60acccf39434736cc97a6159d911087c7e654167085ad0cf2bf29f33f4cb5ac9ee55c54bf9ebcfa081c2eb856a012f70871d879bfbdba714150191cdd1cfa6b44dd202c8a2bc916d4dc8484afa59ca513fb2ddb1511112ab"
 
+# Version 1 tokens only carry "wallet"; version 2 adds "uid" and "ver"
+TOKEN_VERSION = 2
+TOKEN_TTL = 3600
+
 security = HTTPBearer()
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+# Verified tokens keyed by a digest of the raw token; bumped when the signing key rotates
+token_cache = CatalogCache(**TOKEN_CACHE_CONFIG)
+
+# Never bumped: a wallet keeps its userId, the TTL just bounds memory for idle wallets
+wallet_user_cache = CatalogCache(**WALLET_CACHE_CONFIG)
+
+USER_BY_WALLET = "SELECT userId FROM users WHERE walletAddress = %s"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, as read from a verified token."""
+    wallet: str
+    user_id: int
+    token_version: int
+
+
+def rotate_secret_key(new_key: str):
+    """Sign and verify with ``new_key`` from now on; tokens signed with the old key stop working."""
+    global SECRET_KEY
+    SECRET_KEY = new_key
+    token_cache.bump()
+
+
+def issue_token(wallet_address: str, user_id: int) -> str:
+    return jwt.encode(
+        {"wallet": wallet_address, "uid": user_id, "ver": TOKEN_VERSION, "exp": time.time() + TOKEN_TTL},
+        SECRET_KEY,
+        algorithm="HS256",
+    )
+
+
+async def resolve_user_id(wallet_address: str):
+    """userId for a wallet, or None if it has never logged in."""
+    wallet_address = wallet_address.lower()
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
-        wallet_address = payload.get("wallet")
-        if not wallet_address:
-            raise HTTPException(status_code=401, detail="Invalid token: wallet address not found")
-        return wallet_address
+        return await wallet_user_cache.get_or_load(wallet_address, lambda: _load_user_id(wallet_address))
+    except LookupError:
+        return None
+
+
+async def _load_user_id(wallet_address):
+    async with get_async_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute(USER_BY_WALLET, (wallet_address,))
+        user = await cursor.fetchone()
+    if not user:
+        # Raised rather than returned so unknown wallets are not cached
+        raise LookupError(wallet_address)
+    return user[0]
+
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> Principal:
+    """Resolve the bearer token to a Principal, skipping the signature check for tokens seen before.
+
+    A cached entry lives until the token's ``exp`` (capped by the cache TTL),
+    so an expired token is never served from the cache.
+    """
+    token = credentials.credentials
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    principal = token_cache.get(key)
+    if principal is not None:
+        return principal
+
+    version = token_cache.version
+    principal, expires_at = await _verify(token)
+    token_cache.set(key, principal, version, ttl=None if expires_at is None else expires_at - time.time())
+    return principal
+
+
+async def _verify(token):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    wallet_address = payload.get("wallet")
+    if not wallet_address:
+        raise HTTPException(status_code=401, detail="Invalid token: wallet address not found")
+
+    version = payload.get("ver", 1)
+    if version == TOKEN_VERSION:
+        user_id = payload.get("uid")
+        if not isinstance(user_id, int):
+            raise HTTPException(status_code=401, detail="Invalid token: user id not found")
+    elif version == 1:
+        user_id = await resolve_user_id(wallet_address)
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Invalid token: unknown wallet address")
+    else:
+        raise HTTPException(status_code=401, detail="Invalid token: unsupported version")
+    return Principal(wallet_address, user_id, version), payload.get("exp")
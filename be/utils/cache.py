@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from core.config import CATALOG_CACHE_CONFIG
+
+_MISSING = object()
+
+
+class CatalogCache:
+    """LRU + TTL cache for catalog reads, tied to a catalog version.
+
+    Write endpoints call ``bump()`` after committing; that advances the
+    version and drops every entry at once, so readers never wait out a TTL to
+    see a purchase or a new listing. The TTL only bounds staleness from writes
+    made outside this process (other workers, seeding scripts).
+
+    Meant to be used from the event loop only, so it needs no locking.
+    """
+
+    def __init__(self, max_entries=1024, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> (version, future) for loads in progress
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, version=None, ttl=None):
+        # A load that started before a write must not repopulate the cache
+        if version is not None and version != self.version:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader):
+        """Return the cached value for ``key`` or await ``loader()`` once for all concurrent callers."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] == self.version:
+            try:
+                return await asyncio.shield(inflight[1])
+            except asyncio.CancelledError:
+                # Only swallow it when the loading request went away, not us
+                if not inflight[1].cancelled():
+                    raise
+
+        version = self.version
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (version, future)
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so lone failures are not logged twice
+            raise
+        else:
+            future.set_result(value)
+            self.set(key, value, version)
+            return value
+        finally:
+            if self._inflight.get(key, (None, None))[1] is future:
+                del self._inflight[key]
+
+    def bump(self):
+        """Advance the catalog version and drop every cached entry."""
+        self.version += 1
+        self.invalidations += 1
+        self._entries.clear()
+        return self.version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class HotFileCache:
+    """Byte-bounded LRU of small files that never change once written.
+
+    Only meant for content-addressed files (the name is the hash of the
+    bytes), so entries never need revalidating against the disk.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_file_bytes=256 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries = OrderedDict()  # key -> (body, media_type, last_modified)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, body, media_type, last_modified):
+        if len(body) > self.max_file_bytes or key in self._entries:
+            return
+        self._entries[key] = (body, media_type, last_modified)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            _, (evicted, _, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+catalog_cache = CatalogCache(**CATALOG_CACHE_CONFIG)
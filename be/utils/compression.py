@@ -0,0 +1,145 @@
+"""Brotli / gzip response compression.
+
+Catalog lists are a few hundred bytes of JSON per product and compress
+six- to sevenfold, so every storefront poll that does send a body (see the
+ETags in utils/fastjson.py) sends far fewer bytes. Brotli is preferred when
+the client accepts it; its quality is kept low (``COMPRESSION_CONFIG``)
+because at high settings it costs many times the CPU of gzip for a few
+percent fewer bytes.
+
+Bodies under ``minimum_size``, already encoded responses, partial content
+and types that do not compress (images, fonts) pass through untouched.
+"""
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+from utils.metrics import registry
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+COMPRESSION_INPUT = registry.counter("http_compression_input_bytes_total", "Response bytes before compression.",
+                                     ("encoding",))
+COMPRESSION_OUTPUT = registry.counter("http_compression_output_bytes_total", "Response bytes after compression.",
+                                      ("encoding",))
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+
+    def compress(self, data):
+        return self._zlib.compress(data)
+
+    def finish(self):
+        return self._zlib.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._brotli.process(data)
+
+    def finish(self):
+        return self._brotli.finish()
+
+
+def accepted_encoding(accept_encoding):
+    """``"br"``, ``"gzip"`` or None for an Accept-Encoding header, preferring brotli."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        try:
+            quality = float(params.strip().removeprefix("q=")) if params.strip().startswith("q=") else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(coding.strip())
+    for coding in ("br", "gzip"):
+        if coding in accepted or "*" in accepted:
+            return coding
+    return None
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing response bodies; streamed bodies are compressed per chunk."""
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4, **_):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compressor(self, encoding):
+        return _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+
+    @staticmethod
+    def _compressible(start):
+        headers = Headers(raw=start["headers"])
+        content_type = headers.get("content-type", "")
+        return (
+            start["status"] not in (204, 206, 304) and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                if self._compressible(message):
+                    MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+                    start = message  # Held until the first body chunk shows the size
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                compressor = self._compressor(encoding)
+                headers = MutableHeaders(scope=start)
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # Other bytes than the identity body, so no longer strongly equal to it
+                    headers["ETag"] = "W/" + etag
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    COMPRESSION_INPUT.inc(encoding, amount=len(message.get("body", b"")))
+                    COMPRESSION_OUTPUT.inc(encoding, amount=len(body))
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": body})
+                await send(start)
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            COMPRESSION_INPUT.inc(encoding, amount=len(body))
+            COMPRESSION_OUTPUT.inc(encoding, amount=len(chunk))
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
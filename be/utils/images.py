@@ -0,0 +1,159 @@
+"""Image decoding and variant generation, run in a process pool.
+
+Uploads are stored once per content hash; every image also gets a small
+WebP thumbnail for listings and a display-sized WebP for detail pages. The
+work is CPU-bound Pillow code, so it runs in worker processes and never on
+the event loop.
+
+Run ``python -m utils.images`` from the ``be`` directory to register the
+files already in the upload folder and derive their variants.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.config import IMAGE_CONFIG
+from db.connection import get_connection
+
+# Pillow format -> extension for content-addressed originals
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+VARIANT_URL_PREFIX = "/images/variants/"
+
+_executor = None
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def process_image(path, content_hash, variant_dir, thumbnail_size, display_size, quality):
+    """Validate an image and write its WebP variants; runs in a worker process.
+
+    Variants are named after the content hash, so an image that was already
+    processed is only decoded, not re-encoded. Raises ValueError for anything
+    that is not a supported image.
+    """
+    try:
+        with Image.open(path) as img:
+            image_format = img.format
+            if image_format not in EXTENSIONS:
+                raise ValueError(f"unsupported format {image_format}")
+            img = ImageOps.exif_transpose(img)
+            width, height = img.size
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+            variants = {}
+            for name, size in (("thumbnail", thumbnail_size), ("webp", display_size)):
+                file_name = f"{content_hash}_{size}.webp"
+                target = os.path.join(variant_dir, file_name)
+                if not os.path.exists(target):
+                    variant = img.copy()
+                    variant.thumbnail((size, size), Image.LANCZOS)  # Keeps aspect ratio, never upscales
+                    temp = f"{target}.{os.getpid()}.tmp"
+                    variant.save(temp, "WEBP", quality=quality, method=4)
+                    os.replace(temp, target)
+                variants[name] = VARIANT_URL_PREFIX + file_name
+    except UnidentifiedImageError:
+        raise ValueError("not a recognised image file") from None
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # Pillow reports corrupt files as OSError or SyntaxError
+        raise ValueError(str(e) or type(e).__name__) from None
+
+    return {
+        "format": image_format,
+        "contentType": Image.MIME[image_format],
+        "width": width,
+        "height": height,
+        "thumbnailPath": variants["thumbnail"],
+        "webpPath": variants["webp"],
+    }
+
+
+def get_image_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_CONFIG["workers"])
+    return _executor
+
+
+def shutdown_image_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _process(path, content_hash):
+    return partial(
+        process_image, path, content_hash, IMAGE_CONFIG["variant_dir"],
+        IMAGE_CONFIG["thumbnail_size"], IMAGE_CONFIG["display_size"], IMAGE_CONFIG["webp_quality"],
+    )
+
+
+async def derive_variants(path, content_hash):
+    """Run ``process_image`` for an upload in the shared process pool."""
+    return await asyncio.get_running_loop().run_in_executor(get_image_executor(), _process(path, content_hash))
+
+
+# ============= Backfill for images uploaded before content addressing =============
+def backfill(upload_dir):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT fileName FROM images")
+        known = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+
+    pending = [
+        name for name in sorted(os.listdir(upload_dir))
+        if not name.startswith(".") and name not in known and os.path.isfile(os.path.join(upload_dir, name))
+    ]
+    print(f"{len(pending)} images to register ({len(known)} already known)")
+
+    executor = get_image_executor()
+    done = skipped = 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Hashing happens here; decoding and encoding in the workers
+        jobs = []
+        for name in pending:
+            path = os.path.join(upload_dir, name)
+            content_hash = hash_file(path)
+            jobs.append((name, path, content_hash, executor.submit(_process(path, content_hash))))
+        for name, path, content_hash, job in jobs:
+            try:
+                info = job.result()
+            except ValueError as e:
+                print(f"Skipping {name}: {e}")
+                skipped += 1
+                continue
+            cursor.execute("""
+                INSERT INTO images (fileName, contentHash, contentType, bytes, width, height, thumbnailPath, webpPath)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE imageId = imageId
+            """, (name, content_hash, info["contentType"], os.path.getsize(path), info["width"],
+                  info["height"], info["thumbnailPath"], info["webpPath"]))
+            done += 1
+            if done % 100 == 0:
+                conn.commit()
+                print(f"{done}/{len(pending)} registered")
+        conn.commit()
+        cursor.close()
+    shutdown_image_executor()
+    print(f"Registered {done} images, skipped {skipped}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Register existing uploads and derive their variants.")
+    parser.add_argument("--upload-dir", default=IMAGE_CONFIG["upload_dir"])
+    args = parser.parse_args()
+    os.makedirs(IMAGE_CONFIG["variant_dir"], exist_ok=True)
+    backfill(args.upload_dir)
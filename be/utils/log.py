@@ -0,0 +1,57 @@
+"""Leveled, sampled logging for the API.
+
+Every module logs through ``get_logger(__name__)``. Errors and warnings are
+always written; debug and info records are kept with probability
+``LOG_SAMPLE_RATE``, so chatty paths can stay instrumented in production.
+A call can set its own rate with ``extra={"sample_rate": 0.01}``, which is
+how noisy warnings (one per failed request during an outage) are thinned.
+
+Disabled levels cost one ``isEnabledFor`` check, so debug calls left on hot
+paths are effectively free at the default INFO level.
+"""
+import logging
+import random
+
+from core.config import LOG_CONFIG
+
+ROOT = "agriculture"
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.dropped = 0
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            if record.levelno >= logging.WARNING:
+                return True
+            rate = self.sample_rate
+        if rate >= 1 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+def _configure():
+    logger = logging.getLogger(ROOT)
+    if logger.handlers:
+        return logger.handlers[0].filters[0]
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    sampler = SamplingFilter(LOG_CONFIG["sample_rate"])
+    handler.addFilter(sampler)
+    logger.addHandler(handler)
+    logger.setLevel(LOG_CONFIG["level"])
+    # Keep records out of uvicorn's root handlers, which would print them twice
+    logger.propagate = False
+    return sampler
+
+
+sampler = _configure()
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT}.{name}")
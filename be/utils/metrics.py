@@ -0,0 +1,204 @@
+"""Request, SQL and RPC timing exported in the Prometheus text format.
+
+Counters and histograms live in plain dicts keyed by label values, so an
+observation is a dict lookup, a bisect and two additions on the event loop.
+Gauges (pool sizes, cache counters, index sizes) are not tracked at all on
+the hot paths: collectors registered with ``registry.collector`` read the
+existing ``stats()`` of each component when ``/metrics`` is scraped.
+
+- ``MetricsMiddleware`` times every request per route template and status
+- ``observe_query`` is called by the async pool's connections for every
+  statement and keeps the slowest ones in ``slow_query_log``
+- ``observe_rpc`` times JSON-RPC calls to the node (see chain/rpc.py)
+"""
+import bisect
+import re
+import time
+from collections import deque
+
+from core.config import METRICS_CONFIG
+
+# Seconds; spans a cached read (sub-ms) to a slow chain call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}  # label values -> [count per bucket..., count above the last bucket, sum]
+
+    def observe(self, value, *labels):
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        child[bisect.bisect_left(self.buckets, value)] += 1
+        child[-1] += value
+
+    def samples(self):
+        for labels, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), child):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(child[-1])}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Register ``func() -> [(name, kind, help, [(labels dict, value), ...]), ...]``, run per scrape."""
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template and status.", ("method", "route", "status")
+)
+DB_LATENCY = registry.histogram("db_query_duration_seconds", "SQL statement latency by statement type.", ("operation",))
+DB_SLOW_QUERIES = registry.counter("db_slow_queries_total", "Statements slower than the slow-query threshold.")
+RPC_LATENCY = registry.histogram("rpc_request_duration_seconds", "JSON-RPC call latency by method.", ("method",))
+RPC_ERRORS = registry.counter("rpc_errors_total", "JSON-RPC calls that raised, by method.", ("method",))
+
+
+# ============= SQL =============
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b0x[0-9a-fA-F]+\b|\b\d+(?:\.\d+)?\b")
+
+
+class SlowQueryLog:
+    """The most recent statements slower than ``threshold`` seconds, with literals masked."""
+
+    def __init__(self, threshold, max_entries=100):
+        self.threshold = threshold
+        self._entries = deque(maxlen=max_entries)
+
+    def record(self, sql, elapsed):
+        # Values are masked so wallets and nonces do not end up on a diagnostics endpoint
+        statement = _LITERALS.sub("?", " ".join(sql.split()))[:1000]
+        self._entries.append({"at": time.time(), "ms": round(elapsed * 1000, 2), "sql": statement})
+
+    def entries(self):
+        return sorted(self._entries, key=lambda entry: entry["ms"], reverse=True)
+
+
+slow_query_log = SlowQueryLog(METRICS_CONFIG["slow_query_threshold"], METRICS_CONFIG["slow_query_log_size"])
+
+
+def observe_query(sql, elapsed):
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors="replace")
+    head = sql.lstrip()[:12].split(None, 1)
+    DB_LATENCY.observe(elapsed, head[0].upper() if head else "")
+    if elapsed >= slow_query_log.threshold:
+        DB_SLOW_QUERIES.inc()
+        slow_query_log.record(sql, elapsed)
+
+
+# ============= JSON-RPC =============
+def observe_rpc(method, elapsed, failed=False):
+    RPC_LATENCY.observe(elapsed, method)
+    if failed:
+        RPC_ERRORS.inc(method)
+
+
+# ============= HTTP =============
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering) timing each request.
+
+    Latency runs until the last body chunk is sent. Requests are labelled by
+    the matched route template, so ``/products/{product_id}`` is one series
+    however many ids are requested; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"],
+                                 getattr(route, "path", "unmatched"), status)
@@ -0,0 +1,105 @@
+"""Signed, time-bound login challenges.
+
+A nonce is ``<expires>.<salt>.<mac>``: the expiry (unix seconds), a random
+salt and an HMAC over wallet, expiry and salt keyed from the token signing
+key. The API can check one it issued without storing it, so
+``GET /users/auth/nonce`` needs no database at all.
+
+A nonce is single use. Once a signature over it has been accepted its MAC
+goes in ``replay_guard`` until the nonce expires. That set is per worker
+process: with several workers, a captured signature could be replayed on
+another worker within ``NONCE_CONFIG["ttl"]`` seconds, which only yields
+another token for the wallet that signed it.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+
+import utils.auth as auth
+from core.config import NONCE_CONFIG
+
+
+class InvalidNonce(ValueError):
+    pass
+
+
+class ReplayGuardFull(Exception):
+    pass
+
+
+def _mac(wallet_address, expires, salt):
+    # Derived rather than the JWT key itself, and read per call so rotate_secret_key applies
+    key = hashlib.sha256(b"login-nonce:" + auth.SECRET_KEY.encode()).digest()
+    return hmac.new(key, f"{wallet_address}:{expires}:{salt}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_nonce(wallet_address, ttl=None):
+    expires = int(time.time()) + (NONCE_CONFIG["ttl"] if ttl is None else ttl)
+    salt = secrets.token_hex(8)
+    return f"{expires}.{salt}.{_mac(wallet_address.lower(), expires, salt)}"
+
+
+def check_nonce(wallet_address, nonce):
+    """``(mac, expires)`` for a nonce this API issued to ``wallet_address``; raises InvalidNonce otherwise."""
+    try:
+        expires, salt, mac = nonce.split(".")
+        expires = int(expires)
+    except ValueError:
+        raise InvalidNonce("Malformed nonce")
+    if not mac.isascii():
+        # compare_digest raises TypeError for non-ASCII str
+        raise InvalidNonce("Malformed nonce")
+    if not hmac.compare_digest(mac, _mac(wallet_address.lower(), expires, salt)):
+        raise InvalidNonce("Nonce was not issued for this wallet")
+    if expires <= time.time():
+        raise InvalidNonce("Nonce expired")
+    return mac, expires
+
+
+class ReplayGuard:
+    """MACs of accepted nonces, each kept until its nonce expires.
+
+    Entries are never evicted early, since that would let a replay through:
+    when the set is full of live nonces ``claim`` raises ReplayGuardFull and
+    the login is refused instead. Meant to be used from the event loop only.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._claimed = OrderedDict()  # mac -> expires, roughly in expiry order
+        self.replays = 0
+
+    def _purge(self, now, full_scan=False):
+        if full_scan:
+            for mac in [mac for mac, expires in self._claimed.items() if expires <= now]:
+                del self._claimed[mac]
+            return
+        while self._claimed and next(iter(self._claimed.values())) <= now:
+            self._claimed.popitem(last=False)
+
+    def seen(self, mac):
+        if mac in self._claimed:
+            self.replays += 1
+            return True
+        return False
+
+    def claim(self, mac, expires):
+        """Mark a nonce used; False if it already was."""
+        if self.seen(mac):
+            return False
+        now = time.time()
+        self._purge(now)
+        if len(self._claimed) >= self.max_entries:
+            self._purge(now, full_scan=True)
+            if len(self._claimed) >= self.max_entries:
+                raise ReplayGuardFull(f"{len(self._claimed)} unexpired nonces")
+        self._claimed[mac] = expires
+        return True
+
+    def stats(self):
+        return {"entries": len(self._claimed), "maxEntries": self.max_entries, "replays": self.replays}
+
+
+replay_guard = ReplayGuard(NONCE_CONFIG["replay_entries"])
@@ -0,0 +1,23 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(position: dict) -> str:
+    """Pack the last row's sort key into an opaque, URL-safe token."""
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, *keys: str) -> dict:
+    """Unpack a token from ``encode_cursor`` and check it carries ``keys``."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or any(key not in position for key in keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
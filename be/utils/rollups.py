@@ -0,0 +1,133 @@
+"""Trade rollups maintained alongside every purchase.
+
+``tradeTotals`` holds one row per buyer, seller and product with running
+count, units, value and first/last trade time; ``tradeDaily`` holds the same
+per calendar day. ``record_trade`` upserts all six rows in two statements
+inside the caller's transaction, so the rollups commit or roll back with the
+purchase itself and summaries never aggregate the transaction history.
+``record_trades`` does the same for a whole cart checkout, still in two
+statements.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+# The roles derived table fans one purchase out to its buyer, seller and product rows;
+# the product's price is read in the same statement (its row is already locked by the purchase);
+# values are DECIMAL because price * quantity in wei overflows BIGINT
+_ROLES = """
+    FROM products
+    CROSS JOIN (
+        SELECT 'buyer' AS scope, %(buyer)s AS subjectId
+        UNION ALL SELECT 'seller', %(seller)s
+        UNION ALL SELECT 'product', %(product)s
+    ) AS roles
+    WHERE products.productId = %(product)s
+"""
+
+RECORD_TOTALS = """
+    INSERT INTO tradeTotals (scope, subjectId, tradeCount, units, valueWei, firstTradeAt, lastTradeAt)
+    SELECT roles.scope, roles.subjectId, 1, %(quantity)s, CAST(COALESCE(products.price, 0) AS DECIMAL(38, 0)) * %(quantity)s, NOW(), NOW()
+""" + _ROLES + """
+    ON DUPLICATE KEY UPDATE
+        tradeCount = tradeTotals.tradeCount + 1,
+        units = tradeTotals.units + VALUES(units),
+        valueWei = tradeTotals.valueWei + VALUES(valueWei),
+        lastTradeAt = VALUES(lastTradeAt)
+"""
+
+RECORD_DAILY = """
+    INSERT INTO tradeDaily (scope, subjectId, day, tradeCount, units, valueWei)
+    SELECT roles.scope, roles.subjectId, CURDATE(), 1, %(quantity)s, CAST(COALESCE(products.price, 0) AS DECIMAL(38, 0)) * %(quantity)s
+""" + _ROLES + """
+    ON DUPLICATE KEY UPDATE
+        tradeCount = tradeDaily.tradeCount + 1,
+        units = tradeDaily.units + VALUES(units),
+        valueWei = tradeDaily.valueWei + VALUES(valueWei)
+"""
+
+# Multi-row forms for record_trades, with one VALUES tuple per rollup row
+RECORD_TOTALS_ROWS = """
+    INSERT INTO tradeTotals (scope, subjectId, tradeCount, units, valueWei, firstTradeAt, lastTradeAt)
+    VALUES {rows}
+    ON DUPLICATE KEY UPDATE
+        tradeCount = tradeTotals.tradeCount + VALUES(tradeCount),
+        units = tradeTotals.units + VALUES(units),
+        valueWei = tradeTotals.valueWei + VALUES(valueWei),
+        lastTradeAt = VALUES(lastTradeAt)
+"""
+
+RECORD_DAILY_ROWS = """
+    INSERT INTO tradeDaily (scope, subjectId, day, tradeCount, units, valueWei)
+    VALUES {rows}
+    ON DUPLICATE KEY UPDATE
+        tradeCount = tradeDaily.tradeCount + VALUES(tradeCount),
+        units = tradeDaily.units + VALUES(units),
+        valueWei = tradeDaily.valueWei + VALUES(valueWei)
+"""
+
+TOTALS_FOR = """
+    SELECT scope, tradeCount, units, valueWei, firstTradeAt, lastTradeAt
+    FROM tradeTotals
+    WHERE scope IN ({scopes}) AND subjectId = %s
+"""
+
+DAILY_FOR = """
+    SELECT scope, day, tradeCount, units, valueWei
+    FROM tradeDaily
+    WHERE scope IN ({scopes}) AND subjectId = %s AND day >= CURDATE() - INTERVAL %s DAY
+    ORDER BY scope, day
+"""
+
+
+async def record_trade(cursor, product_id, buyer_id, seller_id, quantity):
+    """Add one purchase to the rollups; call inside the purchase transaction, before its commit."""
+    params = {"product": product_id, "buyer": buyer_id, "seller": seller_id, "quantity": quantity}
+    await cursor.execute(RECORD_TOTALS, params)
+    await cursor.execute(RECORD_DAILY, params)
+
+
+async def record_trades(cursor, trades):
+    """Add several purchases to the rollups in two statements; call inside their transaction.
+
+    ``trades`` are ``(product_id, buyer_id, seller_id, quantity, price)`` with
+    the price read under the purchase's row lock, so the rows sent already
+    sum every trade per buyer, seller and product.
+    """
+    rows = defaultdict(lambda: [0, 0, Decimal(0)])
+    for product_id, buyer_id, seller_id, quantity, price in trades:
+        value = Decimal(price or 0) * quantity
+        for key in (("buyer", buyer_id), ("seller", seller_id), ("product", product_id)):
+            row = rows[key]
+            row[0] += 1
+            row[1] += quantity
+            row[2] += value
+    if not rows:
+        return
+    # Sorted so concurrent checkouts upsert rollup rows in the same order. Built by hand:
+    # executemany only folds rows into one INSERT when VALUES holds nothing but placeholders
+    params = [value for key in sorted(rows) for value in (*key, *rows[key])]
+    totals = ", ".join(["(%s, %s, %s, %s, %s, NOW(), NOW())"] * len(rows))
+    await cursor.execute(RECORD_TOTALS_ROWS.format(rows=totals), params)
+    daily = ", ".join(["(%s, %s, CURDATE(), %s, %s, %s)"] * len(rows))
+    await cursor.execute(RECORD_DAILY_ROWS.format(rows=daily), params)
+
+
+async def load_summary(cursor, scopes, subject_id, days):
+    """Totals and the last ``days`` daily buckets of ``subject_id`` for each scope (DictCursor)."""
+    placeholders = ", ".join(f"'{scope}'" for scope in scopes)
+    await cursor.execute(TOTALS_FOR.format(scopes=placeholders), (subject_id,))
+    totals = {row["scope"]: row for row in await cursor.fetchall()}
+    await cursor.execute(DAILY_FOR.format(scopes=placeholders), (subject_id, days))
+    daily = {scope: [] for scope in scopes}
+    for row in await cursor.fetchall():
+        row["valueWei"] = str(row["valueWei"])
+        daily[row.pop("scope")].append(row)
+
+    summary = {}
+    for scope in scopes:
+        total = totals.get(scope)
+        if total is not None:
+            del total["scope"]
+            total["valueWei"] = str(total["valueWei"])
+        summary[scope] = {"totals": total, "daily": daily[scope]}
+    return summary
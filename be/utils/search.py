@@ -0,0 +1,477 @@
+"""In-process inverted index behind ``GET /products/search``.
+
+Every for-sale product is tokenized over its name, category, region and
+description (weighted in that order). A query is an AND of its terms, where
+each term also matches as a prefix of longer words (search-as-you-type);
+hits are ranked by summed ``idf * field weight`` with exact words ahead of
+prefix-only matches. Matching, ranking and facet counts all work on bitsets,
+so their cost barely depends on how many products match.
+
+The index is built from MySQL on first use and kept current by the write
+paths: ``create_product`` refreshes the new row, ``buy_product`` adjusts
+stock in place and bulk loads mark it stale. Changes made by other worker
+processes are picked up by a periodic background rebuild.
+"""
+import asyncio
+import bisect
+import itertools
+import math
+import re
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+import aiomysql
+from fastapi.concurrency import run_in_threadpool
+
+from core.config import SEARCH_CONFIG
+from db.async_connection import get_async_connection
+from utils.cache import CatalogCache
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+FIELD_WEIGHTS = (("name", 3.0), ("categoryName", 2.0), ("region", 1.5), ("description", 1.0))
+PREFIX_PENALTY = 0.7  # A prefix-only match scores this fraction of an exact one
+MAX_SCORE_COMBINATIONS = 4096  # Bound on score groups crossed between query terms
+
+_WORD = re.compile(r"\w+")
+
+_PRODUCT_ROWS = """
+    SELECT products.id, products.productId, products.name, harvestDate, expirationDate, currentStatus, imageSrc,
+    images.thumbnailPath AS thumbnailSrc, price, category.name AS categoryName, description, quantity,
+    ownerAddress, region
+    FROM products
+    INNER JOIN category ON products.categoryId = category.categoryId
+    LEFT JOIN images ON images.fileName = products.imageSrc
+    WHERE isForSale = 1
+"""
+
+
+def tokenize(text):
+    """Lowercase, accent-folded words of ``text``."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    return _WORD.findall("".join(c for c in text if not unicodedata.combining(c)))
+
+
+def _bits_from_slots(slots):
+    """Bitset (a Python int) with the given slot numbers set."""
+    if not slots:
+        return 0
+    buffer = bytearray(max(slots) // 8 + 1)
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _iter_bits(bits):
+    """Set bit positions of ``bits``, highest first."""
+    text = bin(bits)
+    last = len(text) - 1
+    pos = text.find("1", 2)
+    while pos != -1:
+        yield last - pos
+        pos = text.find("1", pos + 1)
+
+
+class _IndexData:
+    """One snapshot of the index; after ``build`` it is only mutated from the event loop.
+
+    Documents live in slots numbered in productId order (new products are
+    appended, re-indexed ones keep their slot), so the highest set bit of any
+    bitset is the newest product. Match sets, facet values and score groups
+    are all Python ints used as bitsets, which keeps the per-query work to a
+    handful of big-int ANDs and ``bit_count`` calls.
+    """
+
+    def __init__(self, price_buckets, price_bounds=(), term_bit_cache=4096):
+        self.price_buckets = price_buckets  # facet boundaries shown to clients
+        self.price_bounds = list(price_bounds)  # finer boundaries used for price range filters
+        self.docs = []  # slot -> row dict, None once removed
+        self.prices = []  # slot -> int price
+        self.slots = {}  # productId -> slot
+        self.postings = {}  # term -> {slot: weight}
+        self.facets = {name: {} for name in ("category", "region", "status", "price")}  # value -> bitset
+        self.price_ranges = {}  # fine price bucket -> bitset
+        self.alive = 0
+        self._terms = None  # sorted vocabulary for prefix lookups
+        self._hot_bits = {}  # term -> {weight: bitset} for frequent terms, built with the index
+        self._term_bits = OrderedDict()  # same for other terms, built on demand
+        self._term_bit_cache = term_bit_cache
+
+    @classmethod
+    def build(cls, rows, price_buckets, price_ranges=64):
+        rows = sorted(rows, key=lambda row: row["productId"])
+        prices = sorted(int(row["price"] or 0) for row in rows)
+        bounds = sorted({prices[len(prices) * i // price_ranges] for i in range(1, price_ranges)}) if prices else []
+        data = cls(price_buckets, bounds)
+
+        facet_slots = {name: defaultdict(list) for name in data.facets}
+        range_slots = defaultdict(list)
+        for slot, row in enumerate(rows):
+            data.docs.append(row)
+            data.slots[row["productId"]] = slot
+            price = int(row["price"] or 0)
+            data.prices.append(price)
+            for term, weight in data._weights(row).items():
+                data.postings.setdefault(term, {})[slot] = weight
+            for facet, value in data._facet_values(row, price):
+                facet_slots[facet][value].append(slot)
+            range_slots[bisect.bisect_right(bounds, price)].append(slot)
+
+        data.alive = (1 << len(rows)) - 1
+        for facet, values in facet_slots.items():
+            data.facets[facet] = {value: _bits_from_slots(slots) for value, slots in values.items()}
+        data.price_ranges = {bucket: _bits_from_slots(slots) for bucket, slots in range_slots.items()}
+        data._terms = sorted(data.postings)
+        hot = max(64, len(rows) // 256)
+        for term, posting in data.postings.items():
+            if len(posting) >= hot:
+                data._hot_bits[term] = data._group_bits(posting)
+        return data
+
+    @staticmethod
+    def _weights(row):
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(row.get(field)):
+                weights[term] += weight
+        return weights
+
+    def _facet_values(self, row, price):
+        return (
+            ("category", row.get("categoryName")),
+            ("region", row.get("region")),
+            ("status", row.get("currentStatus")),
+            ("price", bisect.bisect_right(self.price_buckets, price)),
+        )
+
+    @staticmethod
+    def _group_bits(posting):
+        groups = defaultdict(list)
+        for slot, weight in posting.items():
+            groups[weight].append(slot)
+        return {weight: _bits_from_slots(slots) for weight, slots in groups.items()}
+
+    def term_bits(self, term):
+        """``{weight: bitset}`` of the documents containing ``term``."""
+        bits = self._hot_bits.get(term)
+        if bits is not None:
+            return bits
+        bits = self._term_bits.get(term)
+        if bits is None:
+            bits = self._group_bits(self.postings.get(term, {}))
+            self._term_bits[term] = bits
+            while len(self._term_bits) > self._term_bit_cache:
+                self._term_bits.popitem(last=False)
+        else:
+            self._term_bits.move_to_end(term)
+        return bits
+
+    def _cached_term_bits(self, term):
+        bits = self._hot_bits.get(term)
+        return bits if bits is not None else self._term_bits.get(term)
+
+    def add(self, row):
+        """Index or re-index a row; an existing product keeps its slot."""
+        slot = self.slots.get(row["productId"])
+        if slot is None:
+            slot = len(self.docs)
+            self.docs.append(None)
+            self.prices.append(0)
+            self.slots[row["productId"]] = slot
+        elif self.docs[slot] is not None:
+            self._unindex(slot)
+        bit = 1 << slot
+        price = int(row["price"] or 0)
+        self.docs[slot] = row
+        self.prices[slot] = price
+        self.alive |= bit
+
+        for term, weight in self._weights(row).items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                bisect.insort(self._terms, term)
+            self.postings[term][slot] = weight
+            cached = self._cached_term_bits(term)
+            if cached is not None:
+                cached[weight] = cached.get(weight, 0) | bit
+        for facet, value in self._facet_values(row, price):
+            self.facets[facet][value] = self.facets[facet].get(value, 0) | bit
+        bucket = bisect.bisect_right(self.price_bounds, price)
+        self.price_ranges[bucket] = self.price_ranges.get(bucket, 0) | bit
+
+    def remove(self, product_id):
+        slot = self.slots.get(product_id)
+        if slot is not None and self.docs[slot] is not None:
+            self._unindex(slot)
+
+    def _unindex(self, slot):
+        row, price = self.docs[slot], self.prices[slot]
+        keep = ~(1 << slot)
+        self.docs[slot] = None
+        self.alive &= keep
+        for term in self._weights(row):
+            weight = self.postings[term].pop(slot, None)
+            cached = self._cached_term_bits(term)
+            if cached is not None and weight in cached:
+                cached[weight] &= keep
+        for facet, value in self._facet_values(row, price):
+            self.facets[facet][value] &= keep
+        bucket = bisect.bisect_right(self.price_bounds, price)
+        self.price_ranges[bucket] &= keep
+
+    def price_mask(self, low, high):
+        """Bitset of live documents priced within ``[low, high]``."""
+        bounds = self.price_bounds
+        first = bisect.bisect_right(bounds, low)
+        last = bisect.bisect_right(bounds, high) if high is not None else len(bounds)
+        mask = 0
+        for bucket in range(first + 1, last):
+            mask |= self.price_ranges.get(bucket, 0)
+        # The buckets holding the endpoints are checked document by document
+        for bucket in {first, last}:
+            for slot in _iter_bits(self.price_ranges.get(bucket, 0)):
+                if low <= self.prices[slot] and (high is None or self.prices[slot] <= high):
+                    mask |= 1 << slot
+        return mask & self.alive
+
+    def expand(self, prefix, limit):
+        """Indexed terms starting with ``prefix`` (the exact term first), at most ``limit``."""
+        terms = self._terms
+        start = bisect.bisect_left(terms, prefix)
+        matches = []
+        for term in terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+
+class ProductSearchIndex:
+    def __init__(self, price_buckets, refresh_interval=300.0, max_prefix_terms=64, result_cache_entries=512):
+        self.price_buckets = sorted(price_buckets)
+        self.refresh_interval = refresh_interval
+        self.max_prefix_terms = max_prefix_terms
+        self._data = None
+        self._built_at = 0.0
+        self._stale = False
+        self._rebuild = None  # task of a background rebuild in progress
+        self._touched = set()  # productIds written while a rebuild was running
+        # Query results per index version; bumped on every change to the index
+        self._results = CatalogCache(max_entries=result_cache_entries, ttl=refresh_interval)
+
+    # ============= Building =============
+    async def _load_rows(self, product_ids=None):
+        query, params = _PRODUCT_ROWS, ()
+        if product_ids:
+            query += f" AND products.productId IN ({', '.join(['%s'] * len(product_ids))})"
+            params = tuple(product_ids)
+        async with get_async_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+        for row in rows:
+            row["price"] = str(row["price"])
+        return rows
+
+    async def _build(self):
+        self._touched.clear()
+        rows = await self._load_rows()
+        # Tokenizing 100k rows takes a while; keep it off the event loop
+        data = await run_in_threadpool(_IndexData.build, rows, self.price_buckets)
+        touched, self._touched = self._touched, set()
+        self._data = data
+        self._built_at = time.monotonic()
+        self._stale = False
+        self._results.bump()
+        if touched:
+            await self.refresh(touched)
+
+    async def ensure_ready(self):
+        """Build the index on first use; later rebuilds happen in the background."""
+        if self._data is None:
+            if self._rebuild is None:
+                self._rebuild = asyncio.ensure_future(self._build())
+                # Cleared by the task itself, so a cancelled first caller cannot leave it behind
+                self._rebuild.add_done_callback(self._rebuild_done)
+            await asyncio.shield(self._rebuild)
+            return
+        if (self._stale or time.monotonic() - self._built_at > self.refresh_interval) and self._rebuild is None:
+            self._rebuild = asyncio.ensure_future(self._build())
+            self._rebuild.add_done_callback(self._rebuild_done)
+
+    def _rebuild_done(self, task):
+        self._rebuild = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Search index rebuild failed: %s", task.exception())
+
+    # ============= Incremental updates =============
+    async def refresh(self, product_ids):
+        """Re-read the given products (one query) and re-index them."""
+        if self._data is None:
+            return
+        product_ids = list(product_ids)
+        if self._rebuild is not None:
+            self._touched.update(product_ids)
+        rows = {row["productId"]: row for row in await self._load_rows(product_ids)}
+        for product_id in product_ids:
+            row = rows.get(product_id)
+            if row is None:
+                self._data.remove(product_id)
+            else:
+                self._data.add(row)
+        self._results.bump()
+
+    def set_stock(self, product_id, quantity):
+        """Apply a purchase without a query; sold-out products leave the index."""
+        if self._data is None:
+            return
+        if self._rebuild is not None:
+            self._touched.add(product_id)
+        slot = self._data.slots.get(product_id)
+        if slot is None:
+            return
+        if quantity <= 0:
+            self._data.remove(product_id)
+        else:
+            # Rows may be shared with cached responses, so replace rather than mutate
+            self._data.docs[slot] = {**self._data.docs[slot], "quantity": quantity}
+        self._results.bump()
+
+    def mark_stale(self):
+        """Schedule a full rebuild on the next search (after bulk writes)."""
+        self._stale = True
+
+    # ============= Querying =============
+    async def search(self, q="", category=None, region=None, status=None,
+                     min_price=None, max_price=None, limit=24, offset=0):
+        await self.ensure_ready()
+        key = (q, category, region, status, min_price, max_price, limit, offset)
+        return await self._results.get_or_load(
+            key, lambda: self._run(q, category, region, status, min_price, max_price, limit, offset)
+        )
+
+    async def _run(self, q, category, region, status, min_price, max_price, limit, offset):
+        data = self._data
+        terms = list(dict.fromkeys(tokenize(q)))
+
+        mask = data.alive
+        for facet, value in (("category", category), ("region", region), ("status", status)):
+            if value is not None:
+                mask &= data.facets[facet].get(value, 0)
+        if min_price is not None or max_price is not None:
+            mask &= data.price_mask(min_price or 0, max_price)
+
+        # Every query term must match (itself or as a prefix); each one splits its
+        # matches into disjoint groups of equal score
+        groups_per_term = []
+        per_term_cap = max(2, int(MAX_SCORE_COMBINATIONS ** (1 / len(terms)))) if terms else 0
+        for term in terms:
+            groups, covered = self._term_groups(data, term, mask, per_term_cap)
+            mask &= covered
+            if not mask:
+                break
+            groups_per_term.append(groups)
+
+        wanted = offset + limit
+        top = []
+        if mask:
+            for bits in self._ranked_groups(groups_per_term, mask):
+                # Ties are broken newest first: higher slots are newer products
+                for slot in _iter_bits(bits):
+                    top.append(slot)
+                    if len(top) == wanted:
+                        break
+                if len(top) == wanted:
+                    break
+
+        return {
+            "items": [data.docs[slot] for slot in top[offset:]],
+            "total": mask.bit_count(),
+            "facets": self._facets(data, mask),
+        }
+
+    def _term_groups(self, data, term, mask, cap):
+        total_docs = max(data.alive.bit_count(), 1)
+        scored = []
+        for word in data.expand(term, self.max_prefix_terms):
+            posting = data.postings.get(word)
+            if not posting:
+                continue
+            idf = math.log(1 + total_docs / len(posting)) * (1.0 if word == term else PREFIX_PENALTY)
+            for weight, bits in data.term_bits(word).items():
+                scored.append((idf * weight, bits))
+        scored.sort(key=lambda entry: entry[0], reverse=True)
+
+        # A document scores by its best matching word, so earlier groups claim it
+        groups, covered = [], 0
+        for score, bits in scored:
+            own = bits & mask & ~covered
+            if own:
+                groups.append([score, own])
+                covered |= own
+        if len(groups) > cap:
+            # Keep the best groups apart and rank the long tail by recency alone
+            tail = 0
+            for _, bits in groups[cap - 1:]:
+                tail |= bits
+            groups = groups[:cap - 1] + [[groups[cap - 1][0], tail]]
+        return groups, covered
+
+    @staticmethod
+    def _ranked_groups(groups_per_term, mask):
+        """Bitsets of matching documents, best summed score first."""
+        if not groups_per_term:
+            yield mask
+            return
+        combined = defaultdict(int)
+        for combo in itertools.product(*groups_per_term):
+            bits = mask
+            for _, group_bits in combo:
+                bits &= group_bits
+                if not bits:
+                    break
+            if bits:
+                combined[round(sum(score for score, _ in combo), 9)] |= bits
+        for score in sorted(combined, reverse=True):
+            yield combined[score]
+
+    def _facets(self, data, mask):
+        def counts(facet):
+            values = []
+            for value, bits in data.facets[facet].items():
+                count = (bits & mask).bit_count()
+                if count and value is not None:
+                    values.append({"value": value, "count": count})
+            values.sort(key=lambda entry: (-entry["count"], entry["value"]))
+            return values
+
+        bounds = [None, *self.price_buckets, None]
+        price = []
+        for bucket in range(len(self.price_buckets) + 1):
+            count = (data.facets["price"].get(bucket, 0) & mask).bit_count()
+            if count:
+                low, high = bounds[bucket], bounds[bucket + 1]
+                price.append({
+                    "min": str(low) if low is not None else "0",
+                    "max": str(high) if high is not None else None,
+                    "count": count,
+                })
+        return {"category": counts("category"), "region": counts("region"), "status": counts("status"),
+                "price": price}
+
+    def stats(self):
+        data = self._data
+        return {
+            "documents": data.alive.bit_count() if data else 0,
+            "terms": len(data.postings) if data else 0,
+            "builtAgoS": round(time.monotonic() - self._built_at, 1) if data else None,
+            "stale": self._stale,
+            "rebuilding": self._rebuild is not None,
+            "results": self._results.stats(),
+        }
+
+
+search_index = ProductSearchIndex(**SEARCH_CONFIG)
@@ -0,0 +1,131 @@
+"""Wallet signature recovery, run in a process pool.
+
+Recovering the signer of a ``personal_sign`` message is secp256k1 public
+key recovery: pure CPU, several milliseconds each without a native backend,
+and it holds the GIL, so threads do not help. Recoveries run in worker
+processes (``SIGNATURE_CONFIG["workers"]``, 0 keeps them in a thread of this
+process), many at a time in chunks so a batch pays one round trip per
+worker.
+
+The number of signatures queued or in progress is bounded by
+``max_pending``. Past that ``SignatureQueueFull`` is raised at once (the
+routes answer 503 with ``Retry-After``), so a login storm is shed at the
+door instead of queueing until every client times out.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+
+from core.config import SIGNATURE_CONFIG
+
+
+class SignatureQueueFull(Exception):
+    pass
+
+
+def recover_signer(message, signature):
+    """Address that signed ``message`` (personal_sign); raises on a malformed signature."""
+    # Imported here: eth_account pulls in ~1 s of crypto modules (workers preload it in _warm_worker)
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    return Account.recover_message(encode_defunct(text=message), signature=signature)
+
+
+def recover_signers(pairs):
+    """``[(address or None, error or None), ...]`` for ``(message, signature)`` pairs; runs in a worker."""
+    results = []
+    for message, signature in pairs:
+        try:
+            results.append((recover_signer(message, signature), None))
+        except Exception as e:
+            # Errors go back as text: eth_keys exceptions do not all pickle cleanly
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+
+def _warm_worker():
+    import eth_account  # noqa: F401
+
+
+class SignatureVerifier:
+    def __init__(self, workers=2, max_pending=1024, chunk_size=32, **_):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._pending = 0
+        self.recovered = 0
+        self.rejected = 0
+
+    def _pool(self):
+        if self._executor is None:
+            # Spawned, not forked: the API process has the event loop, pool and web3 threads running
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def warm(self):
+        """Start the workers (or import eth_account here) so the first login does not wait; blocking."""
+        if self.workers == 0:
+            _warm_worker()
+            return
+        pool = self._pool()
+        for future in [pool.submit(_warm_worker) for _ in range(self.workers)]:
+            future.result()
+
+    async def _run(self, pairs):
+        if self.workers == 0:
+            return await run_in_threadpool(recover_signers, pairs)
+        pool = self._pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, recover_signers, pairs)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, crash); start a fresh pool and try this chunk once more
+            if self._executor is pool:
+                self._executor = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), recover_signers, pairs)
+
+    async def recover_many(self, pairs):
+        """Recover every ``(message, signature)``; results as in ``recover_signers``, in order."""
+        if self._pending + len(pairs) > self.max_pending:
+            self.rejected += len(pairs)
+            raise SignatureQueueFull(f"{self._pending} signatures waiting, limit {self.max_pending}")
+        self._pending += len(pairs)
+        try:
+            # Enough chunks to keep every worker busy, none larger than chunk_size
+            size = max(1, min(self.chunk_size, -(-len(pairs) // max(self.workers, 1))))
+            chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+            results = await asyncio.gather(*(self._run(chunk) for chunk in chunks))
+        finally:
+            self._pending -= len(pairs)
+        self.recovered += len(pairs)
+        return [result for chunk in results for result in chunk]
+
+    async def recover(self, message, signature):
+        """The signer's address; raises ValueError for a signature that cannot be recovered."""
+        ((address, error),) = await self.recover_many([(message, signature)])
+        if error is not None:
+            raise ValueError(error)
+        return address
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "maxPending": self.max_pending,
+            "recovered": self.recovered,
+            "rejected": self.rejected,
+        }
+
+
+signature_verifier = SignatureVerifier(**SIGNATURE_CONFIG)
@@ -170,7 +170,8 @@ export default function CreateProduct() {
             },
           );
 
-          formData.imageSrc = image.name;
+          // Stored under its content hash, not the original file name
+          formData.imageSrc = imageResponse.data.filename;
         } catch (error) {
           console.log(error);
         }
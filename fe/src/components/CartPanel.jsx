@@ -122,7 +122,7 @@ const CartPanel = ({ isOpen, onClose, cartItems }) => {
                 (e.currentTarget.style.backgroundColor = "transparent")
               }
             >
-              <img src={"http://127.0.0.1:8000/images/coffee-pictures/" + item.image} alt={item.name} className="rounded" style={{ width: '48px', height: '48px', objectFit: 'cover' }} />
+              <img src={item.thumbnailSrc ? "http://127.0.0.1:8000" + item.thumbnailSrc : "http://127.0.0.1:8000/images/coffee-pictures/" + item.image} alt={item.name} className="rounded" style={{ width: '48px', height: '48px', objectFit: 'cover' }} />
               <div className="flex-grow-1">
                 <h3 className="fw-medium mb-0" style={{ fontSize: "0.95rem" }}>
                   <a
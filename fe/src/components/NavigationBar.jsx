@@ -121,6 +121,7 @@ export default function NavigationBar() {
         `/users/auth/verify`,
         {
           wallet_address: walletAddress,
+          nonce: nonce,
           signature: signature,
         },
         {
@@ -22,7 +22,11 @@ export default function CustomCard(props) {
         <div className="position-relative">
           <CardMedia
             sx={{ height: 140 }}
-            image={"http://127.0.0.1:8000/images/coffee-pictures/" + props.imageSrc}
+            image={
+              props.thumbnailSrc
+                ? "http://127.0.0.1:8000" + props.thumbnailSrc
+                : "http://127.0.0.1:8000/images/coffee-pictures/" + props.imageSrc
+            }
             title={props.name}
             className="card-media"
           />
@@ -86,6 +90,7 @@ export default function CustomCard(props) {
 
 CustomCard.propTypes = {
   imageSrc: PropTypes.string.isRequired,
+  thumbnailSrc: PropTypes.string,
   description: PropTypes.string.isRequired,
   price: PropTypes.string.isRequired,
   isFavourite: PropTypes.bool.isRequired,
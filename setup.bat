@@ -26,6 +26,7 @@ python -m venv .venv
 :: Use CMD activation instead of PowerShell
 call .venv\Scripts\activate.bat
 call pip install -r requirements.txt
+call python -m db.migrate
 call python .\data\generate_data.py
 start cmd /k "fastapi dev main.py"
 